@@ -0,0 +1,98 @@
+"""Per-tool-call setup overhead: rebuilding the model and sub-agent graph vs the shared ones.
+
+Both cases build the real ChatOpenAI, so they include the openai/httpx client setup. The
+"before" case does what every tool call used to do: a new ChatOpenAI (with its own
+connection pool) and a new graph. The "after" case uses the shared model and graph, warmed
+before timing. The file_analysis calls go to a local stand-in for the OpenAI API that answers
+every completion with "Done." after --latency seconds, so no request leaves the machine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_agent_setup --calls 200
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETION = {
+    "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "Done."}}],
+    "usage": {"prompt_tokens": 100, "completion_tokens": 2, "total_tokens": 102},
+}
+
+
+def start_openai_stub(latency):
+    """Local server answering POST /v1/chat/completions. Returns its base URL."""
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, as the OpenAI API does
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            body = json.dumps(COMPLETION).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def timed(label, fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed / calls * 1000:>8.3f} ms/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub API waits per completion")
+    args = parser.parse_args()
+
+    os.environ["OPENAI_API_BASE"] = start_openai_stub(args.latency)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import chat_agent_executor
+
+    from flask_app import agent_utils
+
+    tools = [agent_utils.python_repl, agent_utils.get_file_content]
+
+    def rebuild():
+        # What every tool call used to do: new model (and connection pool), new graph
+        return chat_agent_executor.create_tool_calling_executor(ChatOpenAI(model="gpt-4o"), tools)
+
+    def file_analysis_before():
+        rebuild().invoke({"messages": [SystemMessage(content=agent_utils.FILE_ANALYSIS_SYSTEM_MESSAGE),
+                                       HumanMessage(content="Objective: Find revenue. \nFile Path:missing.txt")]})
+
+    call = {"file_path": "missing.txt", "objective": "Find revenue"}
+    # The first call builds the shared model and graph; only later calls are timed
+    agent_utils.file_analysis.invoke(call)
+    file_analysis_before()
+
+    timed("setup: rebuild per call", rebuild, args.calls)
+    timed("setup: shared graph", agent_utils.get_file_analysis_agent, args.calls)
+    timed("file_analysis call: rebuild per call", file_analysis_before, args.calls)
+    timed("file_analysis call: shared graph", lambda: agent_utils.file_analysis.invoke(call), args.calls)
+
+
+if __name__ == "__main__":
+    main()
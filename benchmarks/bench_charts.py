@@ -0,0 +1,113 @@
+"""Charts/s and per-chart latency: chart specs on the renderer pool vs an agent writing matplotlib code.
+
+The agent path reproduces the previous chart_generation: a tool calling agent (fake model,
+--latency seconds per call) that sends matplotlib code to python_repl and then answers.
+Images are written to a temporary directory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_charts --charts 20 --latency 1.0 --format png
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.prebuilt import chat_agent_executor
+
+from flask_app.agent_utils import python_repl
+from flask_app.charts import ChartRenderer
+from flask_app.sandbox import SandboxPool
+from flask_app import sandbox
+
+CODE = """
+import matplotlib.pyplot as plt
+fig, ax = plt.subplots(figsize=(10, 6))
+ax.bar(range(12), [{values}], label="Revenue")
+ax.set_title("Revenue {index}")
+fig.text(0.01, 0.01, "Source: model.xlsx", fontsize=8)
+fig.savefig(r"{path}")
+plt.close(fig)
+print("saved")
+"""
+
+
+class FakeToolCallingModel(FakeMessagesListChatModel):
+    latency: float = 0.0
+
+    def _generate(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super()._generate(*args, **kwargs)
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def make_spec(index, image_format):
+    return {"chart_type": "bar", "title": f"Revenue {index}",
+            "labels": [f"M{month}" for month in range(1, 13)],
+            "series": [{"name": "Revenue", "values": [index * 10.0 + month for month in range(12)]}],
+            "citation": "model.xlsx", "image_format": image_format}
+
+
+def agent_path(specs, images_dir, latency):
+    start = time.perf_counter()
+    for index, spec in enumerate(specs):
+        code = CODE.format(values=", ".join(map(str, spec["series"][0]["values"])), index=index,
+                           path=os.path.join(images_dir, f"agent_{index}.png"))
+        model = FakeToolCallingModel(latency=latency, responses=[
+            AIMessage(content="", tool_calls=[{"name": "python_repl", "args": {"code": code}, "id": "call_1"}]),
+            AIMessage(content="Image saved")])
+        agent = chat_agent_executor.create_tool_calling_executor(model, [python_repl])
+        agent.invoke({"messages": [HumanMessage(content="Generate the revenue chart")]})
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--format", default="png", choices=["png", "svg", "webp"])
+    args = parser.parse_args()
+
+    specs = [make_spec(index, args.format) for index in range(args.charts)]
+    with tempfile.TemporaryDirectory() as images_dir:
+        sandbox._pool = SandboxPool(1, cpu_seconds=60, memory_bytes=0, wall_timeout=120)
+        sandbox._pool.run("pass")
+        agent = agent_path(specs, images_dir, args.latency)
+        sandbox._pool.close()
+
+        renderer = ChartRenderer(images_dir, workers=2)
+        renderer.prewarm()
+        start = time.perf_counter()
+        for spec in specs:
+            renderer.render(spec)
+        single = time.perf_counter() - start
+
+        batch_specs = [dict(spec, title=f"Batch {index}") for index, spec in enumerate(specs)]
+        start = time.perf_counter()
+        names = renderer.render_many(batch_specs)
+        batch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        renderer.render_many(batch_specs)
+        cached = time.perf_counter() - start
+        renderer.close()
+
+        size = sum(os.path.getsize(os.path.join(images_dir, name)) for name in names) / len(names)
+
+    print(f"agent path ({args.latency}s per LLM call): {args.charts / agent:8.2f} charts/s, "
+          f"{agent / args.charts * 1000:8.1f} ms/chart")
+    print(f"renderer, one at a time:           {args.charts / single:8.2f} charts/s, "
+          f"{single / args.charts * 1000:8.1f} ms/chart")
+    print(f"renderer, one batch:               {args.charts / batch:8.2f} charts/s, "
+          f"{batch / args.charts * 1000:8.1f} ms/chart")
+    print(f"renderer, cached specs:            {args.charts / cached:8.2f} charts/s, "
+          f"{cached / args.charts * 1000:8.1f} ms/chart")
+    print(f"average {args.format} size: {size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
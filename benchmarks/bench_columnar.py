@@ -0,0 +1,60 @@
+"""Repeated sheet loads: openpyxl parse on every call vs the Arrow extract used by load_table.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_columnar --rows 50000 --sheets 3 --calls 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from flask_app import columnar
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        extracted_dir = os.path.join(tmp, "DataRoom")
+        os.makedirs(extracted_dir)
+        path = os.path.join(extracted_dir, "model.xlsx")
+        df = pd.DataFrame({"Period": [f"M{i}" for i in range(args.rows)],
+                           "Revenue": [i * 10.0 for i in range(args.rows)],
+                           "COGS": [i * 4.0 for i in range(args.rows)]})
+        with pd.ExcelWriter(path) as writer:
+            for sheet in range(args.sheets):
+                df.to_excel(writer, sheet_name=f"Sheet{sheet}", index=False)
+
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            pd.read_excel(path, sheet_name="Sheet1")
+        excel = (time.perf_counter() - start) / args.calls
+
+        start = time.perf_counter()
+        columnar.extract_tables([path], columnar.tables_dir_for(extracted_dir))
+        extract = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columnar.load_table(path, "Sheet1")
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            columnar.load_table(path, "Sheet1")
+        repeat = (time.perf_counter() - start) / args.calls
+
+        print(f"read_excel per call:      {excel * 1000:9.1f} ms")
+        print(f"one-time extract:         {extract * 1000:9.1f} ms")
+        print(f"load_table first call:    {first * 1000:9.1f} ms")
+        print(f"load_table repeated call: {repeat * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
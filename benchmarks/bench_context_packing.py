@@ -0,0 +1,59 @@
+"""Tokens sent and get_file_content latency on large synthetic sheets, full text vs packed.
+
+"pack s" builds the packed text; "repeat s" is a later get_file_content of the same file,
+served from the file cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_context_packing --rows 10000 100000 1000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+
+def make_sheet(path, n_rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Account", "Region", "Revenue", "COGS", "Opex"])
+        for row in range(n_rows):
+            writer.writerow([f"2023-{row % 12 + 1:02d}-{row % 28 + 1:02d}", f"ACC-{row % 250}",
+                             ("NA", "EMEA", "APAC")[row % 3], row * 1.25, row * 0.5, row * 0.3])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    parser.add_argument("--budget", type=int, default=6000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh file cache, so the first pack of each sheet is never a hit
+        os.environ["FILE_CACHE_PATH"] = os.path.join(tmp, "file_cache.sqlite")
+        from flask_app.context_packing import count_tokens, pack_document, pack_file
+        from flask_app.document_loader import parse_document
+
+        print(f"{'rows':>9} {'full tokens':>12} {'packed tokens':>14} {'parse s':>8} {'pack s':>8} {'repeat s':>9}")
+        for n_rows in args.rows:
+            path = os.path.join(tmp, f"ledger_{n_rows}.csv")
+            make_sheet(path, n_rows)
+
+            start = time.perf_counter()
+            document = parse_document(path)
+            parsed = time.perf_counter()
+            packed = pack_document(document, budget=args.budget)
+            done = time.perf_counter()
+            pack_file(path, budget=args.budget)
+            repeat_start = time.perf_counter()
+            assert pack_file(path, budget=args.budget) == packed
+            repeat = time.perf_counter() - repeat_start
+
+            print(f"{n_rows:>9} {count_tokens(document.text):>12} {count_tokens(packed):>14} "
+                  f"{parsed - start:>8.2f} {done - parsed:>8.2f} {repeat:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Document index build and query latency over synthetic chunks.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_doc_index --chunks 10000 --queries 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from flask_app.doc_index import DocumentIndex, HashingEmbedder
+
+WORDS = ("revenue gross margin ebitda churn arr bookings cash burn headcount opex capex "
+         "guidance pipeline forecast customer retention pricing discount segment region").split()
+
+
+def make_corpus(root, n_chunks, chunk_size=1500):
+    rng = random.Random(0)
+    paths = []
+    per_file = 50
+    for i in range(0, n_chunks, per_file):
+        path = os.path.join(root, f"doc_{i // per_file}.txt")
+        with open(path, "w") as f:
+            for _ in range(per_file):
+                words = [rng.choice(WORDS) for _ in range(chunk_size // 8)]
+                f.write(" ".join(words)[:chunk_size - 2] + "\n\n")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(tmp, args.chunks)
+        index_dir = os.path.join(tmp, "index")
+
+        start = time.perf_counter()
+        index = DocumentIndex(index_dir, HashingEmbedder())
+        index.update(paths)
+        build = time.perf_counter() - start
+        print(f"build: {len(index.chunks)} chunks in {build:.2f}s")
+
+        start = time.perf_counter()
+        DocumentIndex(index_dir, HashingEmbedder()).update(paths)
+        print(f"incremental update (no changes): {time.perf_counter() - start:.2f}s")
+
+        rng = random.Random(1)
+        queries = [" ".join(rng.sample(WORDS, 3)) for _ in range(args.queries)]
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, k=5)
+        elapsed = time.perf_counter() - start
+        print(f"query: {elapsed / len(queries) * 1000:.2f} ms avg over {len(queries)} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare the format-specific document loader with Unstructured-for-everything.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_document_loader --files 40 --rows 2000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from openpyxl import Workbook
+from langchain_community.document_loaders import UnstructuredFileLoader
+
+from flask_app.document_loader import parse_document
+
+
+def make_corpus(root, n_files, n_rows):
+    paths = []
+    for i in range(n_files):
+        kind = i % 4
+        if kind == 0:
+            path = os.path.join(root, f"model_{i}.xlsx")
+            workbook = Workbook()
+            for sheet_index in range(3):
+                worksheet = workbook.active if sheet_index == 0 else workbook.create_sheet()
+                worksheet.title = f"Sheet{sheet_index}"
+                worksheet.append(["Period", "Revenue", "COGS", "Opex"])
+                for row in range(n_rows):
+                    worksheet.append([f"M{row}", row * 10.0, row * 4.0, row * 2.5])
+            workbook.save(path)
+        elif kind == 1:
+            path = os.path.join(root, f"ledger_{i}.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Date", "Account", "Amount"])
+                for row in range(n_rows):
+                    writer.writerow([f"2023-01-{row % 28 + 1:02d}", "Sales", row * 1.5])
+        else:
+            path = os.path.join(root, f"memo_{i}.{'txt' if kind == 2 else 'md'}")
+            with open(path, "w") as f:
+                for row in range(n_rows // 10):
+                    f.write(f"Paragraph {row}: revenue grew {row % 17}% year over year.\n")
+        paths.append(path)
+    return paths
+
+
+def run(label, load, paths):
+    start = time.perf_counter()
+    for path in paths:
+        load(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {elapsed:>8.2f}s {len(paths) / elapsed:>8.1f} files/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(tmp, args.files, args.rows)
+        run("unstructured", lambda p: UnstructuredFileLoader(p).load(), paths)
+        run("fast loader", parse_document, paths)
+
+
+if __name__ == "__main__":
+    main()
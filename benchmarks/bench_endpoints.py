@@ -0,0 +1,151 @@
+"""Latency and throughput of /upload, /ask and /example with replayed model responses.
+
+The workload runs against the Flask test client on synthetic data rooms, fully offline.
+Without --cassette, it is first recorded (LLM_MODE=record) against a scripted stub model in
+a subprocess, then replayed (LLM_MODE=replay) with --latency seconds per model call. With
+--live the recording calls OpenAI instead, so later runs can replay real responses.
+
+Each session uploads its own data room, and recording runs the sessions one at a time, so
+every session's prompts are the same when replayed concurrently. A cassette covers at most
+the number of sessions it was recorded with.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_endpoints --sessions 20 --questions 3 --latency 0.2
+    python -m benchmarks.bench_endpoints --cassette cassettes/bench.jsonl --live
+"""
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from benchmarks.fake_llm import scripted_chat_model_factory
+
+OBJECTIVE = "Summarize revenue and margins by year"
+
+
+def make_corpus(n_files, root="DataRoom"):
+    """Zip of text reports, CSV ledgers and Excel models spread over a few folders."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for i in range(n_files):
+            folder = ("finance", "legal", "operations")[i % 3]
+            year = 2015 + i % 10
+            if i % 3 == 0:
+                zf.writestr(f"{root}/{folder}/report_{i}.txt",
+                            f"FY{year} report {i}. Revenue was {1000 + i * 37} and gross margin {40 + i % 7}%.\n" * 20)
+            elif i % 3 == 1:
+                frame = pd.DataFrame({"Month": [f"{year}-{m:02d}" for m in range(1, 13)],
+                                      "Revenue": [i * 100 + m for m in range(12)],
+                                      "COGS": [i * 60 + m for m in range(12)]})
+                zf.writestr(f"{root}/{folder}/ledger_{i}.csv", frame.to_csv(index=False))
+            else:
+                frame = pd.DataFrame({"Item": ["Revenue", "COGS", "Opex"],
+                                      "FY1": [i * 10, i * 6, i * 2], "FY2": [i * 11, i * 6, i * 3]})
+                excel = io.BytesIO()
+                frame.to_excel(excel, index=False)
+                zf.writestr(f"{root}/{folder}/model_{i}.xlsx", excel.getvalue())
+    return buffer.getvalue()
+
+
+def run_session(app, name, archive, n_questions):
+    client = app.test_client()
+    timings = []
+
+    start = time.perf_counter()
+    response = client.post("/upload", data={
+        "file": (io.BytesIO(archive), f"{name}.zip"),
+        "objective": OBJECTIVE,
+    }, content_type="multipart/form-data")
+    assert response.status_code == 202, response.data
+    job_id = response.get_json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    timings.append(("upload", time.perf_counter() - start))
+    assert job["status"] == "succeeded", job
+
+    for i in range(n_questions):
+        start = time.perf_counter()
+        response = client.post("/ask", json={"question": f"What was the revenue in FY{2015 + i}?"})
+        timings.append(("ask", time.perf_counter() - start))
+        assert response.status_code == 200 and b"response" in response.data, response.data
+
+    # The example is the last completed upload, saved by the upload job
+    start = time.perf_counter()
+    response = client.get("/example")
+    timings.append(("example", time.perf_counter() - start))
+    assert response.status_code == 200, response.data
+    return timings
+
+
+def run_phase(args, mode, cassette_path, concurrency):
+    os.chdir(tempfile.mkdtemp())
+    os.environ.update({"LLM_MODE": mode, "LLM_CASSETTE_PATH": cassette_path,
+                       "LLM_REPLAY_LATENCY": str(args.latency), "USE_SAMPLE_OVERVIEW": "false"})
+
+    from flask_app import llm, create_app
+    if mode == "record" and not args.live:
+        llm.ChatOpenAI = scripted_chat_model_factory()
+    app = create_app()
+    archives = {f"DataRoom{i}": make_corpus(args.files, f"DataRoom{i}") for i in range(args.sessions)}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda item: run_session(app, *item, args.questions), archives.items()))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per replayed model call")
+    parser.add_argument("--cassette", help="cassette to replay, recorded first if it does not exist")
+    parser.add_argument("--live", action="store_true", help="record against OpenAI instead of the stub")
+    parser.add_argument("--phase", choices=["record", "replay"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    cassette_path = os.path.abspath(args.cassette or os.path.join(tempfile.mkdtemp(), "bench.jsonl"))
+
+    if args.phase == "record":
+        run_phase(args, "record", cassette_path, concurrency=1)
+        return
+
+    if not os.path.exists(cassette_path):
+        start = time.perf_counter()
+        command = [sys.executable, "-m", "benchmarks.bench_endpoints", "--phase", "record",
+                   "--cassette", cassette_path, "--sessions", str(args.sessions), "--questions", str(args.questions),
+                   "--files", str(args.files)] + (["--live"] if args.live else [])
+        subprocess.run(command, check=True)
+        print(f"recorded {cassette_path} in {time.perf_counter() - start:.1f}s")
+
+    results, elapsed = run_phase(args, "replay", cassette_path, args.concurrency)
+
+    from flask_app.cassette import get_cassette
+    print(f"replaying {len(get_cassette(cassette_path))} recorded responses, "
+          f"{args.latency * 1000:.0f}ms per model call")
+    for kind in ("upload", "ask", "example"):
+        samples = sorted(t for timings in results for k, t in timings if k == kind)
+        p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+        print(f"{kind:<8} n={len(samples):<5} p50={statistics.median(samples) * 1000:8.1f}ms "
+              f"p95={p95 * 1000:8.1f}ms  {len(samples) / elapsed:6.2f} req/s")
+    total = sum(len(timings) for timings in results)
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Latency of /example from the memoized bundle versus the previous flow.
+
+The previous flow read four files, rebuilt the tree and seeded the conversation with a
+"Say Hi!" model call; here the model is a stub with --latency seconds per call. The
+sandbox and chart workers are not pre-warmed, so their start-up does not compete with the
+requests for CPU.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_example --requests 50 --latency 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_llm import fake_chat_model_factory
+
+
+def legacy_example(agent_executor, thread_id):
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from flask_app.example_processing import (EXAMPLE_ANALYSIS_PATH, EXAMPLE_OBJECTIVE_PATH,
+                                              EXAMPLE_SYSTEM_MSG_PATH, EXAMPLE_TREE_PATH)
+    from flask_app.tree import CompactTree, save_session_tree
+
+    with open(EXAMPLE_ANALYSIS_PATH) as f:
+        json.load(f)
+    with open(EXAMPLE_TREE_PATH) as f:
+        tree = json.load(f)
+    with open(EXAMPLE_OBJECTIVE_PATH) as f:
+        f.read()
+    with open(EXAMPLE_SYSTEM_MSG_PATH) as f:
+        system_message = f.read()
+    save_session_tree(thread_id, CompactTree.from_json(tree))
+    agent_executor.invoke({"messages": [SystemMessage(content=system_message), HumanMessage(content="Say Hi!")]},
+                          config={"configurable": {"thread_id": thread_id}})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per model call")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    os.environ["SANDBOX_PREWARM"] = "false"
+
+    from flask_app import llm, create_app
+    from flask_app.example_processing import (EXAMPLE_ANALYSIS_PATH, EXAMPLE_OBJECTIVE_PATH,
+                                              EXAMPLE_SYSTEM_MSG_PATH, EXAMPLE_TREE_PATH,
+                                              save_example_data)
+    from flask_app.controllers import system_message_content
+    from flask_app.sessions import session_manager
+    from flask_app.tree import CompactTree
+    llm.ChatOpenAI = fake_chat_model_factory(latency=args.latency, responses=["Hi!"])
+
+    tree = CompactTree("DataRoom")
+    for i in range(args.files):
+        tree.add_file(f"DataRoom/folder_{i % 20}/report_{i}.txt", f"Summary of report {i}.")
+    tree_json = json.loads(tree.to_json())
+    overview = tree.to_text()
+    save_example_data("Example analysis.", tree_json, "Summarize revenue", overview)
+    for path, value in ((EXAMPLE_ANALYSIS_PATH, json.dumps("Example analysis.")), (EXAMPLE_TREE_PATH, json.dumps(tree_json)),
+                        (EXAMPLE_OBJECTIVE_PATH, "Summarize revenue"), (EXAMPLE_SYSTEM_MSG_PATH, system_message_content(overview))):
+        with open(path, "w") as f:
+            f.write(value)
+
+    app = create_app()
+    client = app.test_client()
+
+    timings = {"bundle": [], "legacy": []}
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        assert client.get("/example").status_code == 200
+        timings["bundle"].append(time.perf_counter() - start)
+
+    for _ in range(min(args.requests, 5)):
+        agent_executor, thread_id = session_manager.create("Summarize revenue")
+        start = time.perf_counter()
+        legacy_example(agent_executor, thread_id)
+        timings["legacy"].append(time.perf_counter() - start)
+
+    for label, samples in timings.items():
+        print(f"{label:<7} n={len(samples):<4} p50={statistics.median(samples) * 1000:9.1f}ms "
+              f"max={max(samples) * 1000:9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Wall-clock scaling of file summarization with the pool size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_file_analysis --files 200 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from flask_app import controllers, document_loader, file_cache, llm
+from benchmarks.fake_llm import fake_chat_model_factory
+
+
+def make_corpus(root, n_files):
+    for i in range(n_files):
+        folder = os.path.join(root, f"folder_{i % 10}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"report_{i}.txt"), "w") as f:
+            f.write(f"Revenue for segment {i} was {i * 1000} in FY23.\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Injected fake model latency in seconds")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    llm.ChatOpenAI = fake_chat_model_factory(latency=args.latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "DataRoom")
+        make_corpus(root, args.files)
+
+        print(f"{'workers':>8} {'seconds':>10} {'files/s':>10}")
+        for workers in args.workers:
+            # Fresh caches so every run parses and summarizes every file
+            file_cache._cache = file_cache.FileCache(
+                os.path.join(tmp, f"cache_{workers}.sqlite"), 1024 ** 3)
+            document_loader._store = None
+            start = time.perf_counter()
+            controllers.create_directory_tree_text(
+                root, file_analysis=True, max_workers=workers, executor_type="thread")
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {elapsed:>10.2f} {args.files / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Prompt size, /ask latency and checkpoint size over a long session, with and without history management.
+
+One session uploads a synthetic data room and asks --turns questions. The stub model calls
+document_search for every question, then answers; it waits --latency seconds per call plus
+--prefill-ms per thousand prompt tokens, as a stand-in for the time a real model spends
+reading the prompt. "full" sends the whole history and keeps every checkpoint; "managed" uses
+the defaults (HISTORY_TRIM, CHECKPOINT_KEEP). Checkpoint size is the database and its WAL
+on disk after each question. Each mode runs in its own process.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_history --turns 50
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_endpoints import make_corpus
+from benchmarks.fake_llm import ScriptedToolModel
+
+MODES = {"full": {"HISTORY_TRIM": "false", "CHECKPOINT_KEEP": "0"}, "managed": {}}
+
+# Prompt tokens of the model calls of the current question
+PROMPT_TOKENS = []
+
+
+class PromptSizeModel(ScriptedToolModel):
+    """ScriptedToolModel that records the prompt tokens of every call and waits longer for longer prompts."""
+
+    prefill_ms: float = 0.0
+
+    def _generate(self, messages, *args, **kwargs):
+        from flask_app.context_packing import message_tokens
+
+        tokens = sum(message_tokens(message) for message in messages)
+        PROMPT_TOKENS.append(tokens)
+        time.sleep(tokens / 1000 * self.prefill_ms / 1000)
+        return super()._generate(messages, *args, **kwargs)
+
+
+def run_phase(args):
+    os.chdir(tempfile.mkdtemp())
+    from flask_app import llm, create_app
+    from flask_app.config import Config
+
+    llm.ChatOpenAI = lambda *a, **kw: PromptSizeModel(latency=args.latency, prefill_ms=args.prefill_ms)
+    app = create_app()
+    client = app.test_client()
+
+    response = client.post("/upload", data={"file": (io.BytesIO(make_corpus(args.files)), "DataRoom.zip"),
+                                            "objective": "Summarize revenue"},
+                           content_type="multipart/form-data")
+    job_id = response.get_json()["job_id"]
+    while client.get(f"/jobs/{job_id}").get_json()["status"] in ("queued", "running"):
+        time.sleep(0.02)
+
+    def db_bytes():
+        return sum(os.path.getsize(path) for path in (Config.CHECKPOINT_DB_PATH, Config.CHECKPOINT_DB_PATH + "-wal")
+                   if os.path.exists(path))
+
+    turns = []
+    for i in range(args.turns):
+        del PROMPT_TOKENS[:]
+        start = time.perf_counter()
+        client.post("/ask", json={"question": f"Question {i}: what was the revenue and gross margin in FY{2015 + i % 10}?"})
+        turns.append({"seconds": time.perf_counter() - start, "prompt_tokens": max(PROMPT_TOKENS),
+                      "db_bytes": db_bytes()})
+
+    print(json.dumps({"turns": turns}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--prefill-ms", type=float, default=20.0, help="milliseconds per thousand prompt tokens")
+    parser.add_argument("--phase", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        run_phase(args)
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, "-m", "benchmarks.bench_history", "--turns", str(args.turns), "--files", str(args.files),
+               "--latency", str(args.latency), "--prefill-ms", str(args.prefill_ms)]
+    for mode, overrides in MODES.items():
+        env = dict(os.environ, USE_SAMPLE_OVERVIEW="false", RESPONSE_CACHE="false", SANDBOX_PREWARM="false",
+                   PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])), **overrides)
+        output = subprocess.run(command + ["--phase", mode], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        turns = result["turns"]
+        marks = sorted({1, 10, 25, len(turns)} & set(range(1, len(turns) + 1)))
+        print(f"{mode:<8} prompt tokens " + " ".join(f"t{n}={turns[n - 1]['prompt_tokens']}" for n in marks)
+              + f"  /ask p50 last 10={statistics.median(t['seconds'] for t in turns[-10:]) * 1000:.1f}ms"
+              + f" first 10={statistics.median(t['seconds'] for t in turns[:10]) * 1000:.1f}ms"
+              + "  checkpoints " + " ".join(f"t{n}={turns[n - 1]['db_bytes'] / 1e6:.2f}MB" for n in marks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Standard metrics through the deterministic metric engine vs the financial_calculator agent path.
+
+The agent path uses a fake model with --latency seconds per call, so it measures the overhead only.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_metrics --periods 5000 --calls 200 --latency 0.5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_llm import fake_chat_model_factory
+from flask_app import llm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--periods", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--agent-calls", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    llm.ChatOpenAI = fake_chat_model_factory(args.latency, ["Gross margin is 60.00%."])
+    from flask_app.agent_utils import financial_calculator, metric_calculator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.csv")
+        pd.DataFrame({"Period": range(args.periods),
+                      "Revenue": np.arange(1, args.periods + 1) * 10.0,
+                      "COGS": np.arange(1, args.periods + 1) * 4.0}).to_csv(path, index=False)
+        inputs = {"revenue": "Revenue", "cogs": "COGS"}
+
+        metric_calculator.invoke({"file_path": path, "metric": "gross_margin", "inputs": inputs})
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            metric_calculator.invoke({"file_path": path, "metric": "gross_margin", "inputs": inputs})
+        engine = args.calls / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(args.agent_calls):
+            financial_calculator.invoke({"file_path": path, "metric": "gross margin",
+                                         "context": "Revenue and COGS columns"})
+        agent = args.agent_calls / (time.perf_counter() - start)
+
+    print(f"metric engine:        {engine:10.1f} metrics/s")
+    print(f"financial_calculator: {agent:10.1f} metrics/s (fake model, {args.latency}s per call)")
+
+
+if __name__ == "__main__":
+    main()
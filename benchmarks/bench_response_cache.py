@@ -0,0 +1,85 @@
+"""Latency of /ask for new questions versus repeated ones served from the response cache.
+
+Answers are only reused after the same objective and questions on the same files, so the
+repeats are asked in a second session on the same archive, in the same order. The stub
+model words every answer differently, as a real model does, so the second session's
+objective analysis differs from the first one's.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_response_cache --questions 20 --latency 0.5
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.bench_endpoints import make_corpus
+from benchmarks.fake_llm import ScriptedToolModel
+
+
+class VaryingAnswerModel(ScriptedToolModel):
+    """ScriptedToolModel whose answers are worded differently on every call."""
+
+    def _generate(self, *args, **kwargs):
+        result = super()._generate(*args, **kwargs)
+        message = result.generations[0].message
+        if message.content:
+            message.content += f" (wording {uuid.uuid4().hex[:8]})"
+        return result
+
+
+def ask_all(client, questions):
+    timings, hits = [], 0
+    for question in questions:
+        start = time.perf_counter()
+        response = client.post("/ask", json={"question": question}).get_json()
+        timings.append(time.perf_counter() - start)
+        hits += response.get("cache", {}).get("hit", False)
+    return timings, hits
+
+
+def upload(client, archive):
+    """Start a new session on the archive."""
+    response = client.post("/upload", data={"file": (io.BytesIO(archive), "DataRoom.zip"),
+                                            "objective": "Summarize revenue"},
+                           content_type="multipart/form-data")
+    job_id = response.get_json()["job_id"]
+    while client.get(f"/jobs/{job_id}").get_json()["status"] in ("queued", "running"):
+        time.sleep(0.02)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per model call")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    os.environ["USE_SAMPLE_OVERVIEW"] = "false"
+    os.environ["RESPONSE_CACHE"] = "true"
+
+    from flask_app import llm, create_app
+    llm.ChatOpenAI = lambda *a, **kw: VaryingAnswerModel(latency=args.latency)
+    app = create_app()
+    client = app.test_client()
+
+    # The same bytes both times: spreadsheets embed their creation time
+    archive = make_corpus(12)
+    questions = [f"What was the gross margin in FY{2000 + i}?" for i in range(args.questions)]
+    # The repeats differ in case only, which normalization removes
+    repeats = [question.upper() for question in questions]
+    for label, batch in (("new", questions), ("repeated", repeats)):
+        upload(client, archive)
+        timings, hits = ask_all(client, batch)
+        print(f"{label:<9} n={len(timings):<4} hits={hits:<4} p50={statistics.median(timings) * 1000:8.1f}ms "
+              f"max={max(timings) * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Startup latency saved by pre-warmed sandbox workers and throughput under concurrent calls.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sandbox --workers 4 --sessions 16 --calls 20
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_app.sandbox import SandboxPool
+
+CODE = """
+import pandas as pd
+df = pd.DataFrame({"revenue": range(1000), "cogs": range(0, 2000, 2)})
+print(((df.revenue - df.cogs) / df.revenue.clip(lower=1)).mean())
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=20,
+                        help="Calls per session")
+    args = parser.parse_args()
+
+    # Cold: spawn a worker and wait for the first result
+    start = time.perf_counter()
+    cold_pool = SandboxPool(1, cpu_seconds=60, memory_bytes=0, wall_timeout=120)
+    cold_pool.run(CODE, "cold")
+    cold = time.perf_counter() - start
+    cold_pool.close()
+
+    pool = SandboxPool(args.workers, cpu_seconds=60, memory_bytes=0, wall_timeout=120)
+    for index in range(args.workers):
+        pool.run("pass", f"warmup-{index}")
+    start = time.perf_counter()
+    pool.run(CODE, "warm")
+    warm = time.perf_counter() - start
+    print(f"first call cold: {cold * 1000:.0f} ms, pre-warmed: {warm * 1000:.0f} ms "
+          f"(saved {(cold - warm) * 1000:.0f} ms)")
+
+    def session_calls(session_index):
+        for _ in range(args.calls):
+            pool.run(CODE, f"session-{session_index}")
+
+    for concurrency in sorted({1, args.workers, args.sessions}):
+        total = concurrency * args.calls
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(session_calls, range(concurrency)))
+        elapsed = time.perf_counter() - start
+        print(f"{concurrency:>3} concurrent sessions: {total / elapsed:8.1f} calls/s")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
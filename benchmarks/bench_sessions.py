@@ -0,0 +1,93 @@
+"""Drive many concurrent sessions through /upload and /ask with a stub model.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sessions --sessions 50 --questions 5 --latency 0.05
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_llm import fake_chat_model_factory
+
+
+def make_zip(n_files=5):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for i in range(n_files):
+            zf.writestr(f"DataRoom/finance/report_{i}.txt",
+                        f"Revenue for FY{20 + i} was {i * 1000}.\n")
+    return buffer.getvalue()
+
+
+def run_session(app, archive, n_questions):
+    client = app.test_client()
+    timings = []
+
+    start = time.perf_counter()
+    response = client.post("/upload", data={
+        "file": (io.BytesIO(archive), "DataRoom.zip"),
+        "objective": "Summarize revenue",
+    }, content_type="multipart/form-data")
+    assert response.status_code == 202, response.data
+    job_id = response.get_json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    timings.append(("upload", time.perf_counter() - start))
+    assert job["status"] == "succeeded", job
+
+    for i in range(n_questions):
+        start = time.perf_counter()
+        response = client.post("/ask", json={"question": f"Question {i}?"})
+        timings.append(("ask", time.perf_counter() - start))
+        assert response.status_code == 200 and b"response" in response.data, response.data
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    repo_root = os.getcwd()
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.environ["USE_SAMPLE_OVERVIEW"] = "false"
+    sys.path.insert(0, repo_root)
+
+    from flask_app import llm, create_app
+    llm.ChatOpenAI = fake_chat_model_factory(latency=args.latency)
+    app = create_app()
+    archive = make_zip()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: run_session(app, archive, args.questions),
+                                range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    from flask_app.sessions import session_manager
+    for kind in ("upload", "ask"):
+        samples = sorted(t for timings in results for k, t in timings if k == kind)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{kind:<7} n={len(samples):<5} p50={statistics.median(samples) * 1000:8.1f}ms "
+              f"p95={p95 * 1000:8.1f}ms")
+    total = sum(len(timings) for timings in results)
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s), "
+          f"{len(session_manager)} sessions resident")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Cold start: import time and RSS at boot, and what serving /, /images and /example loads.
+
+Each run boots the app in a fresh interpreter, then requests /, /images and /example and
+finally runs the warm-up hook. After each step it reports the elapsed time, the peak RSS
+and which of the heavy modules are loaded. The sandbox and chart workers are not
+pre-warmed, so only the web process is measured.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PARSING_STACK = ["pandas", "numpy", "pyarrow", "openpyxl", "matplotlib",
+                 "langchain_community", "unstructured"]
+# langchain_openai imports tiktoken itself
+AGENT_STACK = ["langgraph", "langchain_openai", "openai", "tiktoken"]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child():
+    start = time.perf_counter()
+    steps = []
+
+    def record(name):
+        steps.append({"step": name, "seconds": time.perf_counter() - start, "rss_mb": peak_rss_mb(),
+                      "loaded": [module for module in PARSING_STACK + AGENT_STACK if module in sys.modules]})
+
+    from flask_app import create_app
+    app = create_app()
+    record("boot")
+
+    client = app.test_client()
+    for path in ("/", "/images", "/example"):
+        assert client.get(path).status_code == 200, path
+        record(path)
+
+    from flask_app.controllers import warm_up
+    warm_up()
+    record("warm_up")
+    print(json.dumps(steps))
+
+
+def write_example(directory):
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        from flask_app.example_processing import save_example_data
+        from flask_app.tree import CompactTree
+
+        tree = CompactTree("DataRoom")
+        for i in range(200):
+            tree.add_file(f"DataRoom/folder_{i % 10}/report_{i}.txt", f"Summary of report {i}.")
+        save_example_data("Example analysis.", json.loads(tree.to_json()), "Summarize revenue", tree.to_text())
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    directory = tempfile.mkdtemp()
+    write_example(directory)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, SANDBOX_PREWARM="false", WARMUP="false",
+               PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    # /example builds the agent; no request reaches the model
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child"], cwd=directory,
+                                env=env, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    for i, step in enumerate(runs[0]):
+        seconds = statistics.median(run[i]["seconds"] for run in runs)
+        rss = statistics.median(run[i]["rss_mb"] for run in runs)
+        parsing = [module for module in step["loaded"] if module in PARSING_STACK]
+        agent = [module for module in step["loaded"] if module in AGENT_STACK]
+        print(f"{step['step']:<9} t={seconds * 1000:8.1f}ms rss={rss:7.1f}MB "
+              f"parsing=[{', '.join(parsing)}] agent=[{', '.join(agent)}]")
+
+
+if __name__ == "__main__":
+    main()
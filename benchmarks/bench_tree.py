@@ -0,0 +1,113 @@
+"""Build/render time and prompt size of the directory tree: anytree (previous) vs CompactTree.
+
+Synthetic data rooms of empty files are created in a temporary directory; summaries are
+fake 20 word strings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tree --files 1000 10000 50000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from anytree import Node, RenderTree
+from anytree.exporter import JsonExporter
+
+from flask_app.config import Config
+from flask_app.context_packing import count_tokens
+from flask_app.tree import CompactTree
+
+EXTENSIONS = [".pdf", ".xlsx", ".docx", ".csv", ".txt"]
+SUMMARY = "Quarterly revenue, gross margin and headcount by region with management commentary for the board of directors."
+
+
+def make_data_room(root, first, last, files_per_folder=200):
+    """Create files doc_<first>..doc_<last - 1>; returns their paths."""
+    paths = []
+    for index in range(first, last):
+        project = index // files_per_folder
+        folder = os.path.join(root, f"dept_{project % 7}", f"project_{project}")
+        os.makedirs(folder, exist_ok=True)
+        paths.append(os.path.join(folder, f"doc_{index}{EXTENSIONS[index % len(EXTENSIONS)]}"))
+        open(paths[-1], "w").close()
+    return paths
+
+
+def anytree_overview(start_path):
+    """The previous implementation: anytree nodes, JsonExporter and RenderTree with string concatenation."""
+    file_type_count = {}
+
+    def add_nodes(parent, path, label):
+        for entry in sorted(os.scandir(path), key=lambda e: e.name):
+            if entry.is_file():
+                file_type = os.path.splitext(entry.name)[1].lower()
+                file_type_count[file_type] = file_type_count.get(file_type, 0) + 1
+                name = f"{entry.name} (Path: {entry.path}) (Content Summary: {SUMMARY})" if label else entry.name
+                node = Node(name, parent=parent)
+                if not label:
+                    node.file_analysis = SUMMARY
+            elif entry.is_dir():
+                add_nodes(Node(entry.name, parent=parent), entry.path, label)
+
+    def metadata(root):
+        metadata_node = Node("metadata", parent=root)
+        for file_type, count in file_type_count.items():
+            Node(f"{file_type}: {count}", parent=metadata_node)
+
+    root = Node(os.path.basename(start_path))
+    add_nodes(root, start_path, False)
+    metadata(root)
+    tree_json = JsonExporter().export(root)
+
+    file_type_count.clear()
+    root = Node(os.path.basename(start_path))
+    add_nodes(root, start_path, True)
+    metadata(root)
+    text = ""
+    for pre, fill, node in RenderTree(root):
+        text += f"{pre}{node.name}.\n"
+    return tree_json, text
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 10000, 50000, 100000])
+    parser.add_argument("--added", type=int, default=100,
+                        help="Files added to an existing tree for the incremental update")
+    args = parser.parse_args()
+
+    print(f"{'files':>7} {'anytree ms':>11} {'compact ms':>11} {'json ms':>8} {'text ms':>8} "
+          f"{'full prompt tok':>16} {'collapsed tok':>14} {'add ms':>7} {'rebuild ms':>11}")
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = os.path.join(tmp, "DataRoom")
+            make_data_room(root, 0, n_files)
+
+            (_, full_text), anytree_time = timed(lambda: anytree_overview(root))
+
+            tree, build_time = timed(lambda: CompactTree.from_directory(root))
+            for index, _ in tree.files():
+                tree.analyses[index] = SUMMARY
+            _, json_time = timed(tree.to_json)
+            collapsed, text_time = timed(lambda: tree.to_text(
+                True, Config.TREE_TEXT_MAX_DEPTH, Config.TREE_TEXT_GROUP_THRESHOLD))
+
+            added = make_data_room(root, n_files, n_files + args.added)
+            _, add_time = timed(lambda: [tree.add_file(path, SUMMARY) for path in added])
+            _, rebuild_time = timed(lambda: CompactTree.from_directory(root))
+
+            print(f"{n_files:>7} {anytree_time * 1000:>11.0f} {(build_time + json_time + text_time) * 1000:>11.0f} "
+                  f"{json_time * 1000:>8.0f} {text_time * 1000:>8.0f} {count_tokens(full_text):>16} "
+                  f"{count_tokens(collapsed):>14} {add_time * 1000:>7.1f} {rebuild_time * 1000:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Initial tree view: the whole tree JSON (previous /upload response) vs the lazy /tree endpoints.
+
+For each size, a synthetic tree is saved as a session tree and fetched through the Flask
+test client. The lazy view is GET /tree plus the first page of the root's children, which
+is what tree.js loads before it can render.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tree_api --files 1000 20000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.bench_tree import SUMMARY
+
+
+def make_tree(n_files, files_per_folder=200):
+    from flask_app.tree import CompactTree
+
+    tree = CompactTree(os.path.join("uploads", "DataRoom"))
+    for index in range(n_files):
+        project = index // files_per_folder
+        path = os.path.join("uploads", "DataRoom", f"dept_{project % 7}",
+                            f"project_{project}", f"doc_{index}.pdf")
+        tree.add_file(path, SUMMARY)
+    return tree
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 20000, 100000])
+    args = parser.parse_args()
+
+    os.environ["SANDBOX_PREWARM"] = "false"
+    os.chdir(tempfile.mkdtemp())
+    from flask_app import create_app
+    from flask_app.tree import save_session_tree
+
+    app = create_app()
+    client = app.test_client()
+
+    print(f"{'files':>7} {'full json ms':>13} {'full json KB':>13} {'lazy view ms':>13} {'lazy view KB':>13}")
+    for n_files in args.files:
+        tree = make_tree(n_files)
+        thread_id = str(uuid.uuid4())
+        save_session_tree(thread_id, tree)
+        with client.session_transaction() as session:
+            session["thread_id"] = thread_id
+
+        full, full_time = timed(tree.to_json)
+
+        def lazy_view():
+            root = client.get("/tree")
+            children = client.get("/tree/0/children")
+            assert root.status_code == 200 and children.status_code == 200
+            return len(root.data) + len(children.data)
+
+        client.get("/tree")  # first request parses the saved tree
+        size, lazy_time = timed(lazy_view)
+
+        print(f"{n_files:>7} {full_time * 1000:>13.1f} {len(full) / 1024:>13.0f} "
+              f"{lazy_time * 1000:>13.2f} {size / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
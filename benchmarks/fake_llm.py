@@ -0,0 +1,71 @@
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class SlowFakeChatModel(FakeListChatModel):
+    """FakeListChatModel that sleeps for `latency` seconds before every response."""
+
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+class ToolFreeFakeChatModel(SlowFakeChatModel):
+    """Slow fake model that can be handed to the agent executors; it never calls tools."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def fake_chat_model_factory(latency=0.0, responses=None):
+    """Drop-in replacement for the ChatOpenAI constructor returning fake models."""
+    responses = responses or ["Synthetic 20 word summary of the file contents."]
+
+    def factory(*args, **kwargs):
+        return ToolFreeFakeChatModel(responses=responses, latency=latency)
+
+    return factory
+
+
+class ScriptedToolModel(BaseChatModel):
+    """Stub that answers a question by calling document_search once, then replying.
+
+    Responses depend only on the messages, so a recording of it replays exactly.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "scripted-tool-model"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        time.sleep(self.latency)
+        tool_names = {tool["function"]["name"] for tool in tools or []}
+        last = messages[-1]
+        if "document_search" in tool_names and isinstance(last, HumanMessage):
+            message = AIMessage(content="", tool_calls=[{
+                "name": "document_search", "args": {"query": str(last.content)[:200]},
+                "id": f"call_{len(messages)}"}])
+        else:
+            message = AIMessage(content=f"Synthetic answer based on {len(messages)} messages.")
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"token_usage": {"prompt_tokens": 100, "completion_tokens": 20}})
+
+
+def scripted_chat_model_factory(latency=0.0):
+    """Drop-in replacement for the ChatOpenAI constructor returning ScriptedToolModel."""
+    def factory(*args, **kwargs):
+        return ScriptedToolModel(latency=latency)
+
+    return factory
@@ -1,11 +1,39 @@
+import multiprocessing
+import secrets
+import threading
 from flask import Flask
 from flask_app.config import Config
+from flask_app.ingestion import UploadRequest
 
 
-def create_app():
+def create_app(prewarm=True):
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Uploads are spooled where the upload jobs can take them over without a copy
+    app.request_class = UploadRequest
+
+    if not app.config.get("SECRET_KEY"):
+        print("SECRET_KEY is not set: using a random key, so sessions are not shared between workers or restarts")
+        app.config["SECRET_KEY"] = secrets.token_hex(32)
+
+    # Spawned pool workers re-import the main module; they must not start pools of their own
+    if prewarm and Config.SANDBOX_PREWARM == "true" and multiprocessing.parent_process() is None:
+        # Start the python_repl workers (pandas, numpy and matplotlib imported) in the background
+        from flask_app.sandbox import get_sandbox_pool
+        threading.Thread(target=get_sandbox_pool, daemon=True).start()
+
+        from flask_app.charts import get_chart_renderer
+        threading.Thread(target=lambda: get_chart_renderer().prewarm(),
+                         daemon=True).start()
 
     with app.app_context():
         from flask_app import routes
-        return app
+
+    # Parse the example bundle now rather than on the first /example request
+    from flask_app.example_processing import get_example_bundle
+    get_example_bundle()
+
+    if Config.WARMUP == "true":
+        from flask_app.controllers import warm_up
+        threading.Thread(target=warm_up, daemon=True).start()
+    return app
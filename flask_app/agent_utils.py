@@ -1,66 +1,119 @@
-from typing import TypedDict, Dict
+from typing import Dict, List, Optional
 from langchain_core.tools import tool
 from typing import Annotated
-from langchain_openai import ChatOpenAI
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain_experimental.utilities import PythonREPL
 from langgraph.prebuilt import chat_agent_executor
 from dotenv import load_dotenv
-import os
-from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from flask_app.context_packing import pack_file
+from flask_app.llm import get_chat_model
+from flask_app.sandbox import run_python, current_session_id
+from flask_app.charts import CHART_TYPES, IMAGE_FORMATS, get_chart_renderer
+from flask_app.config import Config
+from flask_app.metrics import METRICS, calculate, normalize_metric
+from flask_app.response_cache import cached_file_tool
+from functools import lru_cache
 
 
-repl = PythonREPL()
 load_dotenv()
 
 
+@tool
+def get_file_content(file_path: Annotated[str, "Path of the file to analyze. Has to be with respect to the root directory."]):
+    """Use this tool to get the content of the file. This will return the content of the file."""
+    try:
+        # Large spreadsheets come back as schema, summary and sampled rows within the token budget
+        return pack_file(file_path)
+    except Exception as e:
+        print(f"Error parsing file {file_path}: {e}")
+        return "Error retrieving file content."
+
+
+@tool
+def python_repl(
+    code: Annotated[str,
+                    "The python code to perform calculations. To access the output, you must add a print statement."]
+):
+    """Use this to execute python code where you need to perform calculations. To access the output, you must add a print statement. Not using print statement will not return any output."""
+    try:
+        result = run_python(code)
+    except Exception as e:
+        return f"Failed to execute. Error: {repr(e)}"
+
+    if result == "":
+        result = "No output from the code. Please add a print statement to get the output."
+
+    result = f"Code:\n```python\n{code}\n```\nStdout: {result}"
+    return result
+
+
+# Sub-agent graphs are compiled once per process. Everything specific to a call (file
+# path, objective, instructions) goes in through the messages, never through closures.
+@lru_cache(maxsize=None)
+def get_file_analysis_agent():
+    return chat_agent_executor.create_tool_calling_executor(
+        get_chat_model("gpt-4o"), [python_repl, get_file_content])
+
+
+@lru_cache(maxsize=None)
+def get_financial_calculator_agent():
+    return chat_agent_executor.create_tool_calling_executor(
+        get_chat_model("gpt-4o"), [python_repl, get_file_content])
+
+
+FILE_ANALYSIS_SYSTEM_MESSAGE = "You are a helpful AI. You will be given a file path. Your job is to analyze the file to achieve the objective. Use your tools to achieve the objective. Be as precise as possible when analyzing the file. Always cite what information you've used and what process you've followed to get the result. If you're making assumptions, state and justify them. If you're dealing with an excel file with a high volume of numerical data, return calculate this using the financial calculator."
+
+FINANCIAL_CALCULATOR_SYSTEM_MESSAGE = """You are a helpful AI that specializes in financial analysis. Your job is to calculate a financial metric. You will be given file file. Use your tools to get the content of the file and perform any calculations needed. 
+        
+        Always cite what information you've used. Always outline the process you've followed to get the result. If you're making assumptions, state and justify them.
+        
+        If you're dealing with an excel file with a high volume of numerical data, use the python_repl tool to read and analyze the data.
+
+        In python_repl, load_table(file_path, sheet) returns a sheet of an excel or csv file as a pandas DataFrame. It reads a pre-extracted copy and is much faster than reading the file directly.
+        """
+
+
+class ChartSeries(BaseModel):
+    name: str = Field(description="Name of the series, shown in the legend.")
+    values: List[float] = Field(
+        description="One value per label, in the same order as labels.")
+
+
+class ChartSpec(BaseModel):
+    chart_type: str = Field(
+        description=f"One of: {', '.join(CHART_TYPES)}.")
+    title: str = Field(description="Title of the chart.")
+    labels: List[str] = Field(
+        description="Categories or periods on the x axis (slice names for pie charts).")
+    series: List[ChartSeries] = Field(
+        description="Data series to plot. Pie charts use the first series only.")
+    x_label: Optional[str] = Field(default=None, description="Label of the x axis.")
+    y_label: Optional[str] = Field(default=None, description="Label of the y axis.")
+    citation: Optional[str] = Field(
+        default=None, description="Source of the numbers (file, sheet), printed under the chart.")
+    image_format: Optional[str] = Field(
+        default=None, description=f"One of: {', '.join(IMAGE_FORMATS)}. Leave empty for the default.")
+
+
 class ChartGenerator(BaseModel):
-    instructions: str = Field(
-        description="Instructions to generate the chart. Instructions should be clear and concise. Provide the numbers to generate the chart and any other calculations")
+    charts: List[ChartSpec] = Field(
+        description="Charts to generate. Provide all the numbers; several charts can be generated at once.")
 
 
 @tool("chart_generation", args_schema=ChartGenerator, return_direct=True)
-def chart_generation(instructions: str) -> str:
+def chart_generation(charts: List[ChartSpec]) -> str:
     # Do not remove this docstring
-    "Use this to provide instructions to generate a chart. The instructions must be clear and concise. All relevant numbers and calculations must be provided. If the chart is generated successfully, return value will be 'Image saved'. If the chart is not generated, return value will be the error message."
-
-    @tool
-    def python_repl(
-        code: Annotated[str,
-                        "The python code to execute to generate your chart and perform calculations."]
-    ):
-        """Use this to execute python code. This will return the output of the code"""
-        try:
-            result = repl.run(code)
-        except Exception as e:
-            return f"Failed to execute. Error: {repr(e)}"
-        result_ret = f"Code:\n```python\n{code}\n```\nStdout: {result}"
-        return result_ret
-
-    tools = [python_repl]
-    llm = ChatOpenAI(model="gpt-4")
-
-    system_message = """You are a helpful AI assistant, collaborating with other assistants. Your job is to generate a chart based on the instructions provided. Use your tools to generate the chart.
-    
-Use a non-interactive backend. For example, (matplotlib.use('Agg')). Do not view the chart. This is to make sure we avoid this error: NSWindow should only be instantiated on the main thread! Do not start Matplotlib GUI.
-    
-Save the image to the 'uploads/images' folder with an appropriate name. Add citation to chart if present. Attempt at least 2 times to generate the chart. 
-
-If you are unable to generate the chart, provide the error message. If you are able to generate the chart and save the image, return Image saved."""
-
-    human_message = instructions
-
-    tools = [python_repl]
-    agent_executor = chat_agent_executor.create_tool_calling_executor(
-        llm, tools)
-    response = agent_executor.invoke(
-        {"messages": [SystemMessage(
-            content=system_message), HumanMessage(content=human_message)]}
-    )
-    return response["messages"][-1].content
+    "Use this to generate charts from the numbers you already have. If the charts are generated successfully, return value will start with 'Image saved'. If not, return value will be the error message."
+
+    try:
+        specs = [chart.dict(exclude_none=True) if isinstance(chart, BaseModel)
+                 else {key: value for key, value in chart.items() if value is not None}
+                 for chart in charts]
+        names = get_chart_renderer().render_many(specs)
+        return "Image saved: " + ", ".join(names)
+    except Exception as e:
+        print(f"Error generating chart: {e}")
+        return f"Error generating chart: {e}"
 
 
 class FileAnalyzer(BaseModel):
@@ -75,56 +128,17 @@ def file_analysis(file_path: str, objective: str) -> str:
     # Do not remove this docstring
     "Use this tool to analyze a file with a given objective. If the file is not parsed correctly, it will return an error message."
 
-    try:
+    return cached_file_tool("file_analysis", file_path, {"file_path": file_path, "objective": objective},
+                            lambda: _file_analysis(file_path, objective))
 
-        @tool
-        def get_file_content(file_path: Annotated[str, "Path of the file to analyze. Has to be with respect to the root directory."]):
-            """Use this tool to get the content of the file. This will return the content of the file."""
-            try:
-                loader = UnstructuredFileLoader(file_path)
-                docs = loader.load()
-                context = "\n\n".join([d.page_content for d in docs])
-
-                if ".xlsx" in file_path and len(context.splitlines()) > 200:
-                    warning = "WARNING: Content length is longer than recommended for emulating in python using StringIO. Read file directly in python code from file path."
-                    context_with_warning = f"{warning}\n\n{context}"
-                    return context_with_warning
-
-                return context
-            except Exception as e:
-                print(f"Error parsing file {file_path}: {e}")
-                return "Error retrieving file content."
-
-        @tool
-        def python_repl(
-            code: Annotated[str,
-                            "The python code to perform calculations. To access the output, you must add a print statement."]
-        ):
-            """Use this to execute python code where you need to perform calculations. To access the output, you must add a print statement. Not using print statement will not return any output."""
-            try:
-                result = repl.run(code)
-            except Exception as e:
-                return f"Failed to execute. Error: {repr(e)}"
-
-            if result == "":
-                result = "No output from the code. Please add a print statement to get the output."
-
-            result = f"Code:\n```python\n{code}\n```\nStdout: {result}"
-            return result
-
-        llm = ChatOpenAI(model='gpt-4o')
-
-        tools = [python_repl, get_file_content]
-        agent_executor = chat_agent_executor.create_tool_calling_executor(
-            llm, tools)
-
-        system_message = "You are a helpful AI. You will be given a file path. Your job is to analyze the file to achieve the objective. Use your tools to achieve the objective. Be as precise as possible when analyzing the file. Always cite what information you've used and what process you've followed to get the result. If you're making assumptions, state and justify them. If you're dealing with an excel file with a high volume of numerical data, return calculate this using the financial calculator."
 
+def _file_analysis(file_path, objective):
+    try:
         human_message = f"Objective: {objective}. \nFile Path:{file_path}"
 
-        response = agent_executor.invoke(
+        response = get_file_analysis_agent().invoke(
             {"messages": [SystemMessage(
-                content=system_message), HumanMessage(content=human_message)]}
+                content=FILE_ANALYSIS_SYSTEM_MESSAGE), HumanMessage(content=human_message)]}
         )
 
         if response["messages"][-1].content == "":
@@ -153,61 +167,18 @@ def financial_calculator(file_path: str, metric: str, context: str) -> str:
     # Do not remove this docstring
     "Use this tool to calculate financial metrics."
 
-    try:
-        @tool
-        def get_file_content(file_path: Annotated[str, "Path of the file to analyze. Has to be with respect to the root directory."]):
-            """Use this tool to get the content of the file. This will return the content of the file."""
-            try:
-                loader = UnstructuredFileLoader(file_path)
-                docs = loader.load()
-                context = "\n\n".join([d.page_content for d in docs])
-
-                if ".xlsx" in file_path and len(context.splitlines()) > 200:
-                    warning = "WARNING: Content length is longer than recommended for emulating in python using StringIO. Read file directly in python code from file path."
-                    context_with_warning = f"{warning}\n\n{context}"
-                    return context_with_warning
-
-                return context
-
-            except Exception as e:
-                print(f"Error parsing file {file_path}: {e}")
-                return "Error retrieving file content."
-
-        @tool("python_repl")
-        def python_repl(
-            code: Annotated[str,
-                            "The python code to perform calculations. To access the output, you must add a print statement."]
-        ):
-            """Use this to execute python code where you need to perform calculations. To access the output, you must add a print statement. Not using print statement will not return any output."""
-            try:
-                result = repl.run(code)
-            except Exception as e:
-                return f"Failed to execute. Error: {repr(e)}"
-
-            if result == "":
-                result = "No output from the code. Please add a print statement to get the output."
-
-            result = f"Code:\n```python\n{code}\n```\nStdout: {result}"
-            return result
-
-        llm = ChatOpenAI(model='gpt-4o')
-
-        tools = [python_repl, get_file_content]
-        agent_executor = chat_agent_executor.create_tool_calling_executor(
-            llm, tools)
-
-        system_message = """You are a helpful AI that specializes in financial analysis. Your job is to calculate a financial metric. You will be given file file. Use your tools to get the content of the file and perform any calculations needed. 
-        
-        Always cite what information you've used. Always outline the process you've followed to get the result. If you're making assumptions, state and justify them.
-        
-        If you're dealing with an excel file with a high volume of numerical data, use the python_repl tool to read and analyze the data.
-        """
+    return cached_file_tool("financial_calculator", file_path,
+                            {"file_path": file_path, "metric": metric, "context": context},
+                            lambda: _financial_calculator(file_path, metric, context))
 
+
+def _financial_calculator(file_path, metric, context):
+    try:
         human_message = f"Metric: {metric}. \n\nFile:\n{file_path}.\n\nContext: {context}"
 
-        response = agent_executor.invoke(
+        response = get_financial_calculator_agent().invoke(
             {"messages": [SystemMessage(
-                content=system_message), HumanMessage(content=human_message)]}
+                content=FINANCIAL_CALCULATOR_SYSTEM_MESSAGE), HumanMessage(content=human_message)]}
         )
 
         if response["messages"][-1].content == "":
@@ -217,3 +188,63 @@ def financial_calculator(file_path: str, metric: str, context: str) -> str:
     except Exception as e:
         print(f"Error parsing file: {e}")
         return f"Error analyzing file {e}"
+
+
+class DocumentSearch(BaseModel):
+    query: str = Field(
+        description="What to look for in the uploaded documents. Use the words you expect the passage to contain.")
+
+
+@tool("document_search", args_schema=DocumentSearch)
+def document_search(query: str) -> str:
+    # Do not remove this docstring
+    "Use this tool to find which files, and which passages in them, are relevant to a question. Returns the best matching passages with their file paths. Use it before analyzing files to pick the right ones."
+
+    try:
+        from flask_app.doc_index import get_session_index
+        index = get_session_index(current_session_id.get())
+        if index is None:
+            return "No document index is available for this upload."
+
+        results = index.search(query, Config.DOCUMENT_SEARCH_RESULTS)
+        if not results:
+            return "No matching passages found."
+
+        return "\n\n".join(
+            f"File: {result['path']} (score {result['score']:.2f})\n{result['text'][:800]}"
+            for result in results)
+    except Exception as e:
+        print(f"Error searching documents: {e}")
+        return f"Error searching documents {e}"
+
+
+class MetricCalculator(BaseModel):
+    file_path: str = Field(
+        description="Path of the excel or csv file. Has to be with respect to the root directory.")
+    metric: str = Field(
+        description=f"Metric to calculate. Known metrics: {', '.join(METRICS)}.")
+    inputs: Dict[str, str] = Field(
+        description="Maps each input of the metric to a column name (or a row label when orientation is 'rows'). Inputs per metric: "
+        + "; ".join(f"{name}: {', '.join(required)}" for name, (_, required, _) in METRICS.items()))
+    sheet: Optional[str] = Field(
+        default=None, description="Sheet name. Defaults to the first sheet.")
+    orientation: str = Field(
+        default="columns", description="'columns' if each input is a column, 'rows' if each input is a row labelled in the first column with periods as columns.")
+
+
+@tool("metric_calculator", args_schema=MetricCalculator)
+def metric_calculator(file_path: str, metric: str, inputs: Dict[str, str], sheet: Optional[str] = None, orientation: str = "columns") -> str:
+    # Do not remove this docstring
+    "Use this tool to calculate standard financial metrics (growth, CAGR, margins, EBITDA, ratios, totals) from an excel or csv file. Results are computed exactly and shown with two decimals; long series show their first and last rows. Use financial_calculator for anything else."
+
+    if normalize_metric(metric) not in METRICS:
+        context = f"Inputs: {inputs}. Sheet: {sheet or 'first'}. Orientation: {orientation}."
+        return financial_calculator.invoke({"file_path": file_path, "metric": metric, "context": context})
+
+    try:
+        return calculate(file_path, metric, inputs, sheet, orientation)
+    except (KeyError, ValueError) as e:
+        return f"Error calculating {metric}: {e}"
+    except Exception as e:
+        print(f"Error calculating metric {metric} from {file_path}: {e}")
+        return f"Error calculating {metric}: {e}"
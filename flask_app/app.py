@@ -1,6 +1,9 @@
-from flask_app import create_app
+from werkzeug.serving import is_running_from_reloader
 
-app = create_app()
+from flask_app import create_app
 
 if __name__ == '__main__':
+    # With debug=True this process only watches for changes and the server runs in the
+    # reloader's child, so only the child prewarms the sandbox and chart pools
+    app = create_app(prewarm=is_running_from_reloader())
     app.run(debug=True)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def request_key(model, messages, tools=None):
+    """Hash of what determines a model response: model, messages (without tool call ids) and bound tools."""
+    def message_data(message):
+        data = {"type": message.type, "content": message.content}
+        if isinstance(message, AIMessage) and message.tool_calls:
+            data["tool_calls"] = [(call["name"], call["args"]) for call in message.tool_calls]
+        if isinstance(message, ToolMessage):
+            data.pop("type")
+            data["tool"] = True
+        return data
+
+    tool_names = sorted(tool["function"]["name"] for tool in tools or [])
+    payload = json.dumps({"model": model, "messages": [message_data(m) for m in messages],
+                          "tools": tool_names}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Cassette:
+    """Recorded model responses in a JSON lines file, keyed by request_key.
+
+    A request recorded several times is replayed in recording order, wrapping around.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._responses = {}  # key -> list of responses
+        self._positions = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses.setdefault(entry["key"], []).append(entry["response"])
+
+    def __len__(self):
+        return sum(len(responses) for responses in self._responses.values())
+
+    def record(self, key, model, response):
+        entry = {"key": key, "model": model, "response": response}
+        with self._lock:
+            self._responses.setdefault(key, []).append(response)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def replay(self, key):
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return responses[position % len(responses)]
+
+
+def _result_to_response(result):
+    message = result.generations[0].message
+    return {"content": message.content,
+            "tool_calls": getattr(message, "tool_calls", None) or [],
+            "token_usage": (result.llm_output or {}).get("token_usage")}
+
+
+def _response_to_result(response, model):
+    message = AIMessage(content=response["content"], tool_calls=response["tool_calls"])
+    llm_output = {"model_name": model}
+    if response.get("token_usage"):
+        llm_output["token_usage"] = response["token_usage"]
+    return ChatResult(generations=[ChatGeneration(message=message)], llm_output=llm_output)
+
+
+class _CassetteChatModel(BaseChatModel):
+    model_name: str
+    cassette: Any
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+
+class RecordingChatModel(_CassetteChatModel):
+    """Calls the live model and appends every response to the cassette."""
+
+    live_model: Any
+
+    @property
+    def _llm_type(self):
+        return "recording-chat-model"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        result = self.live_model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.cassette.record(request_key(self.model_name, messages, kwargs.get("tools")),
+                             self.model_name, _result_to_response(result))
+        return result
+
+
+class ReplayChatModel(_CassetteChatModel):
+    """Serves recorded responses, after latency seconds, without any network access."""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "replay-chat-model"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        key = request_key(self.model_name, messages, kwargs.get("tools"))
+        response = self.cassette.replay(key)
+        if response is None:
+            raise KeyError(
+                f"No recorded {self.model_name} response for request {key[:12]} in {self.cassette.path}. "
+                "Record it with LLM_MODE=record.")
+        if self.latency:
+            time.sleep(self.latency)
+        return _response_to_result(response, self.model_name)
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path):
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from flask_app.config import Config
+
+# Bump when rendering changes, so cached images of identical specs are redrawn
+RENDERER_VERSION = "charts-1"
+CHART_TYPES = ("line", "bar", "barh", "stacked_bar", "area", "scatter", "pie")
+IMAGE_FORMATS = ("png", "svg", "webp")
+
+
+def _init_renderer():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+
+
+def _render(spec, path):
+    """Draw one chart spec and save it to path. Runs in a renderer process."""
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    labels = spec.get("labels") or []
+    series = spec["series"]
+    chart_type = spec["chart_type"]
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    try:
+        positions = np.arange(len(labels) or len(series[0]["values"]))
+        if chart_type == "pie":
+            ax.pie(series[0]["values"], labels=labels or None, autopct="%1.1f%%")
+            ax.axis("equal")
+        elif chart_type in ("bar", "barh"):
+            width = 0.8 / len(series)
+            for i, item in enumerate(series):
+                offsets = positions - 0.4 + width * (i + 0.5)
+                draw = ax.bar if chart_type == "bar" else ax.barh
+                draw(offsets, item["values"], width, label=item["name"])
+        elif chart_type == "stacked_bar":
+            bottom = np.zeros(len(positions))
+            for item in series:
+                values = np.asarray(item["values"], dtype=float)
+                ax.bar(positions, values, bottom=bottom, label=item["name"])
+                bottom += values
+        elif chart_type == "area":
+            ax.stackplot(positions, *[item["values"] for item in series],
+                         labels=[item["name"] for item in series], alpha=0.8)
+        else:
+            for item in series:
+                draw = ax.scatter if chart_type == "scatter" else ax.plot
+                draw(positions, item["values"], label=item["name"])
+
+        if labels and chart_type != "pie":
+            if chart_type == "barh":
+                ax.set_yticks(positions, labels)
+            else:
+                ax.set_xticks(positions, labels, rotation=45 if len(labels) > 8 else 0)
+        ax.set_title(spec.get("title", ""))
+        if chart_type != "pie":
+            ax.set_xlabel(spec.get("x_label") or "")
+            ax.set_ylabel(spec.get("y_label") or "")
+            if len(series) > 1:
+                ax.legend()
+        if spec.get("citation"):
+            fig.text(0.01, 0.01, f"Source: {spec['citation']}", fontsize=8, color="gray")
+
+        fig.tight_layout(rect=(0, 0.03, 1, 1))
+        fig.savefig(path, format=os.path.splitext(path)[1][1:])
+    finally:
+        plt.close(fig)
+    return path
+
+
+def validate_spec(spec):
+    if spec.get("chart_type") not in CHART_TYPES:
+        raise ValueError(f"chart_type must be one of {', '.join(CHART_TYPES)}")
+    if not spec.get("series"):
+        raise ValueError("At least one series is required")
+    labels = spec.get("labels") or []
+    for item in spec["series"]:
+        if labels and len(item["values"]) != len(labels):
+            raise ValueError(
+                f"Series {item['name']!r} has {len(item['values'])} values for {len(labels)} labels")
+    if spec.get("image_format", "png") not in IMAGE_FORMATS:
+        raise ValueError(f"image_format must be one of {', '.join(IMAGE_FORMATS)}")
+
+
+def spec_digest(spec):
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{RENDERER_VERSION}:{canonical}".encode()).hexdigest()
+
+
+def image_name(spec):
+    """File name of a spec's image: title slug plus content hash, so identical specs share one file."""
+    slug = re.sub(r"[^a-z0-9]+", "_", spec.get("title", "").lower()).strip("_")[:60] or "chart"
+    return f"{slug}_{spec_digest(spec)[:12]}.{spec.get('image_format', 'png')}"
+
+
+class ChartRenderer:
+    """Renders chart specs on a pool of processes with matplotlib (Agg) already imported.
+
+    Images are content addressed: a spec whose image already exists in images_dir is not
+    drawn again.
+    """
+
+    def __init__(self, images_dir, workers):
+        self.images_dir = os.path.abspath(images_dir)
+        os.makedirs(self.images_dir, exist_ok=True)
+        self.workers = workers
+        # spawn: forking a threaded web server process is not safe
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_renderer)
+
+    def prewarm(self):
+        """Start every renderer process now instead of on the first charts."""
+        for future in [self._executor.submit(_init_renderer) for _ in range(self.workers)]:
+            future.result()
+
+    def render_many(self, specs):
+        """Render specs as one batch. Returns the image file name for each spec, in order."""
+        specs = [dict(spec, image_format=spec.get("image_format") or Config.CHART_FORMAT)
+                 for spec in specs]
+        for spec in specs:
+            validate_spec(spec)
+
+        names = [image_name(spec) for spec in specs]
+        futures = {}
+        for spec, name in zip(specs, names):
+            path = os.path.join(self.images_dir, name)
+            if name not in futures and not os.path.exists(path):
+                futures[name] = self._executor.submit(_render, spec, path)
+        for future in futures.values():
+            future.result()
+        return names
+
+    def render(self, spec):
+        return self.render_many([spec])[0]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_chart_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer(os.path.join(Config.UPLOAD_FOLDER, 'images'),
+                                      Config.CHART_RENDER_WORKERS)
+        return _renderer
@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from flask_app.file_cache import file_digest
+
+TABLE_EXTENSIONS = {'.csv', '.xls', '.xlsx'}
+MANIFEST_NAME = "manifest.json"
+
+
+def tables_dir_for(extracted_dir):
+    """Columnar extracts of an upload live next to its extracted folder."""
+    return f"{os.path.normpath(extracted_dir)}.tables"
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "sheet"
+
+
+def _read_sheets(file_path):
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        return {os.path.splitext(os.path.basename(file_path))[0]: pd.read_csv(file_path)}
+    return pd.read_excel(file_path, sheet_name=None)
+
+
+def _to_arrow(df):
+    columns = []
+    for i, column in enumerate(df.columns):
+        name = str(column) if not str(column).startswith("Unnamed:") else f"column_{i}"
+        columns.append(name if name not in columns else f"{name}_{i}")
+    df = df.copy()
+    df.columns = columns
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Mixed-type object columns (common in spreadsheets) are stored as text
+        for column in df.columns:
+            if df[column].dtype == object:
+                df[column] = df[column].map(
+                    lambda v: None if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+# Serializes updates of each tables_dir's manifest within the process
+_manifest_locks = {}
+_manifest_locks_lock = threading.Lock()
+
+
+def _manifest_lock(tables_dir):
+    with _manifest_locks_lock:
+        return _manifest_locks.setdefault(os.path.normpath(tables_dir), threading.Lock())
+
+
+def _read_manifest(manifest_path):
+    """Manifest at manifest_path, or {} when it is missing or unreadable."""
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Error reading table manifest {manifest_path}: {e}")
+        return {}
+
+
+def extract_tables(file_paths, tables_dir):
+    """Write every sheet of the spreadsheets and csv files in file_paths as an uncompressed
+    Arrow IPC file (memory-mappable) and record them in tables_dir/manifest.json.
+
+    Files whose content hash is unchanged since the last extract are skipped. The manifest
+    is re-read and replaced atomically when the new entries are added, so concurrent
+    extracts into the same folder keep each other's entries and readers never see half a file.
+    """
+    manifest_path = os.path.join(tables_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+
+    os.makedirs(tables_dir, exist_ok=True)
+    entries = {}
+    for file_path in file_paths:
+        if os.path.splitext(file_path)[1].lower() not in TABLE_EXTENSIONS:
+            continue
+        key = os.path.normpath(file_path)
+        digest = file_digest(file_path)
+        if manifest.get(key, {}).get("digest") == digest:
+            continue
+
+        try:
+            sheets = _read_sheets(file_path)
+        except Exception as e:
+            print(f"Error extracting tables from {file_path}: {e}")
+            continue
+
+        entry = {"digest": digest, "sheets": {}}
+        for sheet_name, df in sheets.items():
+            table = _to_arrow(df)
+            table_path = os.path.join(
+                tables_dir, f"{digest[:16]}_{_safe_name(str(sheet_name))}.arrow")
+            feather.write_feather(table, table_path, compression="uncompressed")
+            entry["sheets"][str(sheet_name)] = {
+                "path": table_path, "rows": table.num_rows, "columns": table.column_names}
+        entries[key] = entry
+
+    with _manifest_lock(tables_dir):
+        manifest = _read_manifest(manifest_path)
+        if not entries and os.path.exists(manifest_path):
+            return manifest
+        manifest.update(entries)
+        temporary_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temporary_path, manifest_path)
+    return manifest
+
+
+def find_manifest_entry(file_path):
+    """Manifest entry for a source file, looking for a `<folder>.tables` extract in each ancestor folder.
+
+    None when there is no extract, or its manifest cannot be read.
+    """
+    key = os.path.normpath(file_path)
+    folder = os.path.dirname(key)
+    while folder:
+        manifest_path = os.path.join(
+            f"{folder}.tables", MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            return _read_manifest(manifest_path).get(key)
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            break
+        folder = parent
+    return None
+
+
+# Recently loaded extracts, per process (each sandbox worker has its own)
+MAX_CACHED_FRAMES = 32
+_frames = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def load_table(file_path, sheet=None):
+    """DataFrame of one sheet of a spreadsheet or csv file, read from its memory-mapped Arrow extract.
+
+    Repeated loads of the same extract are served from memory. sheet defaults to the
+    first sheet. Falls back to reading the original file when no extract exists.
+    """
+    entry = find_manifest_entry(file_path)
+    if entry is None:
+        sheets = _read_sheets(file_path)
+        return sheets[sheet] if sheet is not None else next(iter(sheets.values()))
+
+    sheet = sheet if sheet is not None else next(iter(entry["sheets"]))
+    if str(sheet) not in entry["sheets"]:
+        raise KeyError(
+            f"Sheet {sheet!r} not found. Available sheets: {list(entry['sheets'])}")
+    table_path = entry["sheets"][str(sheet)]["path"]
+
+    with _frames_lock:
+        if table_path not in _frames:
+            table = feather.read_table(table_path, memory_map=True)
+            _frames[table_path] = table.to_pandas()
+            while len(_frames) > MAX_CACHED_FRAMES:
+                _frames.popitem(last=False)
+        _frames.move_to_end(table_path)
+        # Callers may modify the frame, so each gets its own copy
+        return _frames[table_path].copy()
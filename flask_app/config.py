@@ -3,6 +3,121 @@ import os
 
 class Config:
     UPLOAD_FOLDER = 'uploads'
-    LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "true")
+    LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "false")
     LANGCHAIN_PROJECT = os.getenv(
         "LANGCHAIN_PROJECT", "Finance Agent")
+
+    # File level analysis (parse + summarize) runs on a pool. Executor can be "thread" or "process".
+    FILE_ANALYSIS_EXECUTOR = os.getenv("FILE_ANALYSIS_EXECUTOR", "thread")
+    FILE_ANALYSIS_WORKERS = int(os.getenv("FILE_ANALYSIS_WORKERS", "8"))
+    FILE_ANALYSIS_MAX_IN_FLIGHT = int(
+        os.getenv("FILE_ANALYSIS_MAX_IN_FLIGHT", "16"))
+    FILE_ANALYSIS_TIMEOUT = float(os.getenv("FILE_ANALYSIS_TIMEOUT", "120"))
+
+    # Content-addressed cache of parsed file text and file summaries
+    FILE_CACHE_PATH = os.getenv(
+        "FILE_CACHE_PATH", os.path.join('uploads', 'cache', 'file_cache.sqlite'))
+    FILE_CACHE_MAX_BYTES = int(
+        os.getenv("FILE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Cached /ask answers and file_analysis/financial_calculator results, keyed on the content hash of
+    # the upload (or file), the conversation before the question and the normalized question.
+    # RESPONSE_CACHE_SIMILARITY above 0 also serves the most similar earlier question on the same upload
+    # and conversation when the embeddings are at least that close
+    RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false")
+    RESPONSE_CACHE_PATH = os.getenv(
+        "RESPONSE_CACHE_PATH", os.path.join('uploads', 'cache', 'response_cache.sqlite'))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+    RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+    # Number of parsed documents kept in memory and shared across tools
+    DOCUMENT_STORE_SIZE = int(os.getenv("DOCUMENT_STORE_SIZE", "256"))
+
+    # Upload and ZIP extraction limits (zip-bomb protection)
+    MAX_CONTENT_LENGTH = int(
+        os.getenv("MAX_UPLOAD_BYTES", str(4 * 1024 * 1024 * 1024)))
+    ZIP_MAX_MEMBERS = int(os.getenv("ZIP_MAX_MEMBERS", "20000"))
+    ZIP_MAX_TOTAL_BYTES = int(
+        os.getenv("ZIP_MAX_TOTAL_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+    # Serve the bundled sample overview instead of parsing and summarizing the upload
+    USE_SAMPLE_OVERVIEW = os.getenv("USE_SAMPLE_OVERVIEW", "true")
+
+    # Signs the session cookie holding the conversation thread id. Must be shared by all workers;
+    # when it is not set, each process signs with its own random key
+    SECRET_KEY = os.getenv("SECRET_KEY")
+
+    # Agent sessions: conversation checkpoints are stored on disk and shared across workers
+    CHECKPOINT_DB_PATH = os.getenv(
+        "CHECKPOINT_DB_PATH", os.path.join('uploads', 'checkpoints.sqlite'))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "100"))
+    # Checkpoints kept per conversation; older ones are deleted as new ones are written. 0 keeps all
+    CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "10"))
+    # Pages freed by compaction are given back to the file system after this many compactions
+    CHECKPOINT_SHRINK_EVERY = int(os.getenv("CHECKPOINT_SHRINK_EVERY", "20"))
+
+    # History sent to the main agent's model: the last HISTORY_KEEP_TURNS questions are sent as is,
+    # tool outputs of earlier ones are cut to HISTORY_TOOL_OUTPUT_TOKENS, and the oldest questions are
+    # left out when the prompt exceeds HISTORY_TOKEN_BUDGET. The stored conversation is not changed
+    HISTORY_TRIM = os.getenv("HISTORY_TRIM", "true")
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "24000"))
+    HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+    HISTORY_TOOL_OUTPUT_TOKENS = int(os.getenv("HISTORY_TOOL_OUTPUT_TOKENS", "200"))
+
+    # Chat models: "live" calls OpenAI, "record" also appends the responses to the cassette file,
+    # "replay" serves them from the cassette offline after LLM_REPLAY_LATENCY seconds
+    LLM_MODE = os.getenv("LLM_MODE", "live")
+    LLM_CASSETTE_PATH = os.getenv(
+        "LLM_CASSETTE_PATH", os.path.join('cassettes', 'llm.jsonl'))
+    LLM_REPLAY_LATENCY = float(os.getenv("LLM_REPLAY_LATENCY", "0"))
+
+    # Background jobs (uploads): SQLite job table shared by workers and jobs run concurrently per worker
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join('uploads', 'jobs.sqlite'))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+    # In-process spans and metrics, served on /metrics and /trace. Traces keep the last spans per session
+    INSTRUMENTATION = os.getenv("INSTRUMENTATION", "true")
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "2000"))
+
+    # Sandboxed python_repl execution: pre-warmed worker processes with per-call limits
+    SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "4"))
+    SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "60"))
+    SANDBOX_MEMORY_BYTES = int(
+        os.getenv("SANDBOX_MEMORY_BYTES", str(4 * 1024 * 1024 * 1024)))
+    SANDBOX_WALL_TIMEOUT = float(os.getenv("SANDBOX_WALL_TIMEOUT", "120"))
+    SANDBOX_PREWARM = os.getenv("SANDBOX_PREWARM", "true")
+
+    # The parsing stack (pandas, pyarrow, numpy, openpyxl, tiktoken) and the agent stack are
+    # imported on first use. WARMUP imports them in a background thread after boot instead
+    WARMUP = os.getenv("WARMUP", "false")
+
+    # Charts are rendered from specs by a separate process pool. CHART_FORMAT is png, svg or webp
+    CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+    CHART_FORMAT = os.getenv("CHART_FORMAT", "png")
+
+    # Directory tree in the prompt: folders below this depth are collapsed to file counts,
+    # and folders with more files than the threshold list them per extension
+    TREE_TEXT_MAX_DEPTH = int(os.getenv("TREE_TEXT_MAX_DEPTH", "8"))
+    TREE_TEXT_GROUP_THRESHOLD = int(os.getenv("TREE_TEXT_GROUP_THRESHOLD", "50"))
+
+    # Tree browsing endpoints: children per page and maximum search matches
+    TREE_PAGE_SIZE = int(os.getenv("TREE_PAGE_SIZE", "100"))
+    TREE_MAX_PAGE_SIZE = int(os.getenv("TREE_MAX_PAGE_SIZE", "1000"))
+    TREE_SEARCH_RESULTS = int(os.getenv("TREE_SEARCH_RESULTS", "100"))
+
+    # Maximum tokens of file content handed to the model by get_file_content
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+    CONTEXT_TOKEN_MODEL = os.getenv("CONTEXT_TOKEN_MODEL", "gpt-4o")
+
+    # Embedding index over parsed documents used by the document_search tool
+    DOCUMENT_INDEX = os.getenv("DOCUMENT_INDEX", "true")
+    EMBEDDER = os.getenv("EMBEDDER", "hashing")  # "hashing" (offline) or "openai"
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    DOCUMENT_SEARCH_RESULTS = int(os.getenv("DOCUMENT_SEARCH_RESULTS", "5"))
+
+    # Convert uploaded spreadsheets to memory-mappable Arrow extracts read by load_table in python_repl
+    TABLE_EXTRACTS = os.getenv("TABLE_EXTRACTS", "true")
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import threading
+from functools import lru_cache
+
+from flask_app.config import Config
+from flask_app.file_cache import file_digest, get_file_cache
+
+# Bump when the packed representation changes so cached packs are rebuilt
+PACK_VERSION = "pack-1"
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+class _ApproximateEncoding:
+    """Roughly 4 characters per token. Used when tiktoken cannot load its encoding files (offline)."""
+
+    def encode(self, text, **kwargs):
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def get_encoding(model=None):
+    model = model or Config.CONTEXT_TOKEN_MODEL
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"Error loading tiktoken encoding for {model}, estimating tokens: {e}")
+                _encodings[model] = _ApproximateEncoding()
+        return _encodings[model]
+
+
+def count_tokens(text, model=None):
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+# Role and separators around each message in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=4096)
+def _text_tokens(text):
+    return count_tokens(text)
+
+
+def message_tokens(message):
+    """Approximate prompt tokens of a chat message, including its tool calls."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = MESSAGE_OVERHEAD_TOKENS + _text_tokens(content)
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += _text_tokens(tool_call["name"] + json.dumps(tool_call["args"]))
+    return tokens
+
+
+def truncate_to_tokens(text, budget, model=None):
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode(tokens[:budget])
+
+
+def _format_row(row):
+    return "\t".join("" if c is None else str(c) for c in row)
+
+
+def _sample_indices(n_rows, n_samples):
+    """Head, tail and evenly spaced rows in between, in order."""
+    if n_samples >= n_rows:
+        return list(range(n_rows))
+    head = n_samples // 3
+    tail = n_samples // 3
+    middle = n_samples - head - tail
+    indices = set(range(head)) | set(range(n_rows - tail, n_rows))
+    step = (n_rows - head - tail) / (middle + 1)
+    indices |= {head + int(step * (i + 1)) for i in range(middle)}
+    return sorted(indices)
+
+
+def _sheet_summary(name, rows, file_path):
+    import pandas as pd
+
+    header = []
+    for i, c in enumerate(rows[0]):
+        column = str(c) if c is not None else f"column_{i}"
+        header.append(column if column not in header else f"{column}_{i}")
+    body = [row + [None] * (len(header) - len(row)) for row in rows[1:]]
+    df = pd.DataFrame([row[:len(header)] for row in body], columns=header)
+
+    lines = [f"Sheet: {name} ({len(body)} rows x {len(header)} columns)", "Columns:"]
+    stats = []
+    for column in df.columns:
+        numeric = pd.to_numeric(df[column], errors="coerce")
+        filled = int(df[column].notna().sum())
+        if filled and numeric.notna().sum() >= filled * 0.8:
+            lines.append(f"- {column}: numeric ({filled} non-empty)")
+            stats.append(f"- {column}: min={numeric.min():.6g} max={numeric.max():.6g} "
+                         f"mean={numeric.mean():.6g} sum={numeric.sum():.6g}")
+        else:
+            lines.append(f"- {column}: text ({filled} non-empty, "
+                         f"{df[column].nunique()} distinct)")
+    if stats:
+        lines.append("Numeric summary:")
+        lines.extend(stats)
+    lines.append(f"Full data: load_table('{file_path}', '{name}') in python_repl returns this sheet as a DataFrame.")
+    return "\n".join(lines), header, body
+
+
+def _whole_sheet_text(name, rows, budget, model):
+    """Text of the whole sheet if it fits in budget, else None. Stops early for sheets that clearly do not fit."""
+    lines = [f"Sheet: {name}"]
+    chars = 0
+    for row in rows:
+        line = _format_row(row)
+        chars += len(line) + 1
+        # A token is rarely more than 8 characters
+        if chars > budget * 8:
+            return None
+        lines.append(line)
+    text = "\n".join(lines)
+    return text if count_tokens(text, model) <= budget else None
+
+
+def _pack_sheet(name, rows, budget, file_path, model):
+    whole_text = _whole_sheet_text(name, rows, budget, model)
+    if whole_text is not None:
+        return whole_text
+    if len(rows) < 2:
+        return truncate_to_tokens(f"Sheet: {name}\n{_format_row(rows[0])}", budget, model)
+
+    summary, header, body = _sheet_summary(name, rows, file_path)
+    summary_tokens = count_tokens(summary, model)
+    if summary_tokens >= budget:
+        return truncate_to_tokens(summary, budget, model)
+
+    # Grow the sample until it no longer fits
+    best = ""
+    n_samples = 6
+    while n_samples <= len(body):
+        sampled = [body[i] for i in _sample_indices(len(body), n_samples)]
+        sample_text = f"Sampled rows ({len(sampled)} of {len(body)}):\n" + \
+            "\n".join(_format_row(row) for row in [header] + sampled)
+        if summary_tokens + count_tokens(sample_text, model) + 1 > budget:
+            break
+        best = sample_text
+        n_samples *= 2
+    return f"{summary}\n{best}" if best else summary
+
+
+def pack_document(document, budget=None, model=None):
+    """Text of a LoadedDocument that fits in budget tokens.
+
+    Spreadsheets that do not fit are represented per sheet by their schema, a numeric
+    summary and sampled rows, with a pointer to the file for the full data. Other
+    documents are truncated.
+    """
+    budget = budget or Config.CONTEXT_TOKEN_BUDGET
+
+    sheets = {name: rows for name, rows in document.sheets.items() if rows}
+    if not sheets:
+        text = document.text
+        packed = truncate_to_tokens(text, budget, model)
+        if packed != text:
+            packed += f"\n\n[Truncated to {budget} tokens. Read '{document.path}' in python_repl for the full content.]"
+        return packed
+
+    sheet_budget = budget // len(sheets)
+    return "\n\n".join(_pack_sheet(name, rows, sheet_budget, document.path, model)
+                       for name, rows in sheets.items())
+
+
+def pack_file(file_path, budget=None, model=None):
+    """pack_document of a file, cached on its content, path, budget and model.
+
+    Packing a large sheet reads and summarizes every row, so repeated reads of the same
+    file (by the agent or its sub-agents) are served from the file cache.
+    """
+    from flask_app.document_loader import load_document
+
+    budget = budget or Config.CONTEXT_TOKEN_BUDGET
+    model = model or Config.CONTEXT_TOKEN_MODEL
+    digest = file_digest(file_path)
+    # The packed text names the file, so the path is part of the key
+    key = hashlib.sha256(json.dumps([digest, file_path, budget, model]).encode("utf-8")).hexdigest()
+
+    cache = get_file_cache()
+    packed = cache.get("packed", PACK_VERSION, key)
+    if packed is None:
+        packed = pack_document(load_document(file_path, digest), budget, model)
+        cache.put("packed", PACK_VERSION, key, packed)
+    return packed
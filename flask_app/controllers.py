@@ -1,36 +1,62 @@
+import contextvars
+import hashlib
+import json
 import os
-from collections import defaultdict
-from anytree import Node, RenderTree
-from anytree.exporter import JsonExporter
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-from langchain_core.output_parsers import StrOutputParser
-from langchain_community.document_loaders import UnstructuredFileLoader
-from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.prebuilt import chat_agent_executor
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 import uuid
-from flask_app.agent_utils import chart_generation, file_analysis, financial_calculator
+from flask_app.config import Config
+from flask_app.llm import get_chat_model
+from flask_app.file_cache import get_file_cache, file_digest
+from flask_app.document_loader import load_document
+from flask_app.sandbox import sandbox_session
+from flask_app.tree import CompactTree
+from flask_app.instrumentation import span
+from flask_app.tracing import instrumented
+from flask_app.streaming import stream_updates
+from flask_app.response_cache import normalize_text
 
 load_dotenv()
 
+# Bump when the summary prompt or model changes so cached summaries are regenerated
+SUMMARY_VERSION = "summary-1"
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+# How often the pool loop wakes up to start deadlines for files that began running
+FILE_ANALYSIS_POLL_INTERVAL = 0.5
+
 
 def analyze_file(file_path):
+    with span("summary", "analyze_file", path=file_path) as attributes:
+        return _analyze_file(file_path, attributes)
+
+
+def _analyze_file(file_path, attributes):
     file_name = os.path.basename(file_path)
-    loader = UnstructuredFileLoader(file_path)
+    cache = get_file_cache()
 
     try:
-        docs = loader.load()
+        digest = file_digest(file_path)
+        analysis = cache.get("summary", SUMMARY_VERSION, digest)
+        attributes["cache_hit"] = analysis is not None
+        if analysis is not None:
+            return analysis
+        context = load_document(file_path, digest).text
     except Exception as e:
         print(f"Error parsing file {file_path}: {e}")
         return "Error parsing file"
 
-    def format_docs(docs):
-        return "\n\n".join([d.page_content for d in docs])
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
 
-    context = format_docs(docs)
-    llm = ChatOpenAI()
+    llm = get_chat_model()
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a financial analyst. You will be given a file name and the contents of the file. Your job is describe in 20 words what useful information can this file provide. Note that the description may be used to search for this file."),
@@ -38,123 +64,296 @@ def analyze_file(file_path):
     ])
     output_parser = StrOutputParser()
     chain = prompt | llm | output_parser
-    analysis = chain.invoke({"input": context, "file_name": file_name})
+    analysis = chain.invoke({"input": context, "file_name": file_name},
+                            config=instrumented({}))
+
+    cache.put("summary", SUMMARY_VERSION, digest, analysis)
 
     return analysis
 
 
-def analyze_directory_objective(repo_overview, objective, agent_executor, thread_id):
-    system_message_content = f"""You are a helpful AI. You are given a directory structure of the company files and you need to analyze them based on the objective. Use the tools you have at your disposal to achieve the objective. 
+def system_message_content(repo_overview):
+    """System message of a session: instructions and the directory structure of its files."""
+    document_search = ""
+    if Config.DOCUMENT_INDEX == "true":
+        document_search = "Use document_search to find the files and passages relevant to the objective before analyzing individual files.\n\n"
+    return f"""You are a helpful AI. You are given a directory structure of the company files and you need to analyze them based on the objective. Use the tools you have at your disposal to achieve the objective. 
 
 Always explain how you've conducted your analysis: steps taken to get to the answer. If you're making assumptions, state and justify them.
 
 For example, if the user asks for a financial metric, give the result, then outline the files used, the values used from the files, and the calculations performed (if applicable). 
 
-This is the directory structure(Note when specifying a file path, you are supposed to include the root): \n\n{repo_overview}"""
+{document_search}This is the directory structure(Note when specifying a file path, you are supposed to include the root): \n\n{repo_overview}"""
+
+
+def directory_objective_messages(repo_overview, objective):
     human_message_content = f"This is the objective: {objective}" + \
         " Keep response to a maximum of a 100 words."
 
-    response = agent_executor.invoke(
-        {"messages": [SystemMessage(content=system_message_content), HumanMessage(
-            content=human_message_content)]},
-        config={"configurable": {"thread_id": thread_id}}
-    )
-    analysis = str(response["messages"][-1].content)
+    return [SystemMessage(content=system_message_content(repo_overview)), HumanMessage(content=human_message_content)]
 
-    return analysis
 
+def added_files_messages(repo_overview, objective):
+    """Messages for files added to a session that already has the directory structure in its system message."""
+    human_message_content = f"""Files were added to the data room. This is the updated directory structure: \n\n{repo_overview}
+
+This is the objective: {objective} Keep response to a maximum of a 100 words."""
 
-def example_agent_setup(system_message, agent_executor, thread_id):
-    system_message_content = system_message
+    return [HumanMessage(content=human_message_content)]
 
-    human_message_content = f"Say Hi!"
 
-    response = agent_executor.invoke(
-        {"messages": [SystemMessage(content=system_message_content), HumanMessage(
-            content=human_message_content)]},
-        config={"configurable": {"thread_id": thread_id}}
-    )
+def analyze_directory_objective(repo_overview, objective, agent_executor, thread_id, append=False, events=None):
+    """Run the agent on the objective. With events (see streaming.stream_updates), tokens and tool steps are pushed to it."""
+    messages_for = added_files_messages if append else directory_objective_messages
+    inputs = {"messages": messages_for(repo_overview, objective)}
+    config = instrumented({"configurable": {"thread_id": thread_id}})
+    with sandbox_session(thread_id):
+        if events is not None:
+            return stream_updates(agent_executor, inputs, config, events)
+        response = agent_executor.invoke(inputs, config=config)
     analysis = str(response["messages"][-1].content)
 
     return analysis
 
 
-def setup_agent_executor(objective):
-    tools = [file_analysis, chart_generation, financial_calculator]
-    model = ChatOpenAI(model='gpt-4o')
-    memory = SqliteSaver.from_conn_string(":memory:")
-    agent_executor = chat_agent_executor.create_tool_calling_executor(
-        model, tools, checkpointer=memory)
-    thread_id = str(uuid.uuid4())
+def example_agent_setup(messages, agent_executor, thread_id):
+    """Start the example conversation from the bundle's messages, without calling the model.
+
+    They are written as the graph input, so the first question runs the agent on them.
+    """
+    agent_executor.update_state(
+        {"configurable": {"thread_id": thread_id}},
+        {"messages": [message.copy() for message in messages]},
+        as_node="__start__")
+
+
+def record_cached_answer(agent_executor, thread_id, question, answer):
+    """Add a question answered from the cache to the conversation, as if the agent had answered it."""
+    agent_executor.update_state(
+        {"configurable": {"thread_id": thread_id}},
+        {"messages": [HumanMessage(content=question), AIMessage(content=answer)]},
+        as_node="agent")
+
+
+def questions_digest(agent_executor, thread_id):
+    """Hash of the human turns of the conversation so far: the objective and the questions.
+
+    Only deterministic context is hashed, so analysts who upload the same files with the
+    same objective and ask the same questions share cached answers. The model's answers
+    (and the summaries in the system message) differ between runs and are left out; the
+    files themselves are covered by the corpus digest. The tradeoff is that a cached answer
+    may build on earlier answers worded differently from the ones this session got.
+    """
+    state = agent_executor.get_state({"configurable": {"thread_id": thread_id}})
+    digest = hashlib.sha256()
+    for message in (state.values or {}).get("messages", []):
+        if isinstance(message, HumanMessage) and message.content:
+            digest.update(json.dumps(normalize_text(message.content)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_checkpointer():
+    """Process-wide file-based checkpointer, so conversations outlive workers and are shared between them."""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            from flask_app.history import CompactingSqliteSaver
+            db_dir = os.path.dirname(Config.CHECKPOINT_DB_PATH)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(Config.CHECKPOINT_DB_PATH,
+                                   check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            _checkpointer = CompactingSqliteSaver(conn, keep=Config.CHECKPOINT_KEEP,
+                                                  shrink_every=Config.CHECKPOINT_SHRINK_EVERY)
+        return _checkpointer
+
+
+@lru_cache(maxsize=None)
+def get_main_agent():
+    """The main agent graph, compiled once. Sessions only differ by thread id in the shared checkpointer."""
+    # The tools and langgraph are imported with the first agent, so workers that never
+    # build one do not load them
+    from langgraph.prebuilt import chat_agent_executor
+    from flask_app.agent_utils import chart_generation, file_analysis, financial_calculator, document_search, metric_calculator
+
+    tools = [file_analysis, chart_generation, financial_calculator,
+             metric_calculator]
+    if Config.DOCUMENT_INDEX == "true":
+        tools.append(document_search)
+    # Only the main agent streams tokens, so SSE clients see its answer and not the sub-agents'
+    model = get_chat_model('gpt-4o', streaming=True)
+    memory = get_checkpointer()
+    # The model gets a trimmed copy of the history; the checkpoints keep all of it
+    messages_modifier = None
+    if Config.HISTORY_TRIM == "true":
+        from flask_app.history import trim_history
+        messages_modifier = trim_history
+    return chat_agent_executor.create_tool_calling_executor(
+        model, tools, messages_modifier=messages_modifier, checkpointer=memory)
+
+
+def warm_up():
+    """Import the agent and parsing stacks, so the first upload and question do not wait for them."""
+    try:
+        with span("startup", "warm_up"):
+            get_main_agent()
+            import openpyxl  # noqa: F401
+            from flask_app import columnar, doc_index, metrics  # noqa: F401
+            from flask_app.context_packing import get_encoding
+            get_encoding()
+    except Exception as e:
+        print(f"Error warming up: {e}")
+
+
+def setup_agent_executor(objective, thread_id=None):
+    agent_executor = get_main_agent()
+    thread_id = thread_id or str(uuid.uuid4())
     return agent_executor, thread_id
 
 
-def create_directory_tree(start_path, file_analysis=False):
-    file_type_count = defaultdict(int)
-    ALLOWED_EXTENSIONS = {'.csv', '.xls', '.xlsx',
-                          '.pdf', '.doc', '.docx', '.txt', '.md'}
-
-    def add_nodes(parent_node, path, file_analysis=file_analysis):
-        for entry in os.scandir(path):
-            if entry.is_file():
-                file_type = os.path.splitext(entry.path)[1].lower()
-                if file_type in ALLOWED_EXTENSIONS:
-                    file_type_count[file_type] += 1
-                    if file_analysis:
-                        file_analysis = analyze_file(entry.path)
-                        Node(entry.name, parent=parent_node,
-                             file_analysis=file_analysis)
-                    else:
-                        Node(entry.name, parent=parent_node)
-            else:
-                child_node = Node(entry.name, parent=parent_node)
-                add_nodes(child_node, entry.path, file_analysis=file_analysis)
-
-    root_node = Node(os.path.basename(start_path.rstrip('/')))
-    add_nodes(root_node, start_path, file_analysis=file_analysis)
-
-    metadata_node = Node("metadata", parent=root_node)
-    for file_type, count in file_type_count.items():
-        Node(f"{file_type}: {count}", parent=metadata_node)
-
-    exporter = JsonExporter()
-    repo_overview_json = exporter.export(root_node)
-
-    return repo_overview_json
-
-
-def create_directory_tree_text(start_path, file_analysis=False):
-    file_type_count = defaultdict(int)
-    ALLOWED_EXTENSIONS = {'.csv', '.xls', '.xlsx',
-                          '.pdf', '.doc', '.docx', '.txt', '.md'}
-
-    def add_nodes(parent_node, path, file_analysis=file_analysis):
-        for entry in os.scandir(path):
-            if entry.is_file():
-                file_type = os.path.splitext(entry.path)[1].lower()
-                if file_type in ALLOWED_EXTENSIONS:
-                    file_type_count[file_type] += 1
-                    file_name = f"{entry.name} (Path: {entry.path})"
-                    if file_analysis:
-                        analysis_result = analyze_file(entry.path)
-                        Node(f"{file_name} (Content Summary: {analysis_result})",
-                             parent=parent_node)
-                    else:
-                        Node(file_name, parent=parent_node)
-            elif entry.is_dir():
-                child_node = Node(entry.name, parent=parent_node)
-                add_nodes(child_node, entry.path, file_analysis=file_analysis)
-
-    root_node = Node(os.path.basename(start_path.rstrip('/')))
-    add_nodes(root_node, start_path, file_analysis=file_analysis)
-
-    metadata_node = Node("metadata", parent=root_node)
-    for file_type, count in file_type_count.items():
-        Node(f"{file_type}: {count}", parent=metadata_node)
-
-    # Generate and print the textual representation of the directory tree
-    tree_representation = ""
-    for pre, fill, node in RenderTree(root_node):
-        tree_representation += f"{pre}{node.name}.\n"
-
-    return tree_representation
+def _abandon_executor(executor):
+    """Shut an executor down without waiting for its workers.
+
+    Process workers are terminated; threads cannot be stopped and finish on their own.
+    """
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def analyze_files(file_paths, max_workers=None, max_in_flight=None, timeout=None, executor_type=None, on_result=None):
+    """Run analyze_file over file_paths on a worker pool and return {file_path: analysis}.
+
+    At most max_in_flight files are submitted at a time, so file_paths can be a lazy
+    iterator. The timeout applies per file from the moment it starts running; files that
+    time out or fail get an error string instead of a summary. A file that times out still
+    holds its worker, so once every worker is held that way the pool is replaced and the
+    queued files move to the new one. on_result(file_path, analysis) is called as each
+    file finishes; exceptions it raises abort the run.
+    """
+    max_workers = max_workers or Config.FILE_ANALYSIS_WORKERS
+    max_in_flight = max(max_in_flight or Config.FILE_ANALYSIS_MAX_IN_FLIGHT, max_workers)
+    timeout = timeout or Config.FILE_ANALYSIS_TIMEOUT
+    executor_type = executor_type or Config.FILE_ANALYSIS_EXECUTOR
+
+    def new_executor():
+        if executor_type == "process":
+            return ProcessPoolExecutor(max_workers=max_workers)
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    def capacity():
+        # Process pools mark a file as running once it is queued for a worker, so they only get
+        # files for their free workers, or deadlines would start early
+        if executor_type == "process":
+            return max_workers - len(stuck)
+        return max_in_flight
+
+    def submit(file_path):
+        # Threads run in a copy of the caller's context, so their spans land in the session's trace
+        if executor_type == "process":
+            return executor.submit(analyze_file, file_path)
+        return executor.submit(contextvars.copy_context().run, analyze_file, file_path)
+
+    executor = new_executor()
+    results = {}
+    pending = {}  # future -> [file_path, deadline]
+    stuck = set()  # futures of the current pool that timed out while running
+    paths = iter(file_paths)
+    exhausted = False
+
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < capacity():
+                try:
+                    file_path = next(paths)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[submit(file_path)] = [file_path, None]
+
+            if not pending:
+                break
+
+            # Deadlines start when a worker picks the file up, not when it is queued
+            now = time.monotonic()
+            for future, entry in pending.items():
+                if entry[1] is None and (future.running() or future.done()):
+                    entry[1] = now + timeout
+            deadlines = [entry[1]
+                         for entry in pending.values() if entry[1] is not None]
+            wait_for = FILE_ANALYSIS_POLL_INTERVAL
+            if deadlines:
+                wait_for = min(wait_for, max(0, min(deadlines) - now))
+
+            done, _ = wait(pending, timeout=wait_for,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, _ = pending.pop(future)
+                try:
+                    results[file_path] = future.result()
+                except Exception as e:
+                    print(f"Error analyzing file {file_path}: {e}")
+                    results[file_path] = "Error parsing file"
+                if on_result:
+                    on_result(file_path, results[file_path])
+
+            now = time.monotonic()
+            for future, (file_path, deadline) in list(pending.items()):
+                if deadline is not None and deadline <= now:
+                    if not future.cancel():
+                        stuck.add(future)
+                    del pending[future]
+                    print(f"Timed out analyzing file {file_path}")
+                    results[file_path] = "Error parsing file: timed out"
+                    if on_result:
+                        on_result(file_path, results[file_path])
+
+            stuck = {future for future in stuck if not future.done()}
+            if len(stuck) >= max_workers:
+                # Every worker is held by a timed out file: queued files would never start
+                print(f"All {max_workers} file analysis workers timed out, starting new ones")
+                old_executor, executor = executor, new_executor()
+                for future, entry in list(pending.items()):
+                    if future.cancel():
+                        del pending[future]
+                        pending[submit(entry[0])] = [entry[0], None]
+                _abandon_executor(old_executor)
+                stuck = set()
+    finally:
+        if stuck:
+            _abandon_executor(executor)
+        else:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def build_directory_tree(start_path, file_analysis=False, analyses=None, **pool_options):
+    """CompactTree of start_path. With file_analysis, files missing from analyses are summarized on the pool."""
+    tree = CompactTree.from_directory(start_path)
+
+    if file_analysis:
+        analyses = {os.path.normpath(path): analysis
+                    for path, analysis in (analyses or {}).items()}
+        missing = [path for _, path in tree.files()
+                   if os.path.normpath(path) not in analyses]
+        analyses.update(analyze_files(missing, **pool_options))
+        tree.set_analyses(analyses)
+
+    return tree
+
+
+def directory_tree_text(tree, file_analysis=False):
+    """Prompt text of a tree, collapsed to the configured depth and folder size."""
+    return tree.to_text(file_analysis, Config.TREE_TEXT_MAX_DEPTH, Config.TREE_TEXT_GROUP_THRESHOLD)
+
+
+def create_directory_tree(start_path, file_analysis=False, analyses=None, **pool_options):
+    return build_directory_tree(start_path, file_analysis, analyses, **pool_options).to_json()
+
+
+def create_directory_tree_text(start_path, file_analysis=False, analyses=None, **pool_options):
+    tree = build_directory_tree(start_path, file_analysis, analyses, **pool_options)
+    return directory_tree_text(tree, file_analysis)
@@ -0,0 +1,201 @@
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from flask_app.config import Config
+from flask_app.document_loader import load_document
+from flask_app.file_cache import file_digest
+from flask_app.session_files import is_thread_id, session_file_path
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: hashed bag of words and word bigrams, L2 normalized."""
+
+    name = "hashing"
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features),
+                                 dtype=np.uint32, count=len(features))
+            signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OpenAIEmbedder:
+    name = "openai"
+
+    def __init__(self, model):
+        from langchain_openai import OpenAIEmbeddings
+        self.name = f"openai:{model}"
+        self._embeddings = OpenAIEmbeddings(model=model)
+
+    def embed(self, texts):
+        vectors = np.array(self._embeddings.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def get_embedder():
+    if Config.EMBEDDER == "openai":
+        return OpenAIEmbedder(Config.EMBEDDING_MODEL)
+    return HashingEmbedder()
+
+
+def chunk_text(text, chunk_size=None, overlap=None):
+    chunk_size = chunk_size or Config.CHUNK_SIZE
+    overlap = overlap if overlap is not None else Config.CHUNK_OVERLAP
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_size)
+        # Prefer to cut at a line break in the second half of the chunk
+        if end < len(text):
+            cut = text.rfind("\n", start + chunk_size // 2, end)
+            if cut != -1:
+                end = cut
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class DocumentIndex:
+    """Embedding index over chunked document text, persisted in index_dir.
+
+    update() only re-chunks and re-embeds files whose content hash changed, and drops
+    files that are no longer present.
+    """
+
+    def __init__(self, index_dir, embedder):
+        self.index_dir = index_dir
+        self.embedder = embedder
+        self.chunks = []  # {"path", "digest", "text"}
+        self.vectors = None
+        self._load()
+
+    def _load(self):
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("embedder") != self.embedder.name:
+            return
+        with open(os.path.join(self.index_dir, "chunks.json")) as f:
+            self.chunks = json.load(f)
+        self.vectors = np.load(os.path.join(self.index_dir, "vectors.npy"))
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(os.path.join(self.index_dir, "chunks.json"), "w") as f:
+            json.dump(self.chunks, f)
+        np.save(os.path.join(self.index_dir, "vectors.npy"),
+                self.vectors if self.vectors is not None else np.zeros((0, 0), dtype=np.float32))
+        with open(os.path.join(self.index_dir, "meta.json"), "w") as f:
+            json.dump({"embedder": self.embedder.name,
+                      "chunks": len(self.chunks)}, f)
+
+    def update(self, file_paths):
+        indexed = {chunk["path"]: chunk["digest"] for chunk in self.chunks}
+        # Sorted, so equal scores rank the same whichever order the files were analyzed in
+        current = {path: file_digest(path) for path in sorted(file_paths)}
+        keep = [i for i, chunk in enumerate(self.chunks)
+                if current.get(chunk["path"]) == chunk["digest"]]
+
+        new_chunks = []
+        for path, digest in current.items():
+            if indexed.get(path) == digest:
+                continue
+            try:
+                text = load_document(path, digest).text
+            except Exception as e:
+                print(f"Error indexing file {path}: {e}")
+                continue
+            new_chunks.extend({"path": path, "digest": digest, "text": chunk}
+                              for chunk in chunk_text(text))
+
+        if len(keep) == len(self.chunks) and not new_chunks:
+            return False
+
+        kept_vectors = self.vectors[keep] if self.vectors is not None and keep else None
+        new_vectors = self.embedder.embed(
+            [chunk["text"] for chunk in new_chunks]) if new_chunks else None
+        parts = [v for v in (kept_vectors, new_vectors) if v is not None]
+        self.chunks = [self.chunks[i] for i in keep] + new_chunks
+        self.vectors = np.vstack(parts) if parts else None
+        self.save()
+        return True
+
+    def search(self, query, k=5):
+        if self.vectors is None or not len(self.chunks):
+            return []
+        scores = self.vectors @ self.embedder.embed([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.chunks[i], score=float(scores[i])) for i in top]
+
+
+def index_dir_for(extracted_dir):
+    """Index of an upload lives next to its extracted folder, so re-uploads update it incrementally."""
+    return f"{os.path.normpath(extracted_dir)}.doc_index"
+
+
+def _session_pointer(thread_id):
+    return session_file_path("indexes", thread_id)
+
+
+def build_document_index(extracted_dir, file_paths, thread_id):
+    index_dir = index_dir_for(extracted_dir)
+    DocumentIndex(index_dir, get_embedder()).update(file_paths)
+
+    pointer = _session_pointer(thread_id)
+    os.makedirs(os.path.dirname(pointer), exist_ok=True)
+    with open(pointer, "w") as f:
+        json.dump({"index_dir": index_dir}, f)
+    return index_dir
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_session_index(thread_id):
+    """Loaded index of a session's upload, reloaded when the index on disk changes."""
+    if not is_thread_id(thread_id):
+        return None
+    pointer = _session_pointer(thread_id)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        index_dir = json.load(f)["index_dir"]
+    meta_path = os.path.join(index_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    stamp = os.stat(meta_path).st_mtime_ns
+
+    with _indexes_lock:
+        entry = _indexes.get(index_dir)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, DocumentIndex(index_dir, get_embedder()))
+            _indexes[index_dir] = entry
+        return entry[1]
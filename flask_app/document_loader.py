@@ -0,0 +1,180 @@
+import csv
+import datetime
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List
+
+from flask_app.config import Config
+from flask_app.file_cache import get_file_cache, file_digest
+from flask_app.instrumentation import count_cache, span
+
+# Bump when the way files are parsed changes so cached documents are re-parsed
+LOADER_VERSION = "loader-2"
+
+TABULAR_EXTENSIONS = {'.csv', '.xls', '.xlsx'}
+PLAIN_TEXT_EXTENSIONS = {'.txt', '.md'}
+
+
+@dataclass
+class LoadedDocument:
+    path: str
+    text: str
+    # Sheet name -> rows of cell values (spreadsheets and csv only)
+    sheets: Dict[str, List[list]] = field(default_factory=dict)
+    # Text of the tables Unstructured found in pdf / word documents
+    tables: List[str] = field(default_factory=list)
+
+    def to_json(self):
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**json.loads(data))
+
+
+def _cell(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _sheets_to_text(sheets):
+    parts = []
+    for name, rows in sheets.items():
+        lines = ["\t".join("" if c is None else str(c) for c in row)
+                 for row in rows]
+        parts.append(f"Sheet: {name}\n" + "\n".join(lines))
+    return "\n\n".join(parts)
+
+
+def _load_xlsx(file_path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for worksheet in workbook.worksheets:
+            rows = []
+            for row in worksheet.iter_rows(values_only=True):
+                if any(c is not None for c in row):
+                    rows.append([_cell(c) for c in row])
+            sheets[worksheet.title] = rows
+    finally:
+        workbook.close()
+    return sheets
+
+
+def _load_xls(file_path):
+    import pandas as pd
+
+    frames = pd.read_excel(file_path, sheet_name=None, header=None)
+    sheets = {}
+    for name, df in frames.items():
+        df = df.dropna(how='all')
+        rows = df.astype(object).where(df.notna(), None).values.tolist()
+        sheets[str(name)] = [[_cell(c) for c in row] for row in rows]
+    return sheets
+
+
+def _load_csv(file_path):
+    with open(file_path, newline='', encoding='utf-8', errors='replace') as f:
+        rows = [row for row in csv.reader(f) if row]
+    return {os.path.splitext(os.path.basename(file_path))[0]: rows}
+
+
+def _load_unstructured(file_path):
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
+    loader = UnstructuredFileLoader(file_path, mode="elements")
+    docs = loader.load()
+    text = "\n\n".join([d.page_content for d in docs])
+    tables = [d.page_content for d in docs
+              if d.metadata.get("category") == "Table"]
+    return text, tables
+
+
+def parse_document(file_path):
+    """Parse a file with the fastest loader for its format. Does not use any cache."""
+    file_type = os.path.splitext(file_path)[1].lower()
+
+    if file_type in PLAIN_TEXT_EXTENSIONS:
+        with open(file_path, encoding='utf-8', errors='replace') as f:
+            return LoadedDocument(path=file_path, text=f.read())
+
+    if file_type in TABULAR_EXTENSIONS:
+        if file_type == '.xlsx':
+            sheets = _load_xlsx(file_path)
+        elif file_type == '.xls':
+            sheets = _load_xls(file_path)
+        else:
+            sheets = _load_csv(file_path)
+        return LoadedDocument(path=file_path, text=_sheets_to_text(sheets), sheets=sheets)
+
+    # PDFs, Word documents and anything else go through Unstructured
+    text, tables = _load_unstructured(file_path)
+    return LoadedDocument(path=file_path, text=text, tables=tables)
+
+
+class DocumentStore:
+    """In-memory LRU of parsed documents shared by every tool in the process.
+
+    Entries are keyed by path and revalidated against the file's size and mtime; misses
+    fall through to the persistent content-addressed file cache before parsing.
+    """
+
+    def __init__(self, max_documents):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, file_path, digest=None):
+        stat = os.stat(file_path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        key = os.path.abspath(file_path)
+
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._documents.move_to_end(key)
+                count_cache("document_store", hit=True)
+                return entry[1]
+        count_cache("document_store", hit=False)
+
+        cache = get_file_cache()
+        digest = digest or file_digest(file_path)
+        cached = cache.get("document", LOADER_VERSION, digest)
+        if cached is not None:
+            document = LoadedDocument.from_json(cached)
+            document.path = file_path
+        else:
+            with span("parse", os.path.splitext(file_path)[1].lower() or "none", path=file_path):
+                document = parse_document(file_path)
+            cache.put("document", LOADER_VERSION, digest, document.to_json())
+
+        with self._lock:
+            self._documents[key] = (stamp, document)
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return document
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore(Config.DOCUMENT_STORE_SIZE)
+        return _store
+
+
+def load_document(file_path, digest=None):
+    return get_document_store().load(file_path, digest)
@@ -1,37 +1,43 @@
+import hashlib
 import json
 import os
+import threading
 
+from langchain_core.messages import SystemMessage, messages_from_dict, messages_to_dict
+
+from flask_app.controllers import system_message_content
+from flask_app.tree import CompactTree
+
+# Bump when the bundle layout or the seeded conversation changes
+EXAMPLE_BUNDLE_VERSION = "example-1"
+EXAMPLE_BUNDLE_PATH = 'example_data/example_bundle.json'
+
+# Separate files written before the bundle, still read when there is no bundle
 EXAMPLE_ANALYSIS_PATH = 'example_data/example_analysis.json'
 EXAMPLE_TREE_PATH = 'example_data/example_tree.json'
 EXAMPLE_OBJECTIVE_PATH = 'example_data/objective.txt'
 EXAMPLE_SYSTEM_MSG_PATH = 'example_data/system_message.txt'
 
 
-def save_example_data(analysis, tree, objective, repo_overview):
-    if not os.path.exists('example_data'):
-        os.makedirs('example_data')
-
-    with open(EXAMPLE_ANALYSIS_PATH, 'w') as f:
-        json.dump(analysis, f)
-
-    with open(EXAMPLE_TREE_PATH, 'w') as f:
-        json.dump(tree, f)
-
-    with open(EXAMPLE_OBJECTIVE_PATH, 'w') as f:
-        f.write(objective)
-
-    with open(EXAMPLE_SYSTEM_MSG_PATH, 'w') as f:
-        system_message_content = f"""You are a helpful AI. You are given a directory structure of the company files and you need to analyze them based on the objective. Use the tools you have at your disposal to achieve the objective. 
+def build_example_bundle(analysis, tree, objective, system_message):
+    """Everything /example needs, including the messages its conversation starts with."""
+    return {"version": EXAMPLE_BUNDLE_VERSION, "analysis": analysis, "tree": tree,
+            "objective": objective, "system_message": system_message,
+            "messages": messages_to_dict([SystemMessage(content=system_message)])}
 
-Always explain how you've conducted your analysis: steps taken to get to the answer. If you're making assumptions, state and justify them.
 
-For example, if the user asks for a financial metric, give the result, then outline the files used, the values used from the files, and the calculations performed (if applicable). 
+def save_example_data(analysis, tree, objective, repo_overview):
+    bundle = build_example_bundle(analysis, tree, objective, system_message_content(repo_overview))
 
-This is the directory structure(Note when specifying a file path, you are supposed to include the root): \n\n{repo_overview}"""
-        f.write(system_message_content)
+    os.makedirs(os.path.dirname(EXAMPLE_BUNDLE_PATH), exist_ok=True)
+    # Written to a temporary file and renamed, so readers never see half a bundle
+    temporary_path = f"{EXAMPLE_BUNDLE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(bundle, f)
+    os.replace(temporary_path, EXAMPLE_BUNDLE_PATH)
 
 
-def load_example_data():
+def _load_legacy_bundle():
     with open(EXAMPLE_ANALYSIS_PATH, 'r') as f:
         analysis = json.load(f)
 
@@ -44,4 +50,47 @@ def load_example_data():
     with open(EXAMPLE_SYSTEM_MSG_PATH, 'r') as f:
         system_message = f.read()
 
-    return analysis, tree, objective, system_message
+    return build_example_bundle(analysis, tree, objective, system_message)
+
+
+class ExampleBundle:
+    """Parsed example bundle: the tree, seed messages and corpus hash are built once."""
+
+    def __init__(self, data):
+        self.analysis = data["analysis"]
+        self.objective = data["objective"]
+        self.system_message = data["system_message"]
+        self.tree = CompactTree.from_json(data["tree"])
+        self.messages = messages_from_dict(data["messages"])
+        self.corpus = hashlib.sha256(json.dumps(data["tree"]).encode("utf-8")).hexdigest()
+
+
+_bundle = None  # (mtime_ns, ExampleBundle)
+_bundle_lock = threading.Lock()
+
+
+def get_example_bundle():
+    """Memoized example bundle, reloaded when a new upload replaces it. None if there is no example."""
+    global _bundle
+    try:
+        stamp = os.stat(EXAMPLE_BUNDLE_PATH).st_mtime_ns
+    except FileNotFoundError:
+        stamp = None
+
+    with _bundle_lock:
+        if _bundle is not None and _bundle[0] == stamp:
+            return _bundle[1]
+
+        data = None
+        if stamp is not None:
+            with open(EXAMPLE_BUNDLE_PATH, 'r') as f:
+                data = json.load(f)
+            if data.get("version") != EXAMPLE_BUNDLE_VERSION:
+                data = None
+        if data is None and os.path.exists(EXAMPLE_ANALYSIS_PATH):
+            data = _load_legacy_bundle()
+        if data is None:
+            return None
+
+        _bundle = (stamp, ExampleBundle(data))
+        return _bundle[1]
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+from flask_app.config import Config
+from flask_app.instrumentation import count_cache
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """sha256 of the file bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileCache:
+    """Persistent content-addressed cache backed by a single SQLite file.
+
+    Values are zlib compressed text. Entries are keyed by (kind, version, digest) so a
+    loader or prompt change invalidates old entries without touching them, and the least
+    recently used entries are evicted once the stored size goes over max_bytes.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _key(kind, version, digest):
+        return f"{kind}:{version}:{digest}"
+
+    def get(self, kind, version, digest):
+        key = self._key(kind, version, digest)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                with self._lock:
+                    self.misses[kind] += 1
+                count_cache(f"file_{kind}", hit=False)
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?",
+                         (time.time(), key))
+        with self._lock:
+            self.hits[kind] += 1
+        count_cache(f"file_{kind}", hit=True)
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, kind, version, digest, value):
+        blob = zlib.compress(value.encode('utf-8'))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (self._key(kind, version, digest), blob, len(blob), time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._lock:
+            return {"entries": entries, "bytes": size,
+                    "hits": dict(self.hits), "misses": dict(self.misses)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_file_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FileCache(Config.FILE_CACHE_PATH,
+                               Config.FILE_CACHE_MAX_BYTES)
+        return _cache
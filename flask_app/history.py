@@ -0,0 +1,137 @@
+import json
+import sqlite3
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from flask_app.config import Config
+from flask_app.context_packing import message_tokens, truncate_to_tokens
+
+# PRAGMA auto_vacuum value of INCREMENTAL
+INCREMENTAL_VACUUM = 2
+# Bytes the WAL file is cut back to after a checkpoint
+WAL_SIZE_LIMIT = 1024 * 1024
+
+
+def _split_turns(messages):
+    """Messages before the first question, and each question with the messages answering it."""
+    head, turns = [], []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            turns.append([message])
+        elif turns:
+            turns[-1].append(message)
+        else:
+            head.append(message)
+    return head, turns
+
+
+def _shorten_tool_output(message, budget):
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    shortened = truncate_to_tokens(text, budget)
+    if shortened == text:
+        return message
+    return message.copy(update={"content": shortened + "\n[Output shortened. Call the tool again for all of it.]"})
+
+
+def trim_history(messages, budget=None, keep_turns=None, tool_output_tokens=None):
+    """Messages of a conversation as sent to the model.
+
+    Only the latest system message is kept, at the start. Tool outputs of all but the last
+    keep_turns questions are cut to tool_output_tokens, and the oldest questions are left
+    out, whole, until the prompt fits in budget tokens. The current question is always sent.
+    """
+    budget = budget or Config.HISTORY_TOKEN_BUDGET
+    keep_turns = max(keep_turns or Config.HISTORY_KEEP_TURNS, 1)
+    tool_output_tokens = tool_output_tokens or Config.HISTORY_TOOL_OUTPUT_TOKENS
+
+    system_messages = [message for message in messages if isinstance(message, SystemMessage)]
+    head, turns = _split_turns([message for message in messages
+                                if not isinstance(message, SystemMessage)])
+    head = system_messages[-1:] + head
+
+    old_turns = len(turns) - keep_turns
+    turns = [[_shorten_tool_output(message, tool_output_tokens)
+              if i < old_turns and isinstance(message, ToolMessage) else message
+              for message in turn]
+             for i, turn in enumerate(turns)]
+
+    turn_tokens = [sum(message_tokens(message) for message in turn) for turn in turns]
+    available = budget - sum(message_tokens(message) for message in head)
+    total = sum(turn_tokens)
+    first = 0
+    while first < len(turns) - 1 and total > available:
+        total -= turn_tokens[first]
+        first += 1
+
+    trimmed = list(head)
+    if first:
+        trimmed.append(SystemMessage(
+            content=f"The first {first} questions of this conversation and their answers are left out."))
+    for turn in turns[first:]:
+        trimmed.extend(turn)
+    return trimmed
+
+
+class CompactingSqliteSaver(SqliteSaver):
+    """SqliteSaver that keeps only the latest `keep` checkpoints of each conversation.
+
+    Every checkpoint holds the whole conversation, so keeping all of them grows the file
+    quadratically with the number of questions. keep=0 keeps all.
+
+    Deleted rows only free pages inside the file. Every `shrink_every` compactions the free
+    pages are released (auto_vacuum=INCREMENTAL) and the WAL is checkpointed, on a connection
+    of its own; the WAL file is cut back to WAL_SIZE_LIMIT once it has been checkpointed.
+    """
+
+    def __init__(self, conn, keep, shrink_every=20, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.keep = keep
+        self.shrink_every = shrink_every
+        self.compactions = 0
+        self.path = conn.execute("PRAGMA database_list").fetchone()[2]
+        conn.execute(f"PRAGMA journal_size_limit={WAL_SIZE_LIMIT}")
+        # auto_vacuum can only be changed on a database without tables, or by a VACUUM
+        if keep > 0 and conn.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_VACUUM:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+
+    def put(self, config, checkpoint, metadata):
+        saved = super().put(config, checkpoint, metadata)
+        if self.keep > 0:
+            self.compact(saved["configurable"]["thread_id"])
+        return saved
+
+    def compact(self, thread_id):
+        thread_id = str(thread_id)
+        with self.lock, self.cursor() as cur:
+            # Checkpoint ids are time ordered; nothing is deleted while there are fewer than keep
+            cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND thread_ts < ("
+                "SELECT thread_ts FROM checkpoints WHERE thread_id = ? "
+                "ORDER BY thread_ts DESC LIMIT 1 OFFSET ?)",
+                (thread_id, thread_id, self.keep - 1))
+            if cur.rowcount <= 0:
+                return
+            self.compactions += 1
+            shrink = self.shrink_every > 0 and self.compactions % self.shrink_every == 0
+        if shrink:
+            self.shrink()
+
+    def shrink(self):
+        """Give free pages back to the file system. Failing to is logged, never raised."""
+        # In-memory databases have no path, and nothing to shrink
+        if not self.path:
+            return
+        try:
+            conn = sqlite3.connect(self.path, timeout=1)
+            try:
+                # incremental_vacuum frees a page per row it steps through, so it is read to the end
+                conn.execute("PRAGMA incremental_vacuum").fetchall()
+                conn.commit()
+                # PASSIVE never waits for readers or writers; what it cannot copy is left for the next one
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error shrinking checkpoint database {self.path}: {e}")
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import zipfile
+
+from flask import Request, current_app
+
+from flask_app.config import Config
+
+ALLOWED_EXTENSIONS = {'.csv', '.xls', '.xlsx',
+                      '.pdf', '.doc', '.docx', '.txt', '.md'}
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ZipLimitExceeded(Exception):
+    pass
+
+
+def _member_target(dest_dir, member_name):
+    """Path to extract a member to, or None if the name would escape dest_dir."""
+    parts = [p for p in member_name.replace('\\', '/').split('/')
+             if p not in ('', '.')]
+    if not parts or '..' in parts or os.path.isabs(member_name):
+        return None
+    return os.path.normpath(os.path.join(dest_dir, *parts))
+
+
+def iter_zip_members(fileobj, dest_dir, allowed_extensions=ALLOWED_EXTENSIONS,
+                     max_members=None, max_total_bytes=None):
+    """Extract the allowed members of a ZIP one at a time, yielding each path once it is on disk.
+
+    fileobj only needs to be seekable, so members are read from it in place; for uploads it
+    is the request's spooled file (see UploadRequest), never another copy. Members with
+    other extensions are skipped without being decompressed.
+    Raises ZipLimitExceeded when the archive has too many entries or the extracted
+    files would exceed max_total_bytes, checked against both the declared and the
+    actual decompressed sizes.
+    """
+    max_members = max_members or Config.ZIP_MAX_MEMBERS
+    max_total_bytes = max_total_bytes or Config.ZIP_MAX_TOTAL_BYTES
+
+    with zipfile.ZipFile(fileobj) as zip_ref:
+        infos = zip_ref.infolist()
+        if len(infos) > max_members:
+            raise ZipLimitExceeded(
+                f"Archive has {len(infos)} entries, limit is {max_members}")
+
+        total_bytes = 0
+        for info in infos:
+            if info.is_dir():
+                continue
+            if os.path.splitext(info.filename)[1].lower() not in allowed_extensions:
+                continue
+            target = _member_target(dest_dir, info.filename)
+            if target is None:
+                print(f"Skipping unsafe archive member {info.filename}")
+                continue
+            if total_bytes + info.file_size > max_total_bytes:
+                raise ZipLimitExceeded(
+                    f"Extracted size exceeds limit of {max_total_bytes} bytes")
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zip_ref.open(info) as src, open(target, 'wb') as dst:
+                while True:
+                    chunk = src.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    total_bytes += len(chunk)
+                    if total_bytes > max_total_bytes:
+                        raise ZipLimitExceeded(
+                            f"Extracted size exceeds limit of {max_total_bytes} bytes")
+                    dst.write(chunk)
+
+            yield target
+
+
+def extract_zip(fileobj, dest_dir, **limits):
+    return list(iter_zip_members(fileobj, dest_dir, **limits))
+
+
+def upload_jobs_dir(upload_folder):
+    """Folder of the archives upload jobs work from."""
+    jobs_dir = os.path.join(upload_folder, 'jobs')
+    os.makedirs(jobs_dir, exist_ok=True)
+    return jobs_dir
+
+
+class UploadRequest(Request):
+    """Request that spools uploaded files to named temporary files in the upload jobs folder.
+
+    werkzeug's default spool file has no name, so keeping an upload past the request meant
+    copying it. A named one can be handed to the job with save_upload instead. The spooled
+    file is deleted when the request is closed.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.NamedTemporaryFile(
+            dir=upload_jobs_dir(current_app.config['UPLOAD_FOLDER']), suffix=".upload")
+
+
+def save_upload(file, path):
+    """Keep an uploaded file at path after the request: a hard link to the spooled file, a copy if that fails."""
+    name = getattr(file.stream, "name", None)
+    if isinstance(name, str):
+        file.stream.flush()
+        try:
+            os.link(name, path)
+            return
+        except OSError as e:
+            print(f"Error linking upload {name} to {path}, copying it: {e}")
+    file.save(path)
@@ -0,0 +1,189 @@
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from flask_app.config import Config
+from flask_app import sandbox
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MAX_TRACED_SESSIONS = 100
+
+# USD per million (prompt, completion) tokens. Versioned names (gpt-4o-2024-05-13) use the
+# longest matching prefix; models not listed are counted in tokens only
+MODEL_PRICES = {
+    "gpt-4o": (5.00, 15.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+# Span that new spans are recorded under
+current_span_id = contextvars.ContextVar("current_span_id", default=None)
+
+
+class Metrics:
+    """Counters and duration histograms rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, metric, value=1, help_text="", **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(metric, ("counter", help_text))
+            self._counters[key] += value
+
+    def observe(self, metric, value, help_text="", **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(metric, ("histogram", help_text))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][position] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        def label_text(labels, extra=()):
+            pairs = [f'{key}="{_escape(value)}"' for key, value in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), total, count))
+                                for key, (counts, total, count) in self._histograms.items())
+            help_texts = dict(self._help)
+
+        lines = []
+        for name, series in itertools.groupby(counters, key=lambda item: item[0][0]):
+            metric_type, help_text = help_texts[name]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            lines += [f"{name}{label_text(labels)} {value:g}" for (_, labels), value in series]
+        for name, series in itertools.groupby(histograms, key=lambda item: item[0][0]):
+            metric_type, help_text = help_texts[name]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for (_, labels), (counts, total, count) in series:
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', f'{bound:g}')])} {bucket_count}")
+                lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{label_text(labels)} {total:g}")
+                lines.append(f"{name}_count{label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class TraceStore:
+    """Most recent spans per session, in memory, for the last max_sessions sessions."""
+
+    def __init__(self, max_spans, max_sessions=MAX_TRACED_SESSIONS):
+        self.max_spans = max_spans
+        self.max_sessions = max_sessions
+        self._traces = OrderedDict()  # session id -> deque of spans
+        self._lock = threading.Lock()
+
+    def add(self, session_id, span):
+        with self._lock:
+            trace = self._traces.get(session_id)
+            if trace is None:
+                trace = self._traces[session_id] = deque(maxlen=self.max_spans)
+            self._traces.move_to_end(session_id)
+            trace.append(span)
+            while len(self._traces) > self.max_sessions:
+                self._traces.popitem(last=False)
+
+    def get(self, session_id):
+        with self._lock:
+            return list(self._traces.get(session_id, ()))
+
+
+metrics = Metrics()
+traces = TraceStore(Config.TRACE_MAX_SPANS)
+_span_ids = itertools.count(1)
+
+
+def enabled():
+    return Config.INSTRUMENTATION == "true"
+
+
+def new_span_id():
+    return f"span-{next(_span_ids)}"
+
+
+def record_span(kind, name, start, duration, span_id=None, parent_id=None, error=None, **attributes):
+    """Record a finished span: duration histogram, error counter and the current session's trace."""
+    metrics.observe("finance_agent_span_seconds", duration,
+                    "Duration of agent steps, LLM calls, tool calls, parses and REPL runs.",
+                    kind=kind, name=name)
+    if error is not None:
+        metrics.inc("finance_agent_span_errors_total", 1,
+                    "Spans that ended with an error.", kind=kind, name=name)
+
+    span = {"id": span_id or new_span_id(), "parent": parent_id, "kind": kind, "name": name,
+            "start": start, "duration": round(duration, 6), **attributes}
+    if error is not None:
+        span["error"] = error
+    traces.add(sandbox.current_session_id.get(), span)
+
+
+@contextlib.contextmanager
+def span(kind, name, **attributes):
+    """Time the block as a span. Spans started inside it are recorded as its children."""
+    if not enabled():
+        yield attributes
+        return
+
+    span_id = new_span_id()
+    parent_id = current_span_id.get()
+    token = current_span_id.set(span_id)
+    start, started = time.time(), time.perf_counter()
+    error = None
+    try:
+        # The block can add attributes (e.g. cache hits) to the yielded dict
+        yield attributes
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        current_span_id.reset(token)
+        record_span(kind, name, start, time.perf_counter() - started,
+                    span_id, parent_id, error, **attributes)
+
+
+def count_cache(cache, hit):
+    if enabled():
+        metrics.inc("finance_agent_cache_total", 1, "Cache lookups by cache and result.",
+                    cache=cache, result="hit" if hit else "miss")
+
+
+def model_price(model):
+    matches = [name for name in MODEL_PRICES if model == name or model.startswith(name + "-")]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def count_tokens_used(model, prompt_tokens, completion_tokens):
+    help_text = "LLM tokens by model and type."
+    metrics.inc("finance_agent_llm_tokens_total", prompt_tokens, help_text,
+                model=model, type="prompt")
+    metrics.inc("finance_agent_llm_tokens_total", completion_tokens, help_text,
+                model=model, type="completion")
+
+    price = model_price(model)
+    if price is not None:
+        metrics.inc("finance_agent_llm_cost_usd_total",
+                    (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6,
+                    "Estimated LLM cost in USD by model, from MODEL_PRICES.", model=model)
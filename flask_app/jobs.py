@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_app.config import Config
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Events of jobs that finished longer ago than this are deleted
+EVENTS_KEPT_SECONDS = 3600
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handle passed to a running job to report progress and check for cancellation."""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    def set_progress(self, done=None, total=None, message=None):
+        self.check_cancelled()
+        self.manager._update_progress(self.job_id, done, total, message)
+
+    def emit(self, event, data):
+        """Record an event (e.g. a model token or tool step) for /jobs/<id>/events."""
+        self.manager._add_event(self.job_id, event, data)
+
+    def check_cancelled(self):
+        if self.manager._cancel_requested(self.job_id):
+            raise JobCancelled()
+
+
+class JobManager:
+    """Runs long jobs on a local thread pool and tracks them in a SQLite table.
+
+    The tables are shared by every worker process, so status, progress, events and
+    cancellation requests work no matter which process serves the request. Jobs are cancelled
+    cooperatively: a running job stops at its next set_progress/check_cancelled call.
+    """
+
+    def __init__(self, db_path, max_workers):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "progress_done INTEGER NOT NULL DEFAULT 0, progress_total INTEGER NOT NULL DEFAULT 0, "
+                "progress_message TEXT, result TEXT, error TEXT, "
+                "cancel_requested INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, worker_token TEXT)")
+            # Tables created before jobs recorded the worker's process token
+            if "worker_token" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN worker_token TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, "
+                "event TEXT NOT NULL, data TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events(job_id, id)")
+        self._fail_orphaned_jobs()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _fail_orphaned_jobs(self):
+        """Jobs left queued/running by a process that no longer exists will never finish."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker_pid, worker_token FROM jobs WHERE status IN (?, ?)",
+                                (QUEUED, RUNNING)).fetchall()
+            for job_id, pid, token in rows:
+                if _worker_alive(pid, token):
+                    continue
+                conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                             (FAILED, "Worker exited before the job finished", time.time(), job_id))
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """Queue fn(job_context, *args, **kwargs) and return the job id. fn's return value must be JSON serializable."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, kind, status, worker_pid, worker_token, created_at, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (job_id, kind, QUEUED, os.getpid(), _process_token(os.getpid()), now, now))
+            conn.execute("DELETE FROM job_events WHERE job_id IN ("
+                         "SELECT id FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?)",
+                         (QUEUED, RUNNING, now - EVENTS_KEPT_SECONDS))
+        with self._lock:
+            self._futures[job_id] = self._executor.submit(
+                self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        context = JobContext(self, job_id)
+        try:
+            context.check_cancelled()
+            self._set(job_id, status=RUNNING)
+            result = fn(context, *args, **kwargs)
+            self._set(job_id, status=SUCCEEDED, result=json.dumps(result))
+        except JobCancelled:
+            self._set(job_id, status=CANCELLED)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._set(job_id, status=FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+    def _set(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?",
+                         (*fields.values(), job_id))
+
+    def _update_progress(self, job_id, done, total, message):
+        fields = {}
+        if done is not None:
+            fields["progress_done"] = done
+        if total is not None:
+            fields["progress_total"] = total
+        if message is not None:
+            fields["progress_message"] = message
+        if fields:
+            self._set(job_id, **fields)
+
+    def _add_event(self, job_id, event, data):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO job_events (job_id, event, data) VALUES (?, ?, ?)",
+                         (job_id, event, json.dumps(data)))
+
+    def events(self, job_id, after=0):
+        """Events of a job with an id greater than after, as (id, event, data), oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                                (job_id, after)).fetchall()
+        return [(event_id, event, json.loads(data)) for event_id, event, data in rows]
+
+    def _cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def cancel(self, job_id):
+        """Request cancellation. Returns False if the job does not exist or already finished."""
+        job = self.get(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return False
+        self._set(job_id, cancel_requested=1)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._set(job_id, status=CANCELLED)
+        return True
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": {"done": row["progress_done"], "total": row["progress_total"],
+                         "message": row["progress_message"]},
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _process_token(pid):
+    """Boot id and start time of a process, which tell it apart from a later process with the
+    same pid. None where /proc is not available."""
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The process name (in parentheses) may contain spaces; start time is the 20th field after it
+    return f"{boot_id}:{stat[stat.rindex(')') + 2:].split()[19]}"
+
+
+def _worker_alive(pid, token):
+    """Whether the process that queued a job is still running. Without a token only the pid is checked."""
+    if not _pid_alive(pid):
+        return False
+    return token is None or _process_token(pid) in (None, token)
+
+
+job_manager = JobManager(Config.JOB_DB_PATH, Config.JOB_WORKERS)
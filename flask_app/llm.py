@@ -0,0 +1,52 @@
+import threading
+
+from flask_app.config import Config
+
+# langchain_openai and httpx (with the openai SDK) take most of a second to import, so
+# they are imported by the first model created rather than at boot
+ChatOpenAI = None
+_http_client = None
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _openai_client():
+    """ChatOpenAI class and one connection pool for every model instance in the process."""
+    global ChatOpenAI, _http_client
+    if ChatOpenAI is None:
+        from langchain_openai import ChatOpenAI
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(600.0, connect=10.0))
+    return ChatOpenAI, _http_client
+
+
+def _create_chat_model(model, **kwargs):
+    from flask_app.cassette import RecordingChatModel, ReplayChatModel, get_cassette
+
+    if Config.LLM_MODE == "replay":
+        return ReplayChatModel(model_name=model, cassette=get_cassette(Config.LLM_CASSETTE_PATH),
+                               latency=Config.LLM_REPLAY_LATENCY)
+
+    chat_model_class, http_client = _openai_client()
+    chat_model = chat_model_class(model=model, http_client=http_client, **kwargs)
+    if Config.LLM_MODE == "record":
+        return RecordingChatModel(model_name=model, cassette=get_cassette(Config.LLM_CASSETTE_PATH),
+                                  live_model=chat_model)
+    return chat_model
+
+
+def get_chat_model(model="gpt-3.5-turbo", **kwargs):
+    """Shared chat model per (model, options); they are safe to use from several threads.
+
+    LLM_MODE "live" calls OpenAI, "record" also saves the responses to the cassette and
+    "replay" serves them from the cassette without network access.
+    """
+    key = (model, tuple(sorted(kwargs.items())))
+    with _models_lock:
+        if key not in _models:
+            _models[key] = _create_chat_model(model, **kwargs)
+        return _models[key]
@@ -0,0 +1,179 @@
+# numpy, pandas and the columnar loader are imported on first use: the tool schemas read
+# METRICS when the agent is built, which should not pull in the dataframe stack
+
+
+def _div(numerator, denominator):
+    import numpy as np
+    import pandas as pd
+
+    denominator = denominator.where(denominator != 0) if isinstance(
+        denominator, pd.Series) else (denominator or np.nan)
+    return numerator / denominator
+
+
+def growth(value):
+    """Period over period growth rate."""
+    return value.pct_change(fill_method=None)
+
+
+def cagr(value):
+    """Compound annual growth rate between the first and last period, one period per year."""
+    import numpy as np
+
+    value = value.dropna()
+    periods = len(value) - 1
+    if periods < 1 or value.iloc[0] <= 0 or value.iloc[-1] < 0:
+        return np.nan
+    return (value.iloc[-1] / value.iloc[0]) ** (1 / periods) - 1
+
+
+def gross_profit(revenue, cogs):
+    return revenue - cogs
+
+
+def gross_margin(revenue, cogs):
+    return _div(revenue - cogs, revenue)
+
+
+def margin(value, revenue):
+    """Any line item as a share of revenue (operating margin, net margin, EBITDA margin, ...)."""
+    return _div(value, revenue)
+
+
+def ebitda(operating_income, depreciation_amortization):
+    return operating_income + depreciation_amortization
+
+
+def ebitda_margin(operating_income, depreciation_amortization, revenue):
+    return _div(operating_income + depreciation_amortization, revenue)
+
+
+def ratio(numerator, denominator):
+    return _div(numerator, denominator)
+
+
+def current_ratio(current_assets, current_liabilities):
+    return _div(current_assets, current_liabilities)
+
+
+def debt_to_equity(total_debt, total_equity):
+    return _div(total_debt, total_equity)
+
+
+def total(value):
+    return value.sum()
+
+
+def average(value):
+    return value.mean()
+
+
+# name -> (function, inputs in call order, whether the result is a percentage)
+METRICS = {
+    "growth": (growth, ["value"], True),
+    "cagr": (cagr, ["value"], True),
+    "gross_profit": (gross_profit, ["revenue", "cogs"], False),
+    "gross_margin": (gross_margin, ["revenue", "cogs"], True),
+    "margin": (margin, ["value", "revenue"], True),
+    "ebitda": (ebitda, ["operating_income", "depreciation_amortization"], False),
+    "ebitda_margin": (ebitda_margin, ["operating_income", "depreciation_amortization", "revenue"], True),
+    "ratio": (ratio, ["numerator", "denominator"], False),
+    "current_ratio": (current_ratio, ["current_assets", "current_liabilities"], False),
+    "debt_to_equity": (debt_to_equity, ["total_debt", "total_equity"], False),
+    "total": (total, ["value"], False),
+    "average": (average, ["value"], False),
+}
+
+ALIASES = {
+    "revenue_growth": "growth",
+    "yoy_growth": "growth",
+    "growth_rate": "growth",
+    "compound_annual_growth_rate": "cagr",
+    "operating_margin": "margin",
+    "net_margin": "margin",
+    "net_profit_margin": "margin",
+    "gross_profit_margin": "gross_margin",
+    "sum": "total",
+    "mean": "average",
+}
+
+
+def normalize_metric(metric):
+    name = metric.strip().lower().replace("-", "_").replace(" ", "_")
+    return ALIASES.get(name, name)
+
+
+def resolve_series(df, reference, orientation="columns"):
+    """Numeric series for a column name, or for a row label (first column) when orientation is "rows"."""
+    import pandas as pd
+
+    if orientation == "rows":
+        labels = df.iloc[:, 0].astype(str).str.strip()
+        matches = df[labels.str.lower() == str(reference).strip().lower()]
+        if matches.empty:
+            raise KeyError(
+                f"Row {reference!r} not found. Available rows: {labels.tolist()[:50]}")
+        return pd.to_numeric(matches.iloc[0, 1:], errors="coerce")
+
+    if reference not in df.columns:
+        raise KeyError(
+            f"Column {reference!r} not found. Available columns: {list(df.columns)}")
+    series = pd.to_numeric(df[reference], errors="coerce")
+    return series
+
+
+def compute_metric(metric, df, inputs, orientation="columns"):
+    """Compute a registered metric on a DataFrame. inputs maps each metric input to a column name or row label."""
+    name = normalize_metric(metric)
+    if name not in METRICS:
+        raise KeyError(f"Unknown metric {metric!r}")
+    function, required, is_percentage = METRICS[name]
+
+    missing = [input_name for input_name in required if input_name not in inputs]
+    if missing:
+        raise ValueError(
+            f"Metric {name} needs inputs {required}, missing {missing}")
+
+    series = [resolve_series(df, inputs[input_name], orientation)
+              for input_name in required]
+    return name, function(*series), is_percentage
+
+
+# Rows of a series result shown to the model: the first and last half, with a count of the rest
+MAX_RESULT_ROWS = 20
+
+
+def format_result(result, is_percentage):
+    """Percentages with two decimals, other values as grouped fixed-point numbers with two decimals."""
+    import pandas as pd
+
+    def fmt(value):
+        if pd.isna(value):
+            return "n/a"
+        return f"{value:.2%}" if is_percentage else f"{value:,.2f}"
+
+    if not isinstance(result, pd.Series):
+        return fmt(result)
+
+    def lines(series):
+        return [f"{index}: {fmt(value)}" for index, value in series.items()]
+
+    if len(result) <= MAX_RESULT_ROWS:
+        return "\n".join(lines(result))
+    half = MAX_RESULT_ROWS // 2
+    omitted = len(result) - 2 * half
+    return "\n".join([f"{len(result)} rows, first and last {half} shown:"] + lines(result.iloc[:half])
+                     + [f"... {omitted} rows omitted. Use python_repl with load_table for all of them ..."]
+                     + lines(result.iloc[-half:]))
+
+
+def calculate(file_path, metric, inputs, sheet=None, orientation="columns"):
+    """Load the sheet and compute the metric. Returns the formatted answer with its sources."""
+    from flask_app.columnar import load_table
+
+    df = load_table(file_path, sheet)
+    name, result, is_percentage = compute_metric(metric, df, inputs, orientation)
+
+    sources = ", ".join(f"{input_name}={reference!r}" for input_name, reference in inputs.items())
+    return (f"{name} computed from {file_path} (sheet: {sheet or 'first'}, {orientation}: {sources}):\n"
+            f"{format_result(result, is_percentage)}")
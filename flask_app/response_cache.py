@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask_app.config import Config
+from flask_app.file_cache import file_digest
+from flask_app.instrumentation import count_cache
+
+# Most recent entries compared when looking up a question by similarity
+MAX_SIMILARITY_CANDIDATES = 1000
+
+
+def normalize_text(text):
+    """Lowercase with collapsed whitespace and no trailing punctuation."""
+    return re.sub(r"\s+", " ", str(text)).strip().lower().rstrip("?!. ")
+
+
+def normalize_args(args):
+    return json.dumps({key: normalize_text(value) if isinstance(value, str) else value
+                       for key, value in args.items()}, sort_keys=True)
+
+
+def corpus_digest(file_paths):
+    """Hash of the paths and contents of an upload's files."""
+    digest = hashlib.sha256()
+    for path in sorted(file_paths):
+        digest.update(path.encode("utf-8"))
+        digest.update(file_digest(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Answers and tool results keyed by (corpus hash, scope, context, normalized question or arguments).
+
+    The context is whatever else the value depends on, e.g. the conversation before a question.
+
+    Entries live in SQLite so they are shared by workers. They expire after ttl_seconds and
+    the least recently used go once there are more than max_entries. With a similarity
+    threshold, a question without an exact match can be answered by the most similar
+    question asked on the same corpus and context.
+    """
+
+    def __init__(self, path, ttl_seconds, max_entries, similarity=0.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._embedder = None
+        if similarity > 0:
+            # Only similarity lookups need the embedder (and numpy)
+            from flask_app.doc_index import get_embedder
+            self._embedder = get_embedder()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, corpus TEXT NOT NULL, scope TEXT NOT NULL, text TEXT NOT NULL, "
+                "embedding BLOB, value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL, "
+                "context TEXT NOT NULL DEFAULT '')")
+            # Caches created before entries had a context
+            if "context" not in [row[1] for row in conn.execute("PRAGMA table_info(entries)")]:
+                conn.execute("ALTER TABLE entries ADD COLUMN context TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_corpus ON entries(corpus, scope)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+            # Corpus of each session, and of each upload folder for invalidation
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS corpora ("
+                "thread_id TEXT PRIMARY KEY, root TEXT NOT NULL, corpus TEXT NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _key(corpus, scope, context, text):
+        return hashlib.sha256(f"{corpus}\0{scope}\0{context}\0{text}".encode("utf-8")).hexdigest()
+
+    def set_session_corpus(self, thread_id, root, corpus):
+        """Record the session's corpus. Entries of a previous corpus of the same folder are dropped."""
+        with self._connect() as conn:
+            stale = [row[0] for row in conn.execute(
+                "SELECT DISTINCT corpus FROM corpora WHERE root = ? AND corpus != ?", (root, corpus))]
+            for old_corpus in stale:
+                conn.execute("DELETE FROM entries WHERE corpus = ?", (old_corpus,))
+            conn.execute("UPDATE corpora SET corpus = ? WHERE root = ?", (corpus, root))
+            conn.execute("INSERT OR REPLACE INTO corpora (thread_id, root, corpus) VALUES (?, ?, ?)",
+                         (thread_id, root, corpus))
+
+    def session_corpus(self, thread_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT corpus FROM corpora WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row[0] if row else None
+
+    def invalidate(self, corpus):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE corpus = ?", (corpus,))
+
+    def get(self, corpus, scope, text, similar=False, context=""):
+        """Cached value and metadata ({"match", "age_seconds", "similarity"}), or None."""
+        now = time.time()
+        text = normalize_text(text)
+        key = self._key(corpus, scope, context, text)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key, value, created, 1.0 FROM entries WHERE key = ? AND created >= ?",
+                (key, now - self.ttl_seconds)).fetchone()
+            match = "exact"
+            if row is None and similar and self._embedder is not None:
+                row = self._most_similar(conn, corpus, scope, context, text, now)
+                match = "similar"
+            if row is not None:
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, row[0]))
+        count_cache(f"response_{scope}", hit=row is not None)
+        if row is None:
+            return None
+
+        metadata = {"hit": True, "match": match, "age_seconds": round(now - row[2], 1)}
+        if match == "similar":
+            metadata["similarity"] = round(row[3], 3)
+        return row[1], metadata
+
+    def _most_similar(self, conn, corpus, scope, context, text, now):
+        import numpy as np
+
+        rows = conn.execute(
+            "SELECT key, value, created, embedding FROM entries "
+            "WHERE corpus = ? AND scope = ? AND context = ? AND embedding IS NOT NULL AND created >= ? "
+            "ORDER BY last_access DESC LIMIT ?",
+            (corpus, scope, context, now - self.ttl_seconds, MAX_SIMILARITY_CANDIDATES)).fetchall()
+        if not rows:
+            return None
+        vectors = np.stack([np.frombuffer(row[3], dtype=np.float32) for row in rows])
+        scores = vectors @ self._embedder.embed([text])[0]
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        key, value, created, _ = rows[best]
+        return key, value, created, float(scores[best])
+
+    def put(self, corpus, scope, text, value, similar=False, context=""):
+        now = time.time()
+        text = normalize_text(text)
+        embedding = None
+        if similar and self._embedder is not None:
+            embedding = self._embedder.embed([text])[0].astype("float32").tobytes()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, corpus, scope, text, embedding, value, created, last_access, context) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(corpus, scope, context, text), corpus, scope, text, embedding, value, now, now, context))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+        excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                (excess,))
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, corpora = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT corpus) FROM entries").fetchone()
+        return {"entries": entries, "corpora": corpora}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache, or None when RESPONSE_CACHE is off."""
+    global _cache
+    if Config.RESPONSE_CACHE != "true":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(Config.RESPONSE_CACHE_PATH, Config.RESPONSE_CACHE_TTL_SECONDS,
+                                   Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_SIMILARITY)
+        return _cache
+
+
+def cached_file_tool(tool_name, file_path, args, compute):
+    """Result of a tool over one file, cached on the file's content hash and the other arguments.
+
+    Error results are not cached.
+    """
+    cache = get_response_cache()
+    try:
+        corpus = file_digest(file_path) if cache is not None else None
+    except OSError:
+        corpus = None
+    if corpus is None:
+        return compute()
+
+    text = normalize_args(args)
+    cached = cache.get(corpus, tool_name, text)
+    if cached is not None:
+        return cached[0]
+
+    result = compute()
+    if isinstance(result, str) and result and not result.startswith("Error"):
+        cache.put(corpus, tool_name, text, result)
+    return result
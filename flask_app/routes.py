@@ -1,21 +1,33 @@
-from flask import request, jsonify, render_template, current_app, send_from_directory
+from flask import request, jsonify, render_template, current_app, send_from_directory, session, g, Response
 from werkzeug.utils import secure_filename
 import os
-import zipfile
 import json
-from flask_app.controllers import analyze_directory_objective, setup_agent_executor, create_directory_tree, create_directory_tree_text, example_agent_setup
+import hashlib
+import time
+import uuid
+from flask_app.controllers import analyze_directory_objective, build_directory_tree, directory_tree_text, example_agent_setup, analyze_files, record_cached_answer, questions_digest
+from flask_app.ingestion import iter_zip_members, save_upload, upload_jobs_dir
 from langchain_core.messages import HumanMessage
-from flask_app.example_processing import save_example_data, load_example_data
-
-agent_executor = None
-thread_id = None
+from flask_app.example_processing import save_example_data, get_example_bundle
+from flask_app.sessions import session_manager
+from flask_app.jobs import job_manager
+from flask_app.sandbox import sandbox_session
+from flask_app.session_files import is_thread_id
+from flask_app.tree import CompactTree, load_session_tree, save_session_tree, get_session_tree
+from flask_app.config import Config
+from flask_app.instrumentation import span, metrics, traces, enabled as instrumentation_enabled
+from flask_app.tracing import instrumented
+from flask_app.streaming import wants_event_stream, sse_event, sse_response, stream_agent_events, JobEvents, job_event_stream
+from flask_app.response_cache import get_response_cache, corpus_digest
 
 # Ensure the directory for uploaded images exists
 if not os.path.exists('uploads/images'):
     os.makedirs('uploads/images')
 
-EXAMPLE_ANALYSIS_PATH = 'example_data/example_analysis.json'
-EXAMPLE_TREE_PATH = 'example_data/example_tree.json'
+def current_thread_id():
+    """Thread id of the session cookie, or None if it is missing or not a valid id."""
+    thread_id = session.get('thread_id')
+    return thread_id if is_thread_id(thread_id) else None
 
 
 @current_app.route('/')
@@ -23,9 +35,127 @@ def index():
     return render_template('index.html')
 
 
+def build_repo_overview(archive, upload_folder, extracted_dir, use_sample_overview, thread_id, job=None, append=False):
+    """Extract the uploaded archive and return the (json, text) directory overviews.
+
+    With append, the new files are added to the session's existing tree.
+
+    When job is given, the number of extracted and summarized files is reported as its
+    progress, which is also where a cancelled job stops.
+    """
+    # Members are extracted straight from the archive stream, skipping disallowed extensions
+    extracted_files = iter_zip_members(archive, upload_folder)
+    progress = {"extracted": 0, "analyzed": 0}
+
+    def track_extraction(files):
+        for path in files:
+            progress["extracted"] += 1
+            if job:
+                job.set_progress(total=progress["extracted"],
+                                 message="Parsing and summarizing files")
+            yield path
+
+    def track_analysis(file_path, analysis):
+        progress["analyzed"] += 1
+        if job:
+            job.set_progress(done=progress["analyzed"])
+
+    extracted_files = track_extraction(extracted_files)
+
+    use_document_index = Config.DOCUMENT_INDEX == "true"
+
+    if use_sample_overview:
+        file_paths = list(extracted_files)
+
+        with open('example_data/SaaSCO_Tree.json', 'r') as f:
+            repo_overview_json = json.load(f)
+
+        # Read text from example_data/ChipCo.txt and save as chipco_text
+        with open('example_data/SaaSCo.txt', 'r') as f:
+            chipco_text = f.read()
+        repo_overview_text = chipco_text
+        save_session_tree(thread_id, CompactTree.from_json(repo_overview_json))
+        # The overview is the same for every upload, so answers are cached on the uploaded files
+        set_session_corpus(thread_id, extracted_dir, files=file_paths)
+        indexed_paths = file_paths
+    else:
+        # Each file is parsed and summarized as soon as it is extracted
+        with span("upload", "extract_and_summarize"):
+            analyses = analyze_files(extracted_files, on_result=track_analysis)
+        file_paths = list(analyses)
+
+        with span("upload", "directory_tree"):
+            tree = load_session_tree(thread_id) if append else None
+            if tree is None:
+                tree = build_directory_tree(
+                    extracted_dir, file_analysis=True, analyses=analyses)
+            else:
+                for file_path in file_paths:
+                    tree.add_file(file_path, analyses[file_path])
+            save_session_tree(thread_id, tree)
+
+            repo_overview_json = tree.to_json()
+            # With the document index the agent searches for content, so the prompt skips per-file summaries
+            repo_overview_text = directory_tree_text(
+                tree, file_analysis=not use_document_index)
+
+        # The index and the cached answers cover the whole tree, including files added before
+        indexed_paths = [path for _, path in tree.files()]
+        # Cached answers of the previous files in this folder no longer apply
+        set_session_corpus(thread_id, tree.root_path, files=indexed_paths)
+
+    # The dataframe and index stacks are imported by the first upload, not at boot
+    if Config.TABLE_EXTRACTS == "true":
+        from flask_app.columnar import extract_tables, tables_dir_for
+        if job:
+            job.set_progress(message="Extracting tables")
+        with span("upload", "extract_tables"):
+            extract_tables(file_paths, tables_dir_for(extracted_dir))
+
+    if use_document_index:
+        from flask_app.doc_index import build_document_index
+        if job:
+            job.set_progress(message="Indexing documents")
+        with span("upload", "index_documents"):
+            build_document_index(extracted_dir, indexed_paths, thread_id)
+
+    return repo_overview_json, repo_overview_text
+
+
+def run_upload_job(job, archive_path, upload_folder, extracted_dir, use_sample_overview, objective, thread_id, append=False):
+    with sandbox_session(thread_id), span("upload", "job"):
+        return _run_upload_job(job, archive_path, upload_folder, extracted_dir,
+                               use_sample_overview, objective, thread_id, append)
+
+
+def _run_upload_job(job, archive_path, upload_folder, extracted_dir, use_sample_overview, objective, thread_id, append):
+    try:
+        with open(archive_path, 'rb') as archive:
+            repo_overview_json, repo_overview_text = build_repo_overview(
+                archive, upload_folder, extracted_dir, use_sample_overview, thread_id, job, append)
+    finally:
+        os.remove(archive_path)
+
+    job.emit("tree", tree_root(get_session_tree(thread_id)))
+    job.set_progress(message="Analyzing objective")
+    agent_executor = session_manager.get(thread_id)
+    # Tokens and tool steps are recorded on the job for /jobs/<id>/events
+    events = JobEvents(job)
+    directory_analysis = analyze_directory_objective(
+        repo_overview_text, objective, agent_executor, thread_id, append, events)
+    events.flush()
+    job.check_cancelled()
+
+    # Save processed data for an example including objective
+    save_example_data(directory_analysis, repo_overview_json,
+                      objective, repo_overview_text)
+
+    # The tree is browsed through the /tree endpoints rather than returned whole
+    return {"analysis": directory_analysis}
+
+
 @current_app.route('/upload', methods=['POST'])
 def upload_file():
-    global agent_executor, thread_id
     if 'file' not in request.files:
         return "No file part"
     file = request.files['file']
@@ -33,58 +163,110 @@ def upload_file():
         return "No selected file"
     if file:
         filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(current_app.config['UPLOAD_FOLDER'])
-
+        upload_folder = current_app.config['UPLOAD_FOLDER']
         extracted_dir = os.path.join(
-            current_app.config['UPLOAD_FOLDER'], os.path.splitext(filename)[0])
+            upload_folder, os.path.splitext(filename)[0])
+        use_sample_overview = current_app.config['USE_SAMPLE_OVERVIEW'] == "true"
 
         objective = request.form.get('objective', '')
 
-        agent_executor, thread_id = setup_agent_executor(objective)
+        # append adds the archive's files to the current session instead of starting a new one
+        thread_id = current_thread_id()
+        append = request.form.get('append') == "true" and thread_id is not None
+        if not append:
+            _, thread_id = session_manager.create(objective)
+            session['thread_id'] = thread_id
 
-        # File analysis flag is used to determine if the file level analysis should be conducted
-        # repo_overview_json = create_directory_tree(
-        #     extracted_dir, file_analysis=True)
+        # The spooled upload is deleted with the request, so the job takes it over (no copy)
+        archive_path = os.path.join(upload_jobs_dir(upload_folder), f"{uuid.uuid4()}.zip")
+        save_upload(file, archive_path)
 
-        with open('example_data/SaaSCO_Tree.json', 'r') as f:
-            repo_overview_json = json.load(f)
+        job_id = job_manager.submit(
+            "upload", run_upload_job, archive_path, upload_folder, extracted_dir,
+            use_sample_overview, objective, thread_id, append)
 
-        # Read text from example_data/ChipCo.txt and save as chipco_text
-        with open('example_data/SaaSCo.txt', 'r') as f:
-            chipco_text = f.read()
-        repo_overview_text = chipco_text
+        return jsonify({"job_id": job_id}), 202
+
+
+@current_app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
-        # repo_overview_text = create_directory_tree_text(
-        #     extracted_dir, file_analysis=True)
 
-        directory_analysis = analyze_directory_objective(
-            repo_overview_text, objective, agent_executor, thread_id)
+@current_app.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    return sse_response(job_event_stream(job_id, after))
 
-        # Save processed data for an example including objective
-        save_example_data(directory_analysis, repo_overview_json,
-                          objective, repo_overview_text)
 
-        return jsonify({"analysis": directory_analysis, "tree": repo_overview_json})
+@current_app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 409
+    return jsonify(job_manager.get(job_id))
+
+
+def set_session_corpus(thread_id, root, content=None, files=None):
+    """Record what the session's answers are cached on: its files, or content standing in for them."""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    if files is not None:
+        corpus = corpus_digest(files)
+    else:
+        corpus = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    cache.set_session_corpus(thread_id, root, corpus)
 
 
 @current_app.route('/ask', methods=['POST'])
 def ask_question():
-    global agent_executor, thread_id
-    if not agent_executor or not thread_id:
+    thread_id = current_thread_id()
+    agent_executor = session_manager.get(thread_id)
+    if not agent_executor:
         return "Session not initialized"
 
-    question = request.json.get('question', '')
-    question += "\n Return how you've conducted your analysis: steps taken to get to the answer. If you're making assumptions, state and justify them."
+    asked = request.json.get('question', '')
+    question = asked + "\n Return how you've conducted your analysis: steps taken to get to the answer. If you're making assumptions, state and justify them."
+
+    # The same question on the same files, after the same objective and questions, is answered
+    # from the cache, and still added to the conversation
+    cache = get_response_cache()
+    corpus = cache.session_corpus(thread_id) if cache is not None else None
+    context = questions_digest(agent_executor, thread_id) if corpus else None
+    cached = cache.get(corpus, "ask", asked, similar=True, context=context) if corpus else None
+    if cached is not None:
+        answer, metadata = cached
+        record_cached_answer(agent_executor, thread_id, question, answer)
+        if wants_event_stream():
+            return sse_response(iter([sse_event("final", {"response": answer, "cache": metadata})]))
+        return jsonify({"response": answer, "cache": metadata})
+
+    def store(answer):
+        if corpus and answer:
+            cache.put(corpus, "ask", asked, answer, similar=True, context=context)
 
-    response = agent_executor.invoke({"messages": [HumanMessage(content=question)]}, config={
-                                     "configurable": {"thread_id": thread_id}})
+    inputs = {"messages": [HumanMessage(content=question)]}
+    config = instrumented({"configurable": {"thread_id": thread_id}})
+
+    if wants_event_stream():
+        return sse_response(stream_agent_events(agent_executor, inputs, config, on_complete=store))
+
+    with sandbox_session(thread_id):
+        response = agent_executor.invoke(inputs, config=config)
 
     follow_up_analysis = str(response["messages"][-1].content)
+    store(follow_up_analysis)
 
-    return jsonify({"response": follow_up_analysis})
+    result = {"response": follow_up_analysis}
+    if cache is not None:
+        result["cache"] = {"hit": False}
+    return jsonify(result)
 
 
 @current_app.route('/images')
@@ -103,11 +285,87 @@ def uploaded_file(filename):
 
 @current_app.route('/example', methods=['GET'])
 def get_example():
-    analysis, tree, objective, system_message = load_example_data()
+    example = get_example_bundle()
+    if example is None:
+        return jsonify({"error": "No example available"}), 404
 
     # Setup a new agent with the loaded objective
-    global agent_executor, thread_id
-    agent_executor, thread_id = setup_agent_executor(objective)
-    example_agent_setup(system_message, agent_executor, thread_id)
+    agent_executor, thread_id = session_manager.create(example.objective)
+    session['thread_id'] = thread_id
+    save_session_tree(thread_id, example.tree)
+    cache = get_response_cache()
+    if cache is not None:
+        cache.set_session_corpus(thread_id, "example", example.corpus)
+    example_agent_setup(example.messages, agent_executor, thread_id)
+
+    return jsonify({"analysis": example.analysis, "objective": example.objective})
+
+
+def tree_root(tree):
+    root = tree.node_info(0)
+    root["metadata"] = tree.file_type_count
+    return root
+
+
+@current_app.route('/tree', methods=['GET'])
+def get_tree():
+    tree = get_session_tree(current_thread_id())
+    if tree is None:
+        return jsonify({"error": "No directory tree for this session"}), 404
+    return jsonify(tree_root(tree))
+
+
+@current_app.route('/tree/<int:node_id>/children', methods=['GET'])
+def get_tree_children(node_id):
+    tree = get_session_tree(current_thread_id())
+    if tree is None or node_id >= len(tree):
+        return jsonify({"error": "Node not found"}), 404
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', Config.TREE_PAGE_SIZE, type=int), 1),
+                Config.TREE_MAX_PAGE_SIZE)
+    return jsonify(tree.children_page(node_id, offset, limit))
+
+
+@current_app.route('/tree/search', methods=['GET'])
+def search_tree():
+    tree = get_session_tree(current_thread_id())
+    if tree is None:
+        return jsonify({"error": "No directory tree for this session"}), 404
+
+    term = request.args.get('q', '')
+    field = request.args.get('field', 'name')
+    if not term:
+        return jsonify({"nodes": []})
+    return jsonify({"nodes": tree.search(term, field, Config.TREE_SEARCH_RESULTS)})
+
+
+@current_app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@current_app.after_request
+def record_request_duration(response):
+    started = g.pop('request_started', None)
+    if started is not None and instrumentation_enabled():
+        # Streamed responses are timed until their headers are sent
+        metrics.observe("finance_agent_http_request_seconds", time.perf_counter() - started,
+                        "Duration of HTTP requests by endpoint.", method=request.method,
+                        endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+                        status=response.status_code)
+    return response
+
+
+@current_app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 
-    return jsonify({"analysis": analysis, "tree": tree, "objective": objective})
+@current_app.route('/trace', methods=['GET'])
+def get_trace():
+    """Spans recorded for the current session: uploads, agent steps, LLM and tool calls, parses and REPL runs."""
+    thread_id = current_thread_id()
+    if not thread_id:
+        return jsonify({"error": "Session not initialized"}), 404
+    return jsonify({"thread_id": thread_id, "spans": traces.get(thread_id)})
@@ -0,0 +1,212 @@
+import contextlib
+import contextvars
+import io
+import multiprocessing
+import threading
+
+from flask_app.config import Config
+from flask_app import instrumentation
+
+# Session whose namespace python_repl tool calls run in. Set around agent invocations;
+# LangChain copies context into the threads that run tools.
+current_session_id = contextvars.ContextVar("current_session_id", default="default")
+
+
+@contextlib.contextmanager
+def sandbox_session(session_id):
+    token = current_session_id.set(session_id or "default")
+    try:
+        yield
+    finally:
+        current_session_id.reset(token)
+
+
+class CpuLimitExceeded(Exception):
+    pass
+
+
+def _worker_main(conn, memory_bytes):
+    """Entry point of a sandbox process: pre-imports the analysis stack, then runs code per session namespace.
+
+    Every namespace starts with load_table, which reads spreadsheets from their columnar extracts.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    from flask_app.columnar import load_table
+
+    try:
+        import resource
+        import signal
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        if memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+        def on_cpu_limit(signum, frame):
+            raise CpuLimitExceeded("CPU time limit exceeded")
+
+        signal.signal(signal.SIGXCPU, on_cpu_limit)
+        _, cpu_hard_limit = resource.getrlimit(resource.RLIMIT_CPU)
+
+    namespaces = {}
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            command, session_id, payload = conn.recv()
+        except EOFError:
+            break
+
+        if command == "drop":
+            namespaces.pop(session_id, None)
+            continue
+
+        code, cpu_seconds = payload
+        namespace = namespaces.setdefault(
+            session_id, {"__name__": "__main__", "load_table": load_table})
+        stdout = io.StringIO()
+
+        if resource is not None and cpu_seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft_limit = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+            if cpu_hard_limit != resource.RLIM_INFINITY:
+                soft_limit = min(soft_limit, cpu_hard_limit)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft_limit, cpu_hard_limit))
+        try:
+            with contextlib.redirect_stdout(stdout):
+                exec(code, namespace)
+            output = stdout.getvalue()
+        except Exception as e:
+            output = repr(e)
+        finally:
+            if resource is not None and cpu_seconds:
+                resource.setrlimit(resource.RLIMIT_CPU,
+                                   (cpu_hard_limit, cpu_hard_limit))
+
+        conn.send(("result", output))
+
+
+class _Worker:
+    def __init__(self, mp_context, memory_bytes):
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(
+            target=_worker_main, args=(child_conn, memory_bytes), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        try:
+            if not self.ready and self.conn.poll(timeout):
+                self.ready = self.conn.recv()[0] == "ready"
+        except EOFError:
+            return False
+        return self.ready
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pool of pre-warmed Python processes that execute tool code.
+
+    Each session is pinned to one worker and gets its own namespace there, so state
+    persists between calls of the same session but never leaks across sessions.
+    Different workers run concurrently. Every call has a CPU time limit (enforced in the
+    worker) and a wall clock limit (the worker is killed and replaced, dropping the
+    namespaces it held); the address space of each worker is capped at memory_bytes.
+    """
+
+    def __init__(self, size, cpu_seconds, memory_bytes, wall_timeout, startup_timeout=60):
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.wall_timeout = wall_timeout
+        self.startup_timeout = startup_timeout
+        # spawn: forking a threaded web server process is not safe
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(self._mp_context, memory_bytes)
+                         for _ in range(size)]
+        self._locks = [threading.Lock() for _ in range(size)]
+        self._assignments = {}  # session_id -> worker index
+        self._assign_lock = threading.Lock()
+
+    def _worker_index(self, session_id):
+        with self._assign_lock:
+            if session_id not in self._assignments:
+                loads = [0] * len(self._workers)
+                for index in self._assignments.values():
+                    loads[index] += 1
+                self._assignments[session_id] = loads.index(min(loads))
+            return self._assignments[session_id]
+
+    def _replace(self, index):
+        self._workers[index].kill()
+        self._workers[index] = _Worker(self._mp_context, self.memory_bytes)
+
+    def run(self, code, session_id="default"):
+        index = self._worker_index(session_id)
+        with self._locks[index]:
+            worker = self._workers[index]
+            if not worker.process.is_alive():
+                self._replace(index)
+                worker = self._workers[index]
+            if not worker.wait_ready(self.startup_timeout):
+                self._replace(index)
+                return "RuntimeError('Python worker failed to start')"
+
+            worker.conn.send(("run", session_id, (code, self.cpu_seconds)))
+            if not worker.conn.poll(self.wall_timeout):
+                self._replace(index)
+                return f"TimeoutError('Execution exceeded {self.wall_timeout} seconds')"
+            try:
+                _, output = worker.conn.recv()
+            except EOFError:
+                # Killed by the OS, most likely for going over the memory limit
+                self._replace(index)
+                return "MemoryError('Python worker exited while executing the code')"
+            return output
+
+    def release(self, session_id):
+        """Forget a session's namespace."""
+        with self._assign_lock:
+            index = self._assignments.pop(session_id, None)
+        if index is not None:
+            with self._locks[index]:
+                if self._workers[index].process.is_alive():
+                    self._workers[index].conn.send(("drop", session_id, None))
+
+    def close(self):
+        for worker in self._workers:
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(Config.SANDBOX_WORKERS, Config.SANDBOX_CPU_SECONDS,
+                                Config.SANDBOX_MEMORY_BYTES, Config.SANDBOX_WALL_TIMEOUT)
+        return _pool
+
+
+def run_python(code):
+    """Run code in the current session's sandbox namespace. Returns stdout, or the repr of the error."""
+    with instrumentation.span("repl", "python_repl"):
+        return get_sandbox_pool().run(code, current_session_id.get())
+
+
+def release_session(session_id):
+    """Drop a session's namespace, without starting the pool if it is not running."""
+    if _pool is not None:
+        _pool.release(session_id)
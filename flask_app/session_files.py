@@ -0,0 +1,19 @@
+import os
+import uuid
+
+from flask_app.config import Config
+
+
+def is_thread_id(thread_id):
+    """Thread ids are canonical UUIDs. Anything else, e.g. from a forged cookie, never reaches a path."""
+    try:
+        return str(uuid.UUID(thread_id)) == thread_id
+    except (TypeError, ValueError, AttributeError):
+        return False
+
+
+def session_file_path(kind, thread_id):
+    """uploads/<kind>/<thread_id>.json, for a valid thread id only."""
+    if not is_thread_id(thread_id):
+        raise ValueError(f"Invalid thread id {thread_id!r}")
+    return os.path.join(Config.UPLOAD_FOLDER, kind, f"{thread_id}.json")
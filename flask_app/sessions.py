@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_app.config import Config
+from flask_app.controllers import setup_agent_executor
+from flask_app.sandbox import release_session
+
+
+class SessionManager:
+    """Per-session agent executors keyed by thread id.
+
+    Conversation state lives in the file-based checkpointer, so evicting a session only
+    drops the in-memory executor (and the session's python_repl namespace); a later request with the same thread id (in this or
+    another worker process) rebuilds it and picks up where it left off.
+    """
+
+    def __init__(self, ttl_seconds, max_sessions):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # thread_id -> [agent_executor, last_used]
+        self._lock = threading.Lock()
+
+    def create(self, objective):
+        agent_executor, thread_id = setup_agent_executor(objective)
+        self._store(thread_id, agent_executor)
+        return agent_executor, thread_id
+
+    def get(self, thread_id):
+        """Executor for thread_id, rebuilt from the checkpointer if this process does not hold it."""
+        if not thread_id:
+            return None
+        with self._lock:
+            evicted = self._evict_expired()
+            entry = self._sessions.get(thread_id)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                self._sessions.move_to_end(thread_id)
+        self._release(evicted)
+        if entry is not None:
+            return entry[0]
+
+        agent_executor, _ = setup_agent_executor(None, thread_id=thread_id)
+        self._store(thread_id, agent_executor)
+        return agent_executor
+
+    def _store(self, thread_id, agent_executor):
+        with self._lock:
+            self._sessions[thread_id] = [agent_executor, time.monotonic()]
+            self._sessions.move_to_end(thread_id)
+            evicted = self._evict_expired()
+            while len(self._sessions) > self.max_sessions:
+                evicted_thread_id, _ = self._sessions.popitem(last=False)
+                evicted.append(evicted_thread_id)
+        self._release(evicted)
+
+    def _evict_expired(self):
+        evicted = []
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            thread_id, (_, last_used) = next(iter(self._sessions.items()))
+            if last_used > cutoff:
+                break
+            del self._sessions[thread_id]
+            evicted.append(thread_id)
+        return evicted
+
+    @staticmethod
+    def _release(thread_ids):
+        # Outside the registry lock: releasing waits for the session's sandbox worker
+        for thread_id in thread_ids:
+            release_session(thread_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+session_manager = SessionManager(
+    Config.SESSION_TTL_SECONDS, Config.MAX_SESSIONS)
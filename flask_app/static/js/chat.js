@@ -3,47 +3,60 @@ function askQuestion() {
     var questionSpinner = document.querySelector("#chat-box .loading-spinner");
     questionSpinner.style.display = "block";
 
+    var responsesDiv = document.getElementById("responses");
+
+    // Display user's question
+    var questionElement = document.createElement("div");
+    questionElement.className = "alert alert-primary chat-message";
+    questionElement.innerText = question;
+    responsesDiv.appendChild(questionElement);
+
+    // AI response is filled in as the stream arrives
+    var responseElement = document.createElement("div");
+    responseElement.className = "alert alert-secondary chat-message mathjax";
+    var stepsElement = document.createElement("div");
+    stepsElement.className = "tool-steps small text-muted";
+    var answerElement = document.createElement("div");
+    responseElement.appendChild(stepsElement);
+    responseElement.appendChild(answerElement);
+    responsesDiv.appendChild(responseElement);
+
+    // Clear the input field
+    document.getElementById("question").value = "";
+    scrollToBottom();
+
+    var answerText = "";
+
     fetch("/ask", {
         method: "POST",
         headers: {
             "Content-Type": "application/json",
+            "Accept": "text/event-stream",
         },
         body: JSON.stringify({ question: question }),
     })
-        .then((response) => response.json())
-        .then((data) => {
-            var responsesDiv = document.getElementById("responses");
-
-            // Display user's question
-            var questionElement = document.createElement("div");
-            questionElement.className = "alert alert-primary chat-message";
-            questionElement.innerText = question;
-            responsesDiv.appendChild(questionElement);
-
-            // Display AI response
-            var responseElement = document.createElement("div");
-            responseElement.className = "alert alert-secondary chat-message mathjax";
-
-            // Use marked.parse or marked depending on the version
-            var responseHTML;
-            if (typeof marked.parse !== 'undefined') {
-                responseHTML = marked.parse(data.response);
-            } else {
-                responseHTML = marked(data.response);
-            }
-
-            responseElement.innerHTML = responseHTML;
-            responsesDiv.appendChild(responseElement);
-
-            // Hide the spinner
+        .then((response) => readEventStream(response, function (eventName, data) {
+            // Hide the spinner as soon as anything is visible
             questionSpinner.style.display = "none";
 
-            // Clear the input field
-            document.getElementById("question").value = "";
+            if (eventName === "token") {
+                answerText += data.text;
+                answerElement.innerHTML = renderMarkdown(answerText);
+            } else if (eventName === "tool_call" || eventName === "tool_output") {
+                var stepElement = document.createElement("div");
+                stepElement.innerText = toolStepText(eventName, data);
+                stepsElement.appendChild(stepElement);
+            } else if (eventName === "final") {
+                answerElement.innerHTML = renderMarkdown(data.response);
+            } else if (eventName === "error") {
+                answerElement.innerText = "Error: " + data.error;
+            }
 
             // Scroll to the bottom of the chat container
             scrollToBottom();
-
+        }))
+        .then(() => {
+            questionSpinner.style.display = "none";
         })
         .catch((error) => {
             console.error("Error:", error);
@@ -0,0 +1,45 @@
+// Reads a text/event-stream response body and calls onEvent(name, data) for every event.
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = "message";
+            let data = "";
+            rawEvent.split("\n").forEach((line) => {
+                if (line.startsWith("event: ")) {
+                    eventName = line.slice(7);
+                } else if (line.startsWith("data: ")) {
+                    data += line.slice(6);
+                }
+            });
+            onEvent(eventName, data ? JSON.parse(data) : null);
+        }
+    }
+}
+
+// Use marked.parse or marked depending on the version
+function renderMarkdown(text) {
+    if (typeof marked.parse !== 'undefined') {
+        return marked.parse(text);
+    }
+    return marked(text);
+}
+
+function toolStepText(eventName, data) {
+    if (eventName === "tool_call") {
+        return "Calling " + data.name + " " + JSON.stringify(data.args);
+    }
+    var content = data.content.length > 300 ? data.content.slice(0, 300) + "..." : data.content;
+    return data.name + " returned: " + content;
+}
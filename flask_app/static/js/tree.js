@@ -1,4 +1,6 @@
-function renderTree(treeData) {
+// Nodes are fetched from the /tree endpoints as folders are expanded, so only the
+// visible part of the tree is downloaded and laid out.
+function renderTree() {
     const treeContainer = document.getElementById("tree-container");
     treeContainer.innerHTML = "";
 
@@ -20,26 +22,56 @@ function renderTree(treeData) {
 
     d3.select("#tree-container").select("svg").call(zoom);
 
-    let root = d3.hierarchy(JSON.parse(treeData));
-    const treeLayout = d3.tree()
-        .size([height, width])
-        .nodeSize([50, 350]); // Initial horizontal spacing
-
+    const treeLayout = d3.tree().nodeSize([50, 350]);
     treeLayout.separation((a, b) => (a.parent === b.parent ? 2 : 2.5));
 
-    treeLayout(root);
+    // Loaded nodes: {id, name, file_analysis, children (count), files, loaded: [], expanded}
+    let rootData = null;
+    let searchRoot = null;
+    let root = null;
+
+    function makeNode(info) {
+        return Object.assign({}, info, { loaded: [], expanded: false });
+    }
+
+    function moreNode(parent) {
+        return {
+            id: "more-" + parent.id,
+            more: parent,
+            name: "Show more (" + (parent.children - parent.loaded.length) + " remaining)",
+            children: 0,
+        };
+    }
 
-    // Expand all nodes by default
-    root.descendants().forEach((d) => {
-        if (d._children) {
-            d.children = d._children;
-            d._children = null;
+    function visibleChildren(d) {
+        if (!d.expanded) {
+            return null;
         }
-    });
+        const children = d.loaded.slice();
+        if (!d.searchView && d.loaded.length < d.children) {
+            children.push(moreNode(d));
+        }
+        return children.length ? children : null;
+    }
 
-    let i = 0;
+    function loadChildren(node) {
+        return fetch("/tree/" + node.id + "/children?offset=" + node.loaded.length)
+            .then((response) => response.json())
+            .then((page) => {
+                node.children = page.total;
+                node.loaded = node.loaded.concat(page.children.map(makeNode));
+            });
+    }
 
     function update(source) {
+        const previous = {};
+        if (root) {
+            root.each((d) => { previous[d.data.id] = d; });
+        }
+
+        root = d3.hierarchy(searchRoot || rootData, visibleChildren);
+        treeLayout(root);
+
         const nodes = root.descendants().reverse();
         const links = root.links();
 
@@ -48,26 +80,25 @@ function renderTree(treeData) {
 
         nodes.forEach(d => {
             d.y = d.depth * horizontalSpacing;
-            d.x = d.x * verticalSpacing / 50; // Adjusted vertical spacing
+            d.x = d.x * verticalSpacing / 50 + height / 2; // Adjusted vertical spacing
         });
 
+        const origin = previous[source.id] || { x: height / 2, y: 0 };
+        const sourceX0 = origin.x, sourceY0 = origin.y;
+
         const node = svg.selectAll('g.node')
-            .data(nodes.filter(d => !d.hidden), d => d.id || (d.id = ++i));
+            .data(nodes, d => d.data.id);
 
         const nodeEnter = node.enter().append('g')
             .attr('class', 'node')
-            .attr("transform", d => `translate(${source.y0},${source.x0})`)
+            .attr("transform", d => `translate(${sourceY0},${sourceX0})`)
             .on('click', click);
 
         nodeEnter.append('circle')
-            .attr('r', 1e-6)
-            .style("fill", d => d._children ? "lightsteelblue" : "#fff");
+            .attr('r', 1e-6);
 
         nodeEnter.append('text')
             .attr("dy", ".35em")
-            .attr("x", d => d._children ? -13 : 13)
-            .attr("text-anchor", d => d._children ? "end" : "start")
-            .text(d => d.data.name)
             .style("font-size", "12px");
 
         const nodeUpdate = nodeEnter.merge(node);
@@ -78,14 +109,17 @@ function renderTree(treeData) {
 
         nodeUpdate.select('circle')
             .attr('r', 10)
-            .style("fill", d => d._children ? "lightsteelblue" : "#fff");
+            .style("fill", d => d.data.children && !d.data.expanded ? "lightsteelblue" : "#fff");
 
         nodeUpdate.select('text')
+            .attr("x", d => d.data.children ? -13 : 13)
+            .attr("text-anchor", d => d.data.children ? "end" : "start")
+            .text(d => d.data.name)
             .style("fill-opacity", 1);
 
         const nodeExit = node.exit().transition()
             .duration(750)
-            .attr("transform", d => `translate(${source.y},${source.x})`)
+            .attr("transform", d => `translate(${origin.y},${origin.x})`)
             .remove();
 
         nodeExit.select('circle')
@@ -95,12 +129,12 @@ function renderTree(treeData) {
             .style("fill-opacity", 1e-6);
 
         const link = svg.selectAll('path.link')
-            .data(links.filter(d => !d.target.hidden), d => d.target.id);
+            .data(links, d => d.target.data.id);
 
         const linkEnter = link.enter().insert('path', "g")
             .attr("class", "link")
             .attr('d', d => {
-                const o = { x: source.x0, y: source.y0 };
+                const o = { x: sourceX0, y: sourceY0 };
                 return diagonal(o, o);
             });
 
@@ -110,29 +144,37 @@ function renderTree(treeData) {
             .duration(750)
             .attr('d', d => diagonal(d.source, d.target));
 
-        const linkExit = link.exit().transition()
+        link.exit().transition()
             .duration(750)
             .attr('d', d => {
-                const o = { x: source.x, y: source.y };
+                const o = { x: origin.x, y: origin.y };
                 return diagonal(o, o);
             })
             .remove();
+    }
 
-        nodes.forEach(d => {
-            d.x0 = d.x;
-            d.y0 = d.y;
-        });
+    function click(event, d) {
+        const data = d.data;
+        if (data.more) {
+            loadChildren(data.more).then(() => update(data.more));
+            return;
+        }
 
-        function click(event, d) {
-            if (d.children) {
-                d._children = d.children;
-                d.children = null;
-            } else {
-                d.children = d._children;
-                d._children = null;
-            }
-            update(d);
-            showNodeData(d);
+        showNodeData(data);
+        if (!data.children || data.searchView) {
+            return;
+        }
+        if (data.expanded) {
+            data.expanded = false;
+            update(data);
+        } else if (data.loaded.length) {
+            data.expanded = true;
+            update(data);
+        } else {
+            loadChildren(data).then(() => {
+                data.expanded = true;
+                update(data);
+            });
         }
     }
 
@@ -143,64 +185,91 @@ function renderTree(treeData) {
                   ${d.y} ${d.x}`;
     }
 
-    root.x0 = height / 2;
-    root.y0 = 0;
-
-    update(root);
+    fetch("/tree")
+        .then((response) => response.json())
+        .then((info) => {
+            rootData = makeNode(info);
+            return loadChildren(rootData);
+        })
+        .then(() => {
+            rootData.expanded = true;
+            update(rootData);
+        })
+        .catch((error) => console.error("Error:", error));
+
+    // Search runs on the server and returns the matches with their ancestors
+    let searchTimer = null;
 
     function filterNodes(searchTerm) {
-        const searchCriteria = document.getElementById('search-criteria').value;
-        const nodes = root.descendants();
-
-        nodes.forEach(d => {
-            d.hidden = true;
-
-            if (searchCriteria === 'name' && d.data.name.toLowerCase().includes(searchTerm.toLowerCase())) {
-                d.hidden = false;
-            } else if (searchCriteria === 'file_analysis' && d.data.file_analysis && d.data.file_analysis.toLowerCase().includes(searchTerm.toLowerCase())) {
-                d.hidden = false;
-            }
-
-            if (!d.hidden) {
-                let ancestor = d;
-                while (ancestor) {
-                    ancestor.hidden = false;
-                    ancestor = ancestor.parent;
-                }
-            }
-        });
+        if (!rootData) {
+            return;
+        }
+        if (!searchTerm) {
+            searchRoot = null;
+            update(rootData);
+            return;
+        }
 
-        update(root);
+        const searchCriteria = document.getElementById('search-criteria').value;
+        fetch("/tree/search?q=" + encodeURIComponent(searchTerm) + "&field=" + searchCriteria)
+            .then((response) => response.json())
+            .then((result) => {
+                const byId = {};
+                result.nodes.forEach((info) => {
+                    const node = makeNode(info);
+                    node.expanded = true;
+                    node.searchView = true;
+                    byId[info.id] = node;
+                    if (byId[info.parent]) {
+                        byId[info.parent].loaded.push(node);
+                    }
+                });
+                searchRoot = byId[0] || Object.assign(makeNode(rootData), { searchView: true });
+                update(searchRoot);
+            });
     }
 
-    document.getElementById('search-bar').addEventListener('input', function () {
-        filterNodes(this.value);
-    });
+    document.getElementById('search-bar').oninput = function () {
+        const searchTerm = this.value;
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(function () { filterNodes(searchTerm); }, 300);
+    };
 
-    document.getElementById('zoom-in').addEventListener('click', function () {
+    document.getElementById('zoom-in').onclick = function () {
         zoom.scaleBy(d3.select("#tree-container").select("svg"), 1.2);
-    });
+    };
 
-    document.getElementById('zoom-out').addEventListener('click', function () {
+    document.getElementById('zoom-out').onclick = function () {
         zoom.scaleBy(d3.select("#tree-container").select("svg"), 0.8);
-    });
+    };
 
-    document.getElementById('horizontal-spacing').addEventListener('input', function () {
-        update(root);
-    });
+    document.getElementById('horizontal-spacing').oninput = function () {
+        update(searchRoot || rootData);
+    };
 
-    document.getElementById('vertical-spacing').addEventListener('input', function () {
-        update(root);
-    });
+    document.getElementById('vertical-spacing').oninput = function () {
+        update(searchRoot || rootData);
+    };
 }
 
-function showNodeData(d) {
-    const nodeData = { ...d.data };
-    delete nodeData.children;
+function showNodeData(data) {
+    const nodeData = { name: data.name };
+    if (data.file_analysis) {
+        nodeData.file_analysis = data.file_analysis;
+    }
+    if (data.children) {
+        nodeData.files = data.files;
+    }
+    if (data.metadata) {
+        nodeData.metadata = Object.entries(data.metadata)
+            .map(([fileType, count]) => fileType + ": " + count).join(", ");
+    }
 
     const keyMapping = {
         name: 'File Name',
-        file_analysis: 'File Overview'
+        file_analysis: 'File Overview',
+        files: 'Files',
+        metadata: 'File Types'
     };
 
     let detailsHtml = '';
@@ -213,5 +282,5 @@ function showNodeData(d) {
 }
 
 $("#treeModal").on("shown.bs.modal", function () {
-    renderTree(window.treeData);
+    renderTree();
 });
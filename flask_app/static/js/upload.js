@@ -15,32 +15,75 @@ document.getElementById("upload-form").addEventListener("submit", function (even
     var uploadSpinner = document.querySelector("#upload-form .loading-spinner");
     uploadSpinner.style.display = "block";
 
+    var analysisElement = document.getElementById("analysis");
+    var progressElement = document.getElementById("upload-progress");
+    var cancelButton = document.getElementById("cancel-upload");
+    var analysisText = "";
+    var analysisShown = false;
+
+    function finishUpload() {
+        uploadSpinner.style.display = "none";
+        progressElement.innerText = "";
+        cancelButton.style.display = "none";
+    }
+
+    // The upload form, with its progress and cancel button, stays until the job ends
+    function showAnalysisSection() {
+        analysisShown = true;
+        document.getElementById("analysis-section").style.display = "block";
+    }
+
     fetch("/upload", {
         method: "POST",
         body: formData,
     })
         .then((response) => response.json())
         .then((data) => {
-            // Use marked.parse or marked depending on the version
-            var analysisHTML;
-            if (typeof marked.parse !== 'undefined') {
-                analysisHTML = marked.parse(data.analysis);
-            } else {
-                analysisHTML = marked(data.analysis);
-            }
-
-            document.getElementById("analysis").innerHTML = analysisHTML;
-            uploadSpinner.style.display = "none";
-
-            document.getElementById("analysis-section").style.display = "block";
-            document.getElementById("chat-box").style.display = "flex";
-            document.getElementById("upload-form").style.display = "none";
-
-            window.treeData = data.tree;
+            cancelButton.style.display = "inline-block";
+            cancelButton.onclick = function () {
+                fetch("/jobs/" + data.job_id + "/cancel", { method: "POST" });
+            };
+            return fetch("/jobs/" + data.job_id + "/events", {
+                headers: {
+                    "Accept": "text/event-stream",
+                },
+            });
         })
+        .then((response) => readEventStream(response, function (eventName, data) {
+            if (eventName === "progress") {
+                var message = data.message || "Waiting for a worker";
+                if (data.total) {
+                    message += " (" + data.done + "/" + data.total + " files)";
+                }
+                progressElement.innerText = message;
+            } else if (eventName === "tree") {
+                showAnalysisSection();
+                analysisElement.innerText = "Analyzing objective...";
+            } else if (eventName === "token") {
+                analysisText += data.text;
+                analysisElement.innerHTML = renderMarkdown(analysisText);
+            } else if (eventName === "tool_call" || eventName === "tool_output") {
+                if (!analysisText) {
+                    analysisElement.innerText = toolStepText(eventName, data);
+                }
+            } else if (eventName === "final") {
+                finishUpload();
+                showAnalysisSection();
+                analysisElement.innerHTML = renderMarkdown(data.analysis);
+                document.getElementById("chat-box").style.display = "flex";
+                document.getElementById("upload-form").style.display = "none";
+            } else if (eventName === "error" || eventName === "cancelled") {
+                finishUpload();
+                var text = eventName === "cancelled" ? "Upload cancelled" : "Error: " + data.error;
+                progressElement.innerText = text;
+                if (analysisShown) {
+                    analysisElement.innerText = text;
+                }
+            }
+        }))
         .catch((error) => {
             console.error("Error:", error);
-            uploadSpinner.style.display = "none";
+            finishUpload();
         });
 });
 
@@ -64,8 +107,6 @@ document.getElementById("example-button").addEventListener("click", function ()
             document.getElementById("analysis-section").style.display = "block";
             document.getElementById("chat-box").style.display = "flex";
             document.getElementById("upload-form").style.display = "none";
-
-            window.treeData = data.tree;
         })
         .catch((error) => {
             console.error("Error:", error);
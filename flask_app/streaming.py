@@ -0,0 +1,165 @@
+import json
+import queue
+import threading
+import time
+
+from flask import Response, request
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, ToolMessage
+
+from flask_app.sandbox import sandbox_session
+
+# Tokens a job streams are written to the job's events at most this often
+TOKEN_FLUSH_SECONDS = 0.1
+# How often /jobs/<id>/events checks for new events, and sends a comment to keep the connection open
+JOB_POLL_SECONDS = 0.1
+KEEPALIVE_SECONDS = 15
+
+
+def wants_event_stream():
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def sse_event(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class _TokenQueueHandler(BaseCallbackHandler):
+    """Forwards tokens of streaming models to the SSE queue. Only the main agent's model streams."""
+
+    # A job's events raise JobCancelled here, which has to stop the model
+    raise_error = True
+
+    def __init__(self, events):
+        self.events = events
+
+    def on_llm_new_token(self, token, **kwargs):
+        if token:
+            self.events.put(("token", {"text": token}))
+
+
+def stream_updates(agent_executor, inputs, config, events):
+    """Push tool steps of the run onto events and return the final response."""
+    response = ""
+    callbacks = list(config.get("callbacks") or []) + [_TokenQueueHandler(events)]
+    run_config = {**config, "callbacks": callbacks}
+    for update in agent_executor.stream(inputs, config=run_config, stream_mode="updates"):
+        for values in update.values():
+            for message in (values or {}).get("messages", []):
+                if isinstance(message, AIMessage):
+                    for tool_call in message.tool_calls:
+                        events.put(("tool_call", {
+                            "name": tool_call["name"], "args": tool_call["args"]}))
+                elif isinstance(message, ToolMessage):
+                    events.put(("tool_output", {
+                        "name": message.name, "content": str(message.content)}))
+                response = str(message.content)
+    return response
+
+
+def stream_agent_events(agent_executor, inputs, config, on_complete=None):
+    """Run the agent on a background thread and yield SSE events as the run progresses.
+
+    Emits `token` for each model token, `tool_call` and `tool_output` for every tool step,
+    then `final` with the same response the blocking endpoints return (or `error`).
+    on_complete is called with the final response before the `final` event is sent.
+    """
+    events = queue.Queue()
+
+    def run():
+        try:
+            with sandbox_session(config["configurable"]["thread_id"]):
+                response = stream_updates(agent_executor, inputs, config, events)
+            if on_complete:
+                on_complete(response)
+            events.put(("final", {"response": response}))
+        except Exception as e:
+            print(f"Error streaming agent run: {e}")
+            events.put(("error", {"error": str(e)}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    while True:
+        item = events.get()
+        if item is None:
+            break
+        yield sse_event(*item)
+
+
+class JobEvents:
+    """Queue-like sink for stream_updates that records the events on a job.
+
+    Consecutive tokens are written together, so a long answer is not one row per token.
+    Every write first checks for cancellation, so a cancelled job stops at its next event
+    (raising JobCancelled) rather than after the agent finishes.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.tokens = []
+        self.flushed_at = time.monotonic()
+
+    def put(self, item):
+        event, data = item
+        if event == "token":
+            self.tokens.append(data["text"])
+            if time.monotonic() - self.flushed_at < TOKEN_FLUSH_SECONDS:
+                return
+        self.job.check_cancelled()
+        self.flush()
+        if event != "token":
+            self.job.emit(event, data)
+
+    def flush(self):
+        if self.tokens:
+            self.job.emit("token", {"text": "".join(self.tokens)})
+            self.tokens = []
+        self.flushed_at = time.monotonic()
+
+
+def job_event_stream(job_id, after=0):
+    """SSE events of a job until it finishes.
+
+    Emits `progress` whenever the status or progress changes, the events the job records
+    (ids are the event ids, for Last-Event-ID), then `final` with the job's result, `error`
+    or `cancelled`.
+    """
+    # The job manager opens its database on import, which the agent code does not need
+    from flask_app.jobs import CANCELLED, FAILED, QUEUED, RUNNING, job_manager
+
+    last_progress = None
+    last_sent = time.monotonic()
+    while True:
+        # Status first: once it is final, the events read next are all there will be
+        job = job_manager.get(job_id)
+        progress = dict(job["progress"], status=job["status"])
+        if progress != last_progress:
+            last_progress = progress
+            last_sent = time.monotonic()
+            yield sse_event("progress", progress)
+        for event_id, event, data in job_manager.events(job_id, after):
+            after = event_id
+            last_sent = time.monotonic()
+            yield sse_event(event, data, event_id)
+
+        if job["status"] not in (QUEUED, RUNNING):
+            break
+        if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        time.sleep(JOB_POLL_SECONDS)
+
+    if job["status"] == CANCELLED:
+        yield sse_event("cancelled", {})
+    elif job["status"] == FAILED:
+        yield sse_event("error", {"error": job["error"]})
+    else:
+        yield sse_event("final", job["result"])
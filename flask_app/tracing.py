@@ -0,0 +1,118 @@
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from flask_app.context_packing import message_tokens
+from flask_app.instrumentation import count_tokens_used, current_span_id, enabled, record_span
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """Records LangChain runs as spans: graph runs, agent steps (graph nodes), LLM calls and tool calls.
+
+    Runs nest by their parent run ids, so sub-agents invoked by tools appear under the tool span.
+    """
+
+    def __init__(self):
+        self._runs = {}  # run id -> (kind, name, start, perf counter start, parent span id, attributes)
+        self._skipped = {}  # run id of a run not recorded -> span id its children nest under
+        self._prompts = {}  # run id of a chat model call -> its messages, counted only if it reports no usage
+        self._lock = threading.Lock()
+
+    def _parent_span(self, parent_run_id):
+        with self._lock:
+            if parent_run_id in self._runs:
+                return str(parent_run_id)
+            return self._skipped.get(parent_run_id, current_span_id.get())
+
+    def _start(self, run_id, parent_run_id, kind, name, **attributes):
+        parent_id = self._parent_span(parent_run_id)
+        with self._lock:
+            self._runs[run_id] = (kind, name, time.time(), time.perf_counter(), parent_id, attributes)
+
+    def _end(self, run_id, error=None, **attributes):
+        with self._lock:
+            self._skipped.pop(run_id, None)
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        kind, name, start, started, parent_id, start_attributes = run
+        record_span(kind, name, start, time.perf_counter() - started, str(run_id),
+                    parent_id, error, **start_attributes, **attributes)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or "chain"
+        if name == "LangGraph":
+            self._start(run_id, parent_run_id, "agent_run", name)
+        elif parent_run_id is None:
+            self._start(run_id, parent_run_id, "chain", name)
+        elif (metadata or {}).get("langgraph_node") == name and name != "__start__":
+            self._start(run_id, parent_run_id, "agent_step", name)
+        else:
+            parent_id = self._parent_span(parent_run_id)
+            with self._lock:
+                self._skipped[run_id] = parent_id
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, repr(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or params.get("_type", "unknown")
+        with self._lock:
+            self._prompts[run_id] = messages
+        self._start(run_id, parent_run_id, "llm", model, model=model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or params.get("_type", "unknown")
+        self._start(run_id, parent_run_id, "llm", model, model=model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            messages = self._prompts.pop(run_id, None)
+        if run is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            attributes = {"prompt_tokens": usage.get("prompt_tokens", 0),
+                          "completion_tokens": usage.get("completion_tokens", 0)}
+        elif messages is not None:
+            # Streamed responses carry no usage: count the prompt and the generated messages
+            attributes = {"prompt_tokens": sum(message_tokens(message) for batch in messages for message in batch),
+                          "completion_tokens": sum(message_tokens(generation.message)
+                                                   for generations in response.generations
+                                                   for generation in generations
+                                                   if hasattr(generation, "message")),
+                          "tokens_estimated": True}
+        else:
+            self._end(run_id)
+            return
+        count_tokens_used(run[1], attributes["prompt_tokens"], attributes["completion_tokens"])
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._prompts.pop(run_id, None)
+        self._end(run_id, repr(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "tool", serialized.get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, repr(error))
+
+
+def instrumented(config):
+    """Agent config with the instrumentation callback added (when enabled)."""
+    if not enabled():
+        return config
+    callbacks = list(config.get("callbacks") or []) + [InstrumentationHandler()]
+    return {**config, "callbacks": callbacks}
@@ -0,0 +1,343 @@
+import json
+import os
+import threading
+from bisect import insort
+from collections import Counter, OrderedDict
+
+from flask_app.ingestion import ALLOWED_EXTENSIONS
+from flask_app.session_files import is_thread_id, session_file_path
+
+
+class CompactTree:
+    """Directory tree stored as flat arrays.
+
+    Node i is names[i] with parent parents[i] (-1 for the root); file nodes also have
+    paths[i] and may have a summary in analyses[i]. Children are kept sorted by name, so
+    files can be added in any order and the tree still renders like a sorted walk.
+    """
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        self.names = [os.path.basename(root_path.rstrip('/'))]
+        self.parents = [-1]
+        self.paths = [None]
+        self.children = [[]]
+        self.analyses = {}  # file node index -> summary
+        self.file_type_count = {}
+        self._index = {}  # (parent index, name) -> node index
+        self._file_counts = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_directory(cls, start_path):
+        """Walk start_path in sorted order, keeping the files with allowed extensions."""
+        tree = cls(start_path)
+
+        def add_nodes(parent, path):
+            for entry in sorted(os.scandir(path), key=lambda e: e.name):
+                if entry.is_file():
+                    if os.path.splitext(entry.name)[1].lower() in ALLOWED_EXTENSIONS:
+                        tree._add_node(parent, entry.name, entry.path)
+                elif entry.is_dir():
+                    add_nodes(tree._add_node(parent, entry.name), entry.path)
+
+        add_nodes(0, start_path)
+        return tree
+
+    def _add_node(self, parent, name, path=None):
+        index = self._index.get((parent, name))
+        if index is not None:
+            return index
+
+        index = len(self.names)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.paths.append(path)
+        self.children.append([])
+        insort(self.children[parent], index, key=self.names.__getitem__)
+        self._index[(parent, name)] = index
+        self._file_counts = None
+
+        if path is not None:
+            file_type = os.path.splitext(name)[1].lower()
+            self.file_type_count[file_type] = self.file_type_count.get(file_type, 0) + 1
+        return index
+
+    def add_file(self, path, analysis=None):
+        """Add a file (and any missing folders) to the tree. Returns its node index.
+
+        Files outside the root folder, e.g. from another archive extracted next to it, are
+        placed under the root by their path relative to the root's parent.
+        """
+        relative_path = os.path.relpath(path, self.root_path)
+        if relative_path.split(os.sep)[0] == os.pardir:
+            relative_path = os.path.relpath(path, os.path.dirname(self.root_path))
+        parts = relative_path.split(os.sep)
+        parent = 0
+        for part in parts[:-1]:
+            parent = self._add_node(parent, part)
+        index = self._add_node(parent, parts[-1], path)
+        if analysis is not None:
+            self.analyses[index] = analysis
+        return index
+
+    def files(self):
+        """(node index, path) of every file, in tree order."""
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            if self.paths[index] is not None:
+                yield index, self.paths[index]
+            stack.extend(reversed(self.children[index]))
+
+    def set_analyses(self, analyses):
+        """Attach summaries from {file_path: summary}; paths are matched after normalization."""
+        analyses = {os.path.normpath(path): analysis for path, analysis in analyses.items()}
+        for index, path in self.files():
+            analysis = analyses.get(os.path.normpath(path))
+            if analysis is not None:
+                self.analyses[index] = analysis
+
+    def subtree_counts(self, index):
+        """Files per extension below a node."""
+        counts = Counter()
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            if self.paths[node] is not None:
+                counts[os.path.splitext(self.names[node])[1].lower()] += 1
+            stack.extend(self.children[node])
+        return counts
+
+    @classmethod
+    def from_json(cls, tree_json):
+        """Rebuild a tree from the anytree JSON format (a string or the parsed dict).
+
+        Nodes without children are taken to be files; their paths are built from the names.
+        """
+        data = json.loads(tree_json) if isinstance(tree_json, str) else tree_json
+        tree = cls(data["name"])
+
+        def add_nodes(parent, node, path):
+            for child in node.get("children", []):
+                if parent == 0 and child["name"] == "metadata":
+                    continue
+                child_path = os.path.join(path, child["name"])
+                if "children" in child:
+                    add_nodes(tree._add_node(parent, child["name"]), child, child_path)
+                else:
+                    index = tree._add_node(parent, child["name"], child_path)
+                    if "file_analysis" in child:
+                        tree.analyses[index] = child["file_analysis"]
+
+        add_nodes(0, data, data["name"])
+        return tree
+
+    def file_counts(self):
+        """Number of files below each node (1 for a file)."""
+        if self._file_counts is None:
+            counts = [0 if path is None else 1 for path in self.paths]
+            # Nodes are always added after their parent, so one reverse pass sums subtrees
+            for index in range(len(counts) - 1, 0, -1):
+                counts[self.parents[index]] += counts[index]
+            self._file_counts = counts
+        return self._file_counts
+
+    def node_info(self, index):
+        info = {"id": index, "parent": self.parents[index], "name": self.names[index],
+                "children": len(self.children[index]), "files": self.file_counts()[index]}
+        if index in self.analyses:
+            info["file_analysis"] = self.analyses[index]
+        return info
+
+    def children_page(self, index, offset=0, limit=100):
+        children = self.children[index]
+        return {"id": index, "total": len(children), "offset": offset,
+                "children": [self.node_info(child) for child in children[offset:offset + limit]]}
+
+    def search(self, term, field="name", limit=100):
+        """Nodes whose name (or file_analysis) contains term, in tree order, with their ancestors."""
+        term = term.lower()
+        matches = []
+        for index in range(1, len(self.names)):
+            value = self.names[index] if field == "name" else self.analyses.get(index)
+            if value and term in value.lower():
+                matches.append(index)
+                if len(matches) >= limit:
+                    break
+
+        nodes = set()
+        for index in matches:
+            while index != -1 and index not in nodes:
+                nodes.add(index)
+                index = self.parents[index]
+
+        ordered = []
+        stack = [0] if nodes else []
+        while stack:
+            index = stack.pop()
+            ordered.append(self.node_info(index))
+            stack.extend(child for child in reversed(self.children[index]) if child in nodes)
+        return ordered
+
+    def to_json(self, file_analysis=True):
+        """Same JSON as anytree's JsonExporter on the equivalent tree, with the metadata node last."""
+        dumps = json.dumps
+        parts = []
+
+        def emit(index):
+            parts.append('{"name": ')
+            parts.append(dumps(self.names[index]))
+            if file_analysis and index in self.analyses:
+                parts.append(', "file_analysis": ')
+                parts.append(dumps(self.analyses[index]))
+            children = self.children[index]
+            if children or index == 0:
+                parts.append(', "children": [')
+                for position, child in enumerate(children):
+                    if position:
+                        parts.append(', ')
+                    emit(child)
+                if index == 0:
+                    if children:
+                        parts.append(', ')
+                    parts.append(self._metadata_json())
+                parts.append(']')
+            parts.append('}')
+
+        emit(0)
+        return "".join(parts)
+
+    def _metadata_json(self):
+        if not self.file_type_count:
+            return '{"name": "metadata"}'
+        children = ", ".join(f'{{"name": {json.dumps(f"{file_type}: {count}")}}}'
+                             for file_type, count in self.file_type_count.items())
+        return f'{{"name": "metadata", "children": [{children}]}}'
+
+    def to_text(self, file_analysis=False, max_depth=None, group_threshold=None):
+        """Tree text for the prompt, one node per line with the file paths.
+
+        Folders deeper than max_depth are collapsed into their file counts per extension,
+        and the files of a folder with more than group_threshold of them are listed as
+        one line per extension. Small trees render exactly like RenderTree.
+        """
+        lines = [f"{self.names[0]}.\n"]
+
+        def label(index):
+            if self.paths[index] is None:
+                return self.names[index]
+            text = f"{self.names[index]} (Path: {self.paths[index]})"
+            if file_analysis and index in self.analyses:
+                text += f" (Content Summary: {self.analyses[index]})"
+            return text
+
+        def render(index, indent, depth):
+            children = self.children[index]
+            items = [(child, None) for child in children]
+
+            files = [child for child in children if self.paths[child] is not None]
+            if group_threshold is not None and len(files) > group_threshold:
+                counts = Counter(os.path.splitext(self.names[child])[1].lower() for child in files)
+                items = [(child, None) for child in children if self.paths[child] is None]
+                items += [(None, f"*{file_type} ({count} files)")
+                          for file_type, count in sorted(counts.items())]
+            if index == 0:
+                items.append((None, "metadata"))
+
+            for position, (child, text) in enumerate(items):
+                last = position == len(items) - 1
+                branch = "└── " if last else "├── "
+                child_indent = indent + ("    " if last else "│   ")
+
+                if child is None:
+                    lines.append(f"{indent}{branch}{text}.\n")
+                    if text == "metadata":
+                        for item_position, (file_type, count) in enumerate(self.file_type_count.items()):
+                            item_branch = "└── " if item_position == len(self.file_type_count) - 1 else "├── "
+                            lines.append(f"{child_indent}{item_branch}{file_type}: {count}.\n")
+                    continue
+
+                if self.children[child] and max_depth is not None and depth + 1 >= max_depth:
+                    counts = self.subtree_counts(child)
+                    summary = ", ".join(f"{count} {file_type}" for file_type, count in counts.most_common())
+                    lines.append(f"{indent}{branch}{label(child)} ({sum(counts.values())} files: {summary}).\n")
+                    continue
+
+                lines.append(f"{indent}{branch}{label(child)}.\n")
+                render(child, child_indent, depth + 1)
+
+        render(0, "", 0)
+        return "".join(lines)
+
+    def to_state(self):
+        return {"root_path": self.root_path, "names": self.names, "parents": self.parents, "paths": self.paths,
+                "analyses": list(self.analyses.items()), "file_type_count": self.file_type_count}
+
+    @classmethod
+    def from_state(cls, state):
+        tree = cls(state["root_path"])
+        tree.names = state["names"]
+        tree.parents = state["parents"]
+        tree.paths = state["paths"]
+        tree.analyses = {index: analysis for index, analysis in state["analyses"]}
+        tree.file_type_count = state["file_type_count"]
+        tree.children = [[] for _ in tree.names]
+        for index in range(1, len(tree.names)):
+            tree.children[tree.parents[index]].append(index)
+            tree._index[(tree.parents[index], tree.names[index])] = index
+        for children in tree.children:
+            children.sort(key=tree.names.__getitem__)
+        return tree
+
+
+def session_tree_path(thread_id):
+    return session_file_path("trees", thread_id)
+
+
+def save_session_tree(thread_id, tree):
+    path = session_tree_path(thread_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(tree.to_state(), f)
+
+
+def load_session_tree(thread_id):
+    if not is_thread_id(thread_id):
+        return None
+    path = session_tree_path(thread_id)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return CompactTree.from_state(json.load(f))
+
+
+# Trees are reread when their file changes; a few recent sessions are kept parsed
+MAX_CACHED_TREES = 16
+_trees = OrderedDict()  # thread_id -> (mtime_ns, tree)
+_trees_lock = threading.Lock()
+
+
+def get_session_tree(thread_id):
+    if not is_thread_id(thread_id):
+        return None
+    path = session_tree_path(thread_id)
+    if not os.path.exists(path):
+        return None
+    stamp = os.stat(path).st_mtime_ns
+
+    with _trees_lock:
+        entry = _trees.get(thread_id)
+        if entry is not None and entry[0] == stamp:
+            _trees.move_to_end(thread_id)
+            return entry[1]
+
+    tree = load_session_tree(thread_id)
+    with _trees_lock:
+        _trees[thread_id] = (stamp, tree)
+        _trees.move_to_end(thread_id)
+        while len(_trees) > MAX_CACHED_TREES:
+            _trees.popitem(last=False)
+    return tree
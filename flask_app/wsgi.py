@@ -0,0 +1,4 @@
+from flask_app import create_app
+
+# WSGI entry, e.g. `gunicorn flask_app.wsgi:app`
+app = create_app()
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from flask_app.metrics import MAX_RESULT_ROWS, _div, cagr, compute_metric, format_result, resolve_series
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"Year": ["2021", "2022", "2023"],
+                         "Revenue": [100.0, 120.0, 144.0],
+                         "COGS": [40.0, 60.0, 72.0],
+                         "Operating Income": [10.0, 0.0, 30.0],
+                         "D&A": [5.0, 5.0, 6.0]})
+
+
+@pytest.fixture
+def rows(df):
+    return df.set_index("Year").T.reset_index()
+
+
+@pytest.mark.parametrize("metric, inputs, expected", [
+    ("growth", {"value": "Revenue"}, [np.nan, 0.2, 0.2]),
+    ("cagr", {"value": "Revenue"}, 0.2),
+    ("gross_profit", {"revenue": "Revenue", "cogs": "COGS"}, [60.0, 60.0, 72.0]),
+    ("gross_margin", {"revenue": "Revenue", "cogs": "COGS"}, [0.6, 0.5, 0.5]),
+    ("operating margin", {"value": "Operating Income", "revenue": "Revenue"}, [0.1, 0.0, 30 / 144]),
+    ("ebitda", {"operating_income": "Operating Income", "depreciation_amortization": "D&A"}, [15.0, 5.0, 36.0]),
+    ("ebitda_margin", {"operating_income": "Operating Income", "depreciation_amortization": "D&A",
+                       "revenue": "Revenue"}, [0.15, 5 / 120, 0.25]),
+    ("ratio", {"numerator": "Revenue", "denominator": "Operating Income"}, [10.0, np.nan, 4.8]),
+    ("total", {"value": "Revenue"}, 364.0),
+    ("mean", {"value": "Revenue"}, 364.0 / 3),
+])
+def test_compute_metric(df, metric, inputs, expected):
+    _, result, _ = compute_metric(metric, df, inputs)
+    assert np.allclose(np.asarray(result, dtype=float), expected, equal_nan=True)
+
+
+def test_compute_metric_rows(rows):
+    name, result, is_percentage = compute_metric("gross_margin", rows, {"revenue": "revenue", "cogs": "cogs"}, "rows")
+    assert name == "gross_margin"
+    assert is_percentage
+    assert np.allclose(result.to_numpy(dtype=float), [0.6, 0.5, 0.5])
+
+
+def test_compute_metric_unknown_metric(df):
+    with pytest.raises(KeyError):
+        compute_metric("enterprise_value", df, {})
+
+
+def test_compute_metric_missing_input(df):
+    with pytest.raises(ValueError):
+        compute_metric("gross_margin", df, {"revenue": "Revenue"})
+
+
+def test_div_zero_denominator():
+    result = _div(pd.Series([1.0, 2.0, 3.0]), pd.Series([2.0, 0.0, 4.0]))
+    assert np.allclose(result.to_numpy(), [0.5, np.nan, 0.75], equal_nan=True)
+    assert math.isnan(_div(5.0, 0))
+    assert _div(5.0, 2) == 2.5
+
+
+@pytest.mark.parametrize("values", [[0.0, 5.0], [-10.0, 5.0], [10.0, -5.0], [10.0]])
+def test_cagr_undefined(values):
+    assert math.isnan(cagr(pd.Series(values)))
+
+
+def test_cagr_skips_missing_periods():
+    assert cagr(pd.Series([np.nan, 100.0, 121.0])) == pytest.approx(0.21)
+
+
+def test_resolve_series(df, rows):
+    assert resolve_series(df, "Revenue").tolist() == [100.0, 120.0, 144.0]
+    assert resolve_series(rows, " COGS ", "rows").tolist() == [40.0, 60.0, 72.0]
+
+
+def test_resolve_series_missing_column(df):
+    with pytest.raises(KeyError, match="Column 'Net Income' not found"):
+        resolve_series(df, "Net Income")
+
+
+def test_resolve_series_missing_row(rows):
+    with pytest.raises(KeyError, match="Row 'Net Income' not found"):
+        resolve_series(rows, "Net Income", "rows")
+
+
+def test_format_result():
+    assert format_result(0.2, True) == "20.00%"
+    assert format_result(1234567.0, False) == "1,234,567.00"
+    assert format_result(-1234.5678, False) == "-1,234.57"
+    assert format_result(364.0, False) == "364.00"
+    assert format_result(np.nan, True) == "n/a"
+    series = pd.Series([np.nan, 0.2], index=["2021", "2022"])
+    assert format_result(series, True) == "2021: n/a\n2022: 20.00%"
+
+
+def test_format_result_caps_rows():
+    series = pd.Series(np.arange(1000.0))
+    lines = format_result(series, False).splitlines()
+    assert len(lines) == MAX_RESULT_ROWS + 2
+    assert lines[0] == f"1000 rows, first and last {MAX_RESULT_ROWS // 2} shown:"
+    assert lines[1] == "0: 0.00"
+    assert f"{1000 - MAX_RESULT_ROWS} rows omitted" in lines[MAX_RESULT_ROWS // 2 + 1]
+    assert lines[-1] == "999: 999.00"